@@ -0,0 +1,44 @@
+"""基准测试：城市名索引查询耗时
+
+测量 CityIndex.lookup 在不同输入形式下的耗时（ns/op），以及首次加载索引的耗时。
+
+用法:
+    uv run python benchmarks/bench_city_index.py --number 200000
+    uv run python benchmarks/bench_city_index.py --index path/to/city_index.tsv.gz
+"""
+
+import argparse
+import time
+import timeit
+
+from skypulse.utils.city_index import INDEX_PATH, CityIndex
+
+QUERIES = {
+    "exact": "北京",
+    "suffix": "北京市",
+    "english": "Beijing",
+    "pinyin-lower": "beijing",
+    "compound": "北京市朝阳区",
+    "miss": "不存在的城市",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=str(INDEX_PATH), help="索引文件路径")
+    parser.add_argument("--number", type=int, default=200_000, help="每种输入的查询次数")
+    args = parser.parse_args()
+
+    index = CityIndex(args.index)
+    start = time.perf_counter()
+    index.load()
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"load        {load_ms:8.2f} ms  ({len(index)} 个别名)")
+
+    for name, query in QUERIES.items():
+        seconds = timeit.timeit(lambda: index.lookup(query), number=args.number)
+        print(f"{name:<12}{seconds / args.number * 1e9:8.0f} ns/op  -> {index.lookup(query)}")
+
+
+if __name__ == "__main__":
+    main()
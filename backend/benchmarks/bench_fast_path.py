@@ -0,0 +1,100 @@
+"""基准测试：快速路径开启 / 关闭时的端到端延迟和 LLM 调用次数
+
+在本地启动模拟和风天气服务和 OpenAI 兼容的模拟 LLM 服务，
+用记录的问题样本（data/questions.txt）依次调用 WeatherAgent.query，
+分别统计快速路径开启和关闭时的 p50/p99 延迟、每个请求的平均 LLM 调用次数。
+
+用法:
+    uv run python benchmarks/bench_fast_path.py --llm-latency 0.3 --rounds 3
+"""
+
+import argparse
+import asyncio
+import math
+import statistics
+import time
+from pathlib import Path
+
+import mock_llm
+import mock_qweather
+from mock_qweather import MockServer
+
+from skypulse.agent.agent import WeatherAgent
+from skypulse.core.config import settings
+from skypulse.services.qweather_service import qweather_service
+
+QUESTIONS_PATH = Path(__file__).parent / "data" / "questions.txt"
+
+
+def load_questions(path: Path = QUESTIONS_PATH) -> list[str]:
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+async def _run_mode(agent: WeatherAgent, llm_app, questions: list[str], rounds: int) -> dict:
+    samples = []
+    calls_before = llm_app.state.calls
+    for _ in range(rounds):
+        for question in questions:
+            start = time.perf_counter()
+            await agent.query(question)
+            samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50": statistics.median(samples),
+        "p99": _percentile(samples, 0.99),
+        "llm_calls": (llm_app.state.calls - calls_before) / len(samples),
+        "requests": len(samples),
+    }
+
+
+async def run(qweather_url: str, llm_url: str, llm_app, questions: list[str], rounds: int):
+    qweather_service.base_url = qweather_url
+    agent = WeatherAgent(api_key="mock", base_url=llm_url, model="mock")
+    # 只比较快速路径本身，关闭回答缓存
+    settings.response_cache_enabled = False
+    try:
+        # 预热：建立连接并填充天气缓存，两种模式的上游条件一致
+        settings.fast_path_enabled = False
+        for question in questions:
+            await agent.query(question)
+
+        for enabled in (False, True):
+            settings.fast_path_enabled = enabled
+            result = await _run_mode(agent, llm_app, questions, rounds)
+            name = "fast_path=on" if enabled else "fast_path=off"
+            print(
+                f"{name:<14} p50={result['p50']:7.1f}ms p99={result['p99']:7.1f}ms "
+                f"llm_calls/req={result['llm_calls']:.2f} requests={result['requests']}"
+            )
+    finally:
+        await qweather_service.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.3, help="模拟 LLM 每次调用延迟（秒）"
+    )
+    parser.add_argument(
+        "--qweather-latency", type=float, default=0.05, help="模拟天气接口延迟（秒）"
+    )
+    parser.add_argument("--rounds", type=int, default=3, help="问题样本重复次数")
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    llm_app = mock_llm.create_app(latency=args.llm_latency)
+    with (
+        MockServer(mock_qweather.create_app(args.qweather_latency)) as qweather,
+        MockServer(llm_app) as llm,
+    ):
+        asyncio.run(run(qweather.base_url, llm.base_url, llm_app, questions, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
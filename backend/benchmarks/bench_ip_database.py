@@ -0,0 +1,82 @@
+"""基准测试：离线 IP 数据库的内存占用与查询耗时
+
+生成指定数量的随机 IPv4/IPv6 区间（或加载 --csv 指定的真实数据库），
+报告加载耗时、tracemalloc 统计的内存占用和 lookup 的 ns/op。
+
+用法:
+    uv run python benchmarks/bench_ip_database.py --ranges 500000
+    uv run python benchmarks/bench_ip_database.py --csv dbip-city-lite.csv
+"""
+
+import argparse
+import ipaddress
+import random
+import time
+import timeit
+import tracemalloc
+
+from skypulse.services.ip_database import CSVIPDatabase
+
+CITIES = [("CN", "Beijing"), ("CN", "Shanghai"), ("CN", "Guangzhou"), ("US", "Seattle")]
+
+
+def _synthetic_rows(count: int, version: int) -> list[tuple[str, str, str, str]]:
+    """生成互不重叠的随机区间"""
+    bits = 32 if version == 4 else 128
+    step = (1 << bits) // count
+    rows = []
+    for i in range(count):
+        start = i * step
+        end = start + random.randint(0, step - 1)
+        country_code, city = random.choice(CITIES)
+        rows.append(
+            (
+                str(ipaddress.ip_address(start) if version == 4 else ipaddress.IPv6Address(start)),
+                str(ipaddress.ip_address(end) if version == 4 else ipaddress.IPv6Address(end)),
+                country_code,
+                city,
+            )
+        )
+    return rows
+
+
+def _random_ips(count: int, version: int) -> list[str]:
+    if version == 4:
+        return [str(ipaddress.IPv4Address(random.getrandbits(32))) for _ in range(count)]
+    return [str(ipaddress.IPv6Address(random.getrandbits(128))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ranges", type=int, default=200_000, help="每个地址族生成的区间数")
+    parser.add_argument("--csv", help="使用真实的 CSV 数据库代替随机数据")
+    parser.add_argument("--number", type=int, default=100_000, help="查询次数")
+    args = parser.parse_args()
+
+    rows = None if args.csv else _synthetic_rows(args.ranges, 4) + _synthetic_rows(args.ranges, 6)
+
+    def load() -> CSVIPDatabase:
+        return CSVIPDatabase.from_csv(args.csv) if args.csv else CSVIPDatabase(rows)
+
+    start = time.perf_counter()
+    load()
+    load_seconds = time.perf_counter() - start
+
+    # tracemalloc 会显著拖慢加载，单独再加载一次统计常驻内存
+    tracemalloc.start()
+    db = load()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"ranges  v4={len(db.v4)} v6={len(db.v6)}")
+    print(f"load    {load_seconds * 1000:.0f} ms")
+    print(f"memory  {current / 1024 / 1024:.1f} MiB ({current / max(len(db), 1):.0f} B/range)")
+
+    for version in (4, 6):
+        ips = iter(_random_ips(args.number, version))
+        seconds = timeit.timeit(lambda: db.lookup(next(ips)), number=args.number)
+        print(f"lookup  IPv{version} {seconds / args.number * 1e9:.0f} ns/op")
+
+
+if __name__ == "__main__":
+    main()
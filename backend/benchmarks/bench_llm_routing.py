@@ -0,0 +1,127 @@
+"""基准测试：LLM 端点池的路由、对冲和分级
+
+在本地启动多个 OpenAI 兼容的模拟 LLM 服务：
+- fast-a / fast-b: 延迟较低，但有 --tail-ratio 的请求额外慢 --tail-latency 秒（长尾）
+- slow: 延迟稳定但较高（配置在端点列表第一位，单端点部署时就是它）
+- strong: 延迟较高的大模型，只在分级模式中使用
+
+依次运行以下模式，每种模式用 --concurrency 个并发请求发送 --requests 个问题（非流式）：
+- single: 只有 slow 一个端点（原来的单端点配置）
+- pool: slow + fast-a + fast-b，按耗时路由到最快的端点
+- pool+hedge: 同上，调用超过该端点耗时的 p95 仍未返回时向另一个端点发出对冲请求
+- tiered: fast-a + strong，工具结果数达到 1 时由 strong 生成回答
+
+输出每种模式的 p50/p95/p99 延迟和各端点的调用数。
+
+用法:
+    uv run python benchmarks/bench_llm_routing.py --requests 200 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import math
+import statistics
+import time
+from contextlib import ExitStack
+
+import mock_llm
+import mock_qweather
+from mock_qweather import MockServer
+
+from skypulse.agent.agent import WeatherAgent
+from skypulse.core.config import LLMEndpointConfig, settings
+from skypulse.services.qweather_service import qweather_service
+
+QUESTIONS = [f"{city}今天天气怎么样" for city in mock_qweather.CITIES]
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+async def _run_mode(agent: WeatherAgent, apps: dict, args) -> dict:
+    calls_before = {name: app.state.calls for name, app in apps.items()}
+    samples: list[float] = []
+    questions = iter(range(args.requests))
+
+    async def worker():
+        for i in questions:
+            start = time.perf_counter()
+            await agent.query(QUESTIONS[i % len(QUESTIONS)])
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return {
+        "p50": statistics.median(samples),
+        "p95": _percentile(samples, 0.95),
+        "p99": _percentile(samples, 0.99),
+        "calls": {name: app.state.calls - calls_before[name] for name, app in apps.items()},
+    }
+
+
+async def run(qweather_url: str, urls: dict, apps: dict, args):
+    qweather_service.base_url = qweather_url
+    settings.fast_path_enabled = False
+    settings.response_cache_enabled = False
+    settings.prefetch_enabled = False
+
+    def endpoint(name: str, tier: str = "fast") -> LLMEndpointConfig:
+        return LLMEndpointConfig(name=name, base_url=urls[name], model=name, tier=tier)
+
+    modes = [
+        ("single", [endpoint("slow")], False, 0),
+        ("pool", [endpoint("slow"), endpoint("fast-a"), endpoint("fast-b")], False, 0),
+        ("pool+hedge", [endpoint("slow"), endpoint("fast-a"), endpoint("fast-b")], True, 0),
+        ("tiered", [endpoint("fast-a"), endpoint("strong", "strong")], False, 1),
+    ]
+    try:
+        # 预热天气缓存，各模式只比较 LLM 调用
+        for city in mock_qweather.CITIES:
+            await qweather_service.fetch_weather(await qweather_service.get_location_id(city))
+
+        for name, endpoints, hedge, strong_min_tool_calls in modes:
+            settings.llm_hedge_enabled = hedge
+            settings.llm_strong_min_tool_calls = strong_min_tool_calls
+            agent = WeatherAgent(api_key="mock", endpoints=endpoints)
+            result = await _run_mode(agent, apps, args)
+            calls = " ".join(f"{k}={v}" for k, v in result["calls"].items() if v)
+            print(
+                f"{name:<11} p50={result['p50']:7.1f}ms p95={result['p95']:7.1f}ms "
+                f"p99={result['p99']:7.1f}ms calls: {calls}"
+            )
+    finally:
+        await qweather_service.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="每种模式的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数")
+    parser.add_argument("--fast-latency", type=float, default=0.15, help="fast 端点延迟（秒）")
+    parser.add_argument("--slow-latency", type=float, default=0.5, help="slow 端点延迟（秒）")
+    parser.add_argument("--strong-latency", type=float, default=0.8, help="strong 端点延迟（秒）")
+    parser.add_argument("--tail-ratio", type=float, default=0.04, help="fast 端点长尾请求比例")
+    parser.add_argument("--tail-latency", type=float, default=1.5, help="长尾请求额外延迟（秒）")
+    args = parser.parse_args()
+
+    fast = dict(
+        latency=args.fast_latency,
+        jitter=0.05,
+        tail_ratio=args.tail_ratio,
+        tail_latency=args.tail_latency,
+    )
+    apps = {
+        "slow": mock_llm.create_app(latency=args.slow_latency, jitter=0.05),
+        "fast-a": mock_llm.create_app(**fast),
+        "fast-b": mock_llm.create_app(**fast),
+        "strong": mock_llm.create_app(latency=args.strong_latency, jitter=0.05),
+    }
+    with ExitStack() as stack:
+        qweather = stack.enter_context(MockServer(mock_qweather.create_app(0.02)))
+        urls = {name: stack.enter_context(MockServer(app)).base_url for name, app in apps.items()}
+        asyncio.run(run(qweather.base_url, urls, apps, args))
+
+
+if __name__ == "__main__":
+    main()
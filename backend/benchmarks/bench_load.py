@@ -0,0 +1,379 @@
+"""压测：在模拟上游下测量 /api/v1/chat 和 /api/v1/chat/stream 的吞吐与延迟
+
+启动三个本地模拟服务（和风天气、ip-api / ipify、OpenAI 兼容的流式 LLM，延迟和抖动可配置），
+再以子进程启动 SkyPulse（python -m skypulse.main，上游地址通过环境变量指向模拟服务），
+然后用固定并发数的闭环客户端发送 data/questions.txt 中的问题，客户端 IP 通过 X-Real-IP 轮换。
+
+报告每个接口的 RPS、错误数、p50/p95/p99 延迟，流式接口另有首帧时间（TTFB）和首字时间（TTFT），
+以及各上游的调用次数和每个请求的平均调用次数。--output 把结果写成 JSON，
+--compare 与之前的 JSON 对比（例如两个 commit 之间的回归）。
+
+用法:
+    uv run python benchmarks/bench_load.py --concurrency 32 --requests 500 --output load.json
+    uv run python benchmarks/bench_load.py --endpoint stream --compare load.json
+    uv run python benchmarks/bench_load.py --workers 4 --env CACHE_BACKEND_URL=sqlite:///data/bench.db
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import mock_ipapi
+import mock_llm
+import mock_qweather
+from bench_fast_path import load_questions
+from mock_qweather import MockServer, _free_port
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# 用于 --compare 的指标：(路径, 越小越好)
+COMPARE_METRICS = (
+    ("rps", False),
+    ("latency_ms.p50", True),
+    ("latency_ms.p95", True),
+    ("latency_ms.p99", True),
+    ("ttft_ms.p50", True),
+    ("ttft_ms.p99", True),
+    ("upstream_per_request.llm", True),
+    ("upstream_per_request.qweather", True),
+)
+
+
+@dataclass
+class Sample:
+    latency: float
+    ok: bool
+    ttfb: Optional[float] = None
+    ttft: Optional[float] = None
+
+
+@dataclass
+class Result:
+    endpoint: str
+    duration: float = 0.0
+    samples: list[Sample] = field(default_factory=list)
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)] * 1000, 2)
+
+    return {
+        "p50": pick(0.5),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+    }
+
+
+async def _chat(client: httpx.AsyncClient, question: str, ip: str) -> Sample:
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            "/api/v1/chat", json={"message": question}, headers={"X-Real-IP": ip}
+        )
+        ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return Sample(latency=time.perf_counter() - start, ok=ok)
+
+
+async def _stream(client: httpx.AsyncClient, question: str, ip: str) -> Sample:
+    start = time.perf_counter()
+    ttfb = ttft = None
+    ok = False
+    try:
+        async with client.stream(
+            "POST", "/api/v1/chat/stream", json={"message": question}, headers={"X-Real-IP": ip}
+        ) as response:
+            event = None
+            async for line in response.aiter_lines():
+                if ttfb is None and line:
+                    ttfb = time.perf_counter() - start
+                if not line:
+                    event = None
+                elif line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:") and event is None:
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        ok = response.status_code == 200
+                    elif ttft is None:
+                        ttft = time.perf_counter() - start
+    except httpx.HTTPError:
+        ok = False
+    return Sample(latency=time.perf_counter() - start, ok=ok, ttfb=ttfb, ttft=ttft)
+
+
+async def drive(base_url: str, endpoint: str, args, questions: list[str]) -> Result:
+    """以 args.concurrency 个并发客户端发送 args.requests 个请求（不含预热）"""
+    send = _stream if endpoint == "stream" else _chat
+    ips = itertools.cycle(mock_ipapi.client_ips(args.client_ips))
+    work = itertools.cycle(questions)
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    result = Result(endpoint=endpoint)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        for _ in range(args.warmup):
+            await send(client, next(work), next(ips))
+
+        remaining = args.requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                result.samples.append(await send(client, next(work), next(ips)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        result.duration = time.perf_counter() - start
+    return result
+
+
+def summarize(result: Result, upstream: dict) -> dict:
+    samples = result.samples
+    ok = [s for s in samples if s.ok]
+    summary = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "duration_s": round(result.duration, 3),
+        "rps": round(len(samples) / result.duration, 2) if result.duration else 0.0,
+        "latency_ms": _percentiles([s.latency for s in ok]),
+    }
+    if result.endpoint == "stream":
+        summary["ttfb_ms"] = _percentiles([s.ttfb for s in ok if s.ttfb is not None])
+        summary["ttft_ms"] = _percentiles([s.ttft for s in ok if s.ttft is not None])
+    summary["upstream_calls"] = upstream
+    totals = {
+        name: sum(calls.values()) if isinstance(calls, dict) else calls
+        for name, calls in upstream.items()
+    }
+    summary["upstream_per_request"] = {
+        name: round(total / max(1, len(samples)), 3) for name, total in totals.items()
+    }
+    return summary
+
+
+def _diff_calls(after: dict, before: dict) -> dict:
+    return {k: v - before[k] for k, v in after.items()}
+
+
+class Mocks:
+    """模拟上游服务及其调用计数"""
+
+    def __init__(self, args):
+        self.qweather = mock_qweather.create_app(args.qweather_latency, args.qweather_jitter)
+        self.ipapi = mock_ipapi.create_app(args.ipapi_latency, args.ipapi_jitter)
+        self.llm = mock_llm.create_app(
+            args.llm_latency, args.llm_token_delay, jitter=args.llm_jitter
+        )
+        self.servers = [MockServer(app) for app in (self.qweather, self.ipapi, self.llm)]
+
+    def __enter__(self) -> "Mocks":
+        for server in self.servers:
+            server.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        for server in self.servers:
+            server.__exit__(*exc_info)
+
+    def env(self) -> dict:
+        qweather, ipapi, llm = (server.base_url for server in self.servers)
+        return {
+            "QWEATHER_BASE_URL": qweather,
+            "QWEATHER_API_KEY": "mock",
+            "IP_API_BASE_URL": ipapi,
+            "PUBLIC_IP_URL": f"{ipapi}/ipify",
+            "OPENROUTER_BASE_URL": llm,
+            "OPENROUTER_API_KEY": "mock",
+            "OPENROUTER_MODEL": "mock",
+        }
+
+    def calls(self) -> dict:
+        return {
+            "qweather": dict(self.qweather.state.calls),
+            "ip_api": self.ipapi.state.calls["ip_api"],
+            "ipify": self.ipapi.state.calls["ipify"],
+            "llm": self.llm.state.calls,
+        }
+
+
+def start_server(mocks: Mocks, args, workdir: str) -> tuple[subprocess.Popen, str]:
+    """以子进程启动 SkyPulse，返回 (进程, 地址)"""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, [str(BACKEND_DIR / "src"), os.environ.get("PYTHONPATH")])
+        ),
+        # 默认关闭后台预热和请求日志，只测请求路径本身
+        "PREWARM_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+        "LOG_SAMPLE_RATE": "0",
+        "CACHE_BACKEND_URL": "",
+        **mocks.env(),
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    command = [sys.executable, "-m", "skypulse.main", "--host", "127.0.0.1", "--port", str(port)]
+    command += ["--workers", str(args.workers), "--no-reload"]
+    # 在临时目录中运行，不读取开发环境的 .env
+    process = subprocess.Popen(command, env=env, cwd=workdir)
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"SkyPulse 启动失败，退出码 {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/v1/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("等待 SkyPulse 启动超时")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        return output.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _lookup(data: dict, path: str) -> Optional[float]:
+    for part in path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def compare(report: dict, baseline: dict):
+    """打印与基线的对比，越差的方向标记为 "!"（变化超过 5%）"""
+    print(f"\n对比基线 commit={baseline.get('commit')}")
+    for endpoint, summary in report["results"].items():
+        base = baseline.get("results", {}).get(endpoint)
+        if not base:
+            continue
+        for path, lower_is_better in COMPARE_METRICS:
+            new, old = _lookup(summary, path), _lookup(base, path)
+            if new is None or old is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            worse = change > 5 if lower_is_better else change < -5
+            flag = "!" if worse else " "
+            print(f"{flag} {endpoint:<6} {path:<30} {old:>10.2f} -> {new:>10.2f} ({change:+.1f}%)")
+
+
+def print_summary(endpoint: str, summary: dict):
+    latency = summary["latency_ms"]
+    line = (
+        f"{endpoint:<6} rps={summary['rps']:8.1f} errors={summary['errors']} "
+        f"p50={latency.get('p50', 0):7.1f}ms p95={latency.get('p95', 0):7.1f}ms "
+        f"p99={latency.get('p99', 0):7.1f}ms"
+    )
+    if "ttft_ms" in summary:
+        line += f" ttft_p50={summary['ttft_ms'].get('p50', 0):7.1f}ms"
+    print(line)
+    print(f"       upstream/req {summary['upstream_per_request']}")
+
+
+async def run(base_url: str, mocks: Mocks, args) -> dict:
+    questions = load_questions()
+    endpoints = ("chat", "stream") if args.endpoint == "both" else (args.endpoint,)
+    results = {}
+    for endpoint in endpoints:
+        before = mocks.calls()
+        result = await drive(base_url, endpoint, args, questions)
+        after = mocks.calls()
+        upstream = {
+            name: _diff_calls(value, before[name])
+            if isinstance(value, dict)
+            else value - before[name]
+            for name, value in after.items()
+        }
+        results[endpoint] = summarize(result, upstream)
+        print_summary(endpoint, results[endpoint])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoint", choices=("chat", "stream", "both"), default="both")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="每个接口的请求数（不含预热）")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--client-ips", type=int, default=50, help="轮换的客户端 IP 数")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--workers", type=int, default=1, help="SkyPulse worker 进程数")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="传给 SkyPulse 的额外环境变量，可重复（如 FAST_PATH_ENABLED=false）",
+    )
+    parser.add_argument("--qweather-latency", type=float, default=0.05)
+    parser.add_argument("--qweather-jitter", type=float, default=0.02)
+    parser.add_argument("--ipapi-latency", type=float, default=0.05)
+    parser.add_argument("--ipapi-jitter", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="LLM 首 token 延迟（秒）")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-token-delay", type=float, default=0.01)
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前 --output 生成的 JSON 对比")
+    args = parser.parse_args()
+
+    with Mocks(args) as mocks, tempfile.TemporaryDirectory() as workdir:
+        process, base_url = start_server(mocks, args, workdir)
+        try:
+            results = asyncio.run(run(base_url, mocks, args))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "config": config,
+        "results": results,
+    }
+    if args.output:
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(f"\n结果已写入 {args.output}")
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""基准测试：stale-while-revalidate 开启 / 关闭时缓存过期后的请求延迟
+
+在本地启动模拟和风天气服务，用假时钟驱动天气缓存：每个请求前把时钟拨快 --step 秒，
+模拟持续数小时的稳定流量（实际只运行几秒）。关闭 SWR 时，恰好在过期之后到达的请求
+要等待一次完整的上游请求；开启后这些请求直接拿到刚过期的数据，刷新在后台完成。
+
+输出每种模式的 p50/p99/max 延迟、阻塞在上游上的请求数，以及返回过期数据的请求数。
+
+用法:
+    uv run python benchmarks/bench_stale_while_revalidate.py --latency 0.1 --duration 7200
+"""
+
+import argparse
+import asyncio
+import math
+import statistics
+import time
+
+from mock_qweather import MockServer, create_app
+
+from skypulse.core.config import settings
+from skypulse.services.qweather_service import QWeatherService
+
+LOCATION_ID = "101010100"
+
+
+class FakeClock:
+    """可手动拨动的时钟，用于替换 TTLCache 的 time.monotonic"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+async def _run_mode(base_url: str, swr: bool, args) -> dict:
+    settings.qweather_cache_now_swr = settings.qweather_cache_now_ttl if swr else 0
+    settings.qweather_cache_forecast_swr = settings.qweather_cache_forecast_ttl if swr else 0
+
+    clock = FakeClock()
+    service = QWeatherService()
+    service.base_url = base_url
+    service.cache.clock = clock
+    # 首次加载不计入统计
+    await service.fetch_weather(LOCATION_ID)
+
+    samples = []
+    blocked = 0
+    stale = 0
+    try:
+        for _ in range(int(args.duration / args.step)):
+            clock.advance(args.step)
+            misses = service.cache.misses
+            start = time.perf_counter()
+            weather = await service.fetch_weather(LOCATION_ID)
+            samples.append((time.perf_counter() - start) * 1000)
+            blocked += service.cache.misses > misses
+            stale += "stale" in weather
+            # 请求间隔内让后台刷新完成（不计入延迟）
+            await asyncio.sleep(args.latency * 2)
+    finally:
+        await service.aclose()
+
+    return {
+        "p50": statistics.median(samples),
+        "p99": _percentile(samples, 0.99),
+        "max": max(samples),
+        "blocked": blocked,
+        "stale": stale,
+        "requests": len(samples),
+    }
+
+
+async def run(base_url: str, args):
+    for name, swr in (("swr off", False), ("swr on", True)):
+        result = await _run_mode(base_url, swr, args)
+        print(
+            f"{name:<8} p50={result['p50']:7.1f}ms p99={result['p99']:7.1f}ms "
+            f"max={result['max']:7.1f}ms blocked={result['blocked']} "
+            f"stale={result['stale']} requests={result['requests']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1, help="模拟接口延迟（秒）")
+    parser.add_argument("--duration", type=float, default=7200, help="模拟的总时长（秒）")
+    parser.add_argument("--step", type=float, default=60, help="相邻两个请求的模拟间隔（秒）")
+    args = parser.parse_args()
+
+    with MockServer(create_app(args.latency)) as server:
+        asyncio.run(run(server.base_url, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""基准测试：启动时间和冷启动后第一个请求的延迟
+
+1. 导入耗时：每个模块在新的子进程中导入 --import-runs 次，取中位数，与 IMPORT_BUDGETS 中的预算对比；
+   轻量入口（main、健康检查、IP 定位等）不允许加载 LangChain / OpenAI SDK
+2. 冷启动：在模拟上游下以子进程启动 SkyPulse（WARMUP_ENABLED 分别为 false / true），报告
+   - ready: 从启动进程到健康检查返回 200 的时间
+   - first_chat: 启动后第一个 /chat 请求的延迟（快速路径和回答缓存关闭，一定经过 Agent）
+   - second_chat: 第二个 /chat 请求（另一个城市）的延迟，作为热启动的参照
+
+超出导入预算时以退出码 1 结束，可用于 CI 检查导入回归。
+
+用法:
+    uv run python benchmarks/bench_startup.py
+    uv run python benchmarks/bench_startup.py --import-runs 10 --start-runs 3
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from bench_load import BACKEND_DIR, Mocks, start_server
+
+# 模块 -> (导入预算 ms, 是否禁止加载 LangChain / OpenAI SDK)
+IMPORT_BUDGETS = {
+    "skypulse.core.config": (500, True),
+    "skypulse.services": (800, True),
+    "skypulse.api.routes.weather": (1000, True),
+    "skypulse.main": (1200, True),
+    "skypulse.agent.agent": (3500, False),
+}
+
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_openai", "langgraph", "openai")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"ms": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_import(module: str, runs: int) -> tuple[float, list[str]]:
+    """在新进程中导入模块 runs 次，返回 (耗时中位数 ms, 被加载的重量级模块)"""
+    samples, heavy = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=BACKEND_DIR / "src",
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        samples.append(result["ms"])
+        heavy = result["heavy"]
+    return statistics.median(samples), heavy
+
+
+def check_imports(runs: int) -> bool:
+    print(f"导入耗时（{runs} 次取中位数）")
+    ok = True
+    for module, (budget, forbid_heavy) in IMPORT_BUDGETS.items():
+        elapsed, heavy = measure_import(module, runs)
+        over = elapsed > budget or (forbid_heavy and heavy)
+        ok = ok and not over
+        note = f" 加载了 {', '.join(heavy)}" if forbid_heavy and heavy else ""
+        flag = "!" if over else " "
+        print(f"{flag} {module:<30} {elapsed:7.1f}ms  预算 {budget}ms{note}")
+    return ok
+
+
+def _chat_ms(base_url: str, city: str) -> float:
+    start = time.perf_counter()
+    response = httpx.post(
+        f"{base_url}/api/v1/chat",
+        json={"message": f"{city}今天会下雨吗，需要带伞吗"},
+        headers={"X-Real-IP": "114.114.114.114"},
+        timeout=60,
+    )
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def cold_start(mocks: Mocks, args, warmup: bool) -> dict:
+    """启动一次服务，返回 ready / first_chat / second_chat 耗时（ms）"""
+    args.env = [
+        f"WARMUP_ENABLED={str(warmup).lower()}",
+        "FAST_PATH_ENABLED=false",
+        "RESPONSE_CACHE_ENABLED=false",
+    ]
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        process, base_url = start_server(mocks, args, workdir)
+        try:
+            ready = (time.perf_counter() - start) * 1000
+            first = _chat_ms(base_url, "北京")
+            second = _chat_ms(base_url, "上海")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return {"ready": ready, "first_chat": first, "second_chat": second}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--import-runs", type=int, default=5, help="每个模块的导入次数")
+    parser.add_argument("--start-runs", type=int, default=3, help="每种配置的启动次数")
+    parser.add_argument("--skip-imports", action="store_true", help="只测冷启动")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="LLM 首 token 延迟（秒）")
+    parser.add_argument("--qweather-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    # bench_load.Mocks / start_server 使用的其余参数
+    args.workers = 1
+    args.qweather_jitter = args.ipapi_jitter = args.llm_jitter = 0.0
+    args.ipapi_latency = 0.05
+    args.llm_token_delay = 0.01
+
+    ok = True
+    if not args.skip_imports:
+        ok = check_imports(args.import_runs)
+
+    print(f"\n冷启动（{args.start_runs} 次取中位数）")
+    with Mocks(args) as mocks:
+        for warmup in (False, True):
+            runs = [cold_start(mocks, args, warmup) for _ in range(args.start_runs)]
+            medians = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+            print(
+                f"  warmup={'on ' if warmup else 'off'} ready={medians['ready']:7.1f}ms "
+                f"first_chat={medians['first_chat']:7.1f}ms "
+                f"second_chat={medians['second_chat']:7.1f}ms"
+            )
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""基准测试：天气工具返回给 LLM 的数据量（原始 JSON vs 紧凑格式）
+
+对记录的和风天气响应样本（data/qweather_responses.json，3 天和 7 天预报各若干城市）
+分别生成 raw / json / table 三种格式、各种 focus 的工具返回值，统计字符数和 token 数。
+
+token 数优先使用 tiktoken 的编码器计算；编码文件无法下载时退回按字符估算
+（CJK 字符按 1 个 token，其余字符按 4 个字符 1 个 token）。
+
+用法:
+    uv run python benchmarks/bench_tool_payload.py --encoding o200k_base
+"""
+
+import argparse
+import json
+import statistics
+from pathlib import Path
+
+from skypulse.services.weather_projection import FIELD_SETS, format_tool_payload
+
+RESPONSES_PATH = Path(__file__).parent / "data" / "qweather_responses.json"
+
+
+def _estimate_tokens(text: str) -> int:
+    cjk = sum(1 for c in text if "一" <= c <= "鿿")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def make_counter(encoding: str):
+    """返回 (计数函数, 名称)"""
+    try:
+        import tiktoken
+
+        enc = tiktoken.get_encoding(encoding)
+        return (lambda text: len(enc.encode(text))), f"tiktoken:{encoding}"
+    except Exception:
+        return _estimate_tokens, "estimate"
+
+
+def _mean_chars(samples: list[dict], focus: str, fmt: str) -> float:
+    return statistics.mean(len(format_tool_payload(w, focus, fmt)) for w in samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--encoding", default="o200k_base", help="tiktoken 编码名称")
+    parser.add_argument("--responses", type=Path, default=RESPONSES_PATH)
+    args = parser.parse_args()
+
+    samples = json.loads(args.responses.read_text(encoding="utf-8"))
+    count_tokens, counter_name = make_counter(args.encoding)
+    print(f"samples={len(samples)} tokenizer={counter_name}")
+
+    raw_tokens = [count_tokens(format_tool_payload(w, fmt="raw")) for w in samples]
+    raw_mean = statistics.mean(raw_tokens)
+    print(f"{'raw':<14} chars={_mean_chars(samples, 'basic', 'raw'):7.0f} tokens={raw_mean:7.0f}")
+
+    for fmt in ("json", "table"):
+        for focus in FIELD_SETS:
+            tokens = statistics.mean(
+                count_tokens(format_tool_payload(w, focus, fmt)) for w in samples
+            )
+            print(
+                f"{fmt + '/' + focus:<14} chars={_mean_chars(samples, focus, fmt):7.0f} "
+                f"tokens={tokens:7.0f} ({tokens / raw_mean:6.1%} of raw)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""基准测试：当前天气与预报的串行获取 vs 并发获取
+
+在本地启动模拟和风天气服务（每个接口固定延迟），分别测量：
+- sequential: 依次 await get_current_weather 和 get_forecast（旧实现）
+- concurrent: QWeatherService.fetch_weather 并发获取
+
+用法:
+    uv run python benchmarks/bench_weather_fanout.py --latency 0.1 --rounds 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from mock_qweather import MockServer, create_app
+
+from skypulse.services.qweather_service import QWeatherService
+
+LOCATION_ID = "101010100"
+
+
+async def _sequential(service: QWeatherService):
+    await service.get_current_weather(LOCATION_ID)
+    await service.get_forecast(LOCATION_ID)
+
+
+async def _concurrent(service: QWeatherService):
+    await service.fetch_weather(LOCATION_ID)
+
+
+async def _measure(fn, service: QWeatherService, rounds: int) -> list[float]:
+    # 预热一次，建立连接
+    await fn(service)
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await fn(service)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def run(base_url: str, rounds: int):
+    service = QWeatherService()
+    service.base_url = base_url
+    try:
+        for name, fn in (("sequential", _sequential), ("concurrent", _concurrent)):
+            samples = await _measure(fn, service, rounds)
+            print(
+                f"{name:<12} p50={statistics.median(samples):7.1f}ms "
+                f"max={max(samples):7.1f}ms rounds={rounds}"
+            )
+    finally:
+        await service.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1, help="模拟接口延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机抖动上限（秒）")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    with MockServer(create_app(args.latency, args.jitter)) as server:
+        asyncio.run(run(server.base_url, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
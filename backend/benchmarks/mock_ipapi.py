@@ -0,0 +1,51 @@
+"""本地 ip-api.com / ipify 模拟服务
+
+提供 GET /json/{ip}（ip-api 格式，按 IP 的哈希值固定映射到一个模拟城市）和
+GET /ipify（ipify 格式，返回固定的公网 IP），可配置固定延迟和随机抖动。
+app.state.calls 记录两个接口的调用次数。
+"""
+
+import asyncio
+import random
+import zlib
+
+from fastapi import FastAPI
+
+# 与 mock_qweather.CITIES 对应的英文城市名（ip-api 返回英文）
+CITIES = ("Beijing", "Shanghai", "Guangzhou", "Shenzhen", "Hangzhou")
+
+PUBLIC_IP = "203.0.113.1"
+
+
+def client_ips(count: int) -> list[str]:
+    """生成 count 个用于 X-Real-IP 的公网测试地址（198.51.100.0/24 起）"""
+    return [f"198.51.{100 + i // 250}.{i % 250 + 1}" for i in range(count)]
+
+
+def create_app(latency: float = 0.05, jitter: float = 0.0) -> FastAPI:
+    """创建模拟服务
+
+    参数:
+        latency: 每个请求的固定延迟（秒）
+        jitter: 在固定延迟上叠加的随机抖动上限（秒）
+    """
+    app = FastAPI()
+    app.state.calls = {"ip_api": 0, "ipify": 0}
+
+    async def _delay():
+        await asyncio.sleep(latency + random.uniform(0, jitter))
+
+    @app.get("/json/{ip}")
+    async def lookup(ip: str):
+        app.state.calls["ip_api"] += 1
+        await _delay()
+        city = CITIES[zlib.crc32(ip.encode()) % len(CITIES)]
+        return {"status": "success", "country": "China", "countryCode": "CN", "city": city}
+
+    @app.get("/ipify")
+    async def public_ip():
+        app.state.calls["ipify"] += 1
+        await _delay()
+        return {"ip": PUBLIC_IP}
+
+    return app
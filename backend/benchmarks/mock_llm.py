@@ -0,0 +1,131 @@
+"""本地 OpenAI 兼容 LLM 模拟服务
+
+提供 POST /chat/completions（支持 stream=true 的 SSE 输出），行为模拟天气助手：
+- 最后一条是工具结果时，生成一段中文天气回答
+- 用户问题里有已知城市且请求带了工具时，返回 qweather_tool 的工具调用
+- 否则询问用户要查询哪个城市
+
+每次调用有固定延迟加随机抖动（模拟首 token 时间），按 tail_ratio 的概率再叠加 tail_latency（长尾），
+流式输出时每个片段再叠加 token_delay；fail_ratio 的请求直接返回 500。
+app.state.calls 记录调用次数，用于统计每个请求消耗的 LLM 调用数。
+"""
+
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from mock_qweather import CITIES
+
+ANSWER = "根据查询结果，{city}今天多云，气温 19~28°C，东南风 1 级，湿度 72%，出门记得关注天气变化。"
+ASK_CITY = "请问您想查询哪个城市的天气？"
+
+
+def _find_city(messages: list[dict]) -> str | None:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content") or ""
+            return next((city for city in CITIES if city in content), None)
+    return None
+
+
+def _decide(body: dict) -> tuple[str, dict | None]:
+    """返回 (文本回答, 工具调用)，两者只有一个有效"""
+    messages = body.get("messages", [])
+    city = _find_city(messages) or "北京"
+    if messages and messages[-1].get("role") == "tool":
+        return ANSWER.format(city=city), None
+    if body.get("tools") and _find_city(messages):
+        return "", {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": "qweather_tool", "arguments": json.dumps({"city": city})},
+        }
+    return ASK_CITY, None
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason: str | None = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def create_app(
+    latency: float = 0.3,
+    token_delay: float = 0.01,
+    chunk_chars: int = 2,
+    jitter: float = 0.0,
+    tail_ratio: float = 0.0,
+    tail_latency: float = 0.0,
+    fail_ratio: float = 0.0,
+) -> FastAPI:
+    """创建模拟服务
+
+    参数:
+        latency: 每次调用返回第一个 token 前的延迟（秒）
+        token_delay: 流式输出时每个片段之间的延迟（秒）
+        chunk_chars: 流式输出时每个片段的字符数
+        jitter: 在 latency 上叠加的随机抖动上限（秒）
+        tail_ratio: 出现长尾延迟的请求比例
+        tail_latency: 长尾请求额外的延迟（秒）
+        fail_ratio: 直接返回 500 的请求比例
+    """
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        model = body.get("model", "mock")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        text, tool_call = _decide(body)
+        delay = latency + random.uniform(0, jitter)
+        if random.random() < tail_ratio:
+            delay += tail_latency
+        await asyncio.sleep(delay)
+        if random.random() < fail_ratio:
+            return JSONResponse({"error": {"message": "mock failure"}}, status_code=500)
+
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": text or None}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": "tool_calls" if tool_call else "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+
+        async def stream():
+            yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+            if tool_call:
+                yield _chunk(completion_id, model, {"tool_calls": [{"index": 0, **tool_call}]})
+                yield _chunk(completion_id, model, {}, "tool_calls")
+            else:
+                for i in range(0, len(text), chunk_chars):
+                    await asyncio.sleep(token_delay)
+                    yield _chunk(completion_id, model, {"content": text[i : i + chunk_chars]})
+                yield _chunk(completion_id, model, {}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
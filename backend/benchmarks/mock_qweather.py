@@ -0,0 +1,172 @@
+"""本地和风天气模拟服务
+
+提供 /geo/v2/city/lookup、/v7/weather/now、/v7/weather/{days}d 三个接口，
+响应结构与和风天气一致，可配置固定延迟和随机抖动，供基准测试使用。
+"""
+
+import asyncio
+import random
+import socket
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import uvicorn
+from fastapi import FastAPI
+
+CITIES = {
+    "北京": "101010100",
+    "上海": "101020100",
+    "广州": "101280101",
+    "深圳": "101280601",
+    "杭州": "101210101",
+}
+
+REFER = {"sources": ["QWeather"], "license": ["QWeather Developers License"]}
+
+
+def _now_payload(location_id: str) -> dict:
+    """生成实时天气响应"""
+    now = datetime.now().strftime("%Y-%m-%dT%H:%M+08:00")
+    return {
+        "code": "200",
+        "updateTime": now,
+        "fxLink": f"https://www.qweather.com/weather/{location_id}.html",
+        "now": {
+            "obsTime": now,
+            "temp": "24",
+            "feelsLike": "26",
+            "icon": "101",
+            "text": "多云",
+            "wind360": "123",
+            "windDir": "东南风",
+            "windScale": "1",
+            "windSpeed": "3",
+            "humidity": "72",
+            "precip": "0.0",
+            "pressure": "1003",
+            "vis": "16",
+            "cloud": "10",
+            "dew": "21",
+        },
+        "refer": REFER,
+    }
+
+
+def _forecast_payload(location_id: str, days: int) -> dict:
+    """生成逐天预报响应"""
+    today = date.today()
+    daily = []
+    for i in range(days):
+        day = today + timedelta(days=i)
+        daily.append(
+            {
+                "fxDate": day.isoformat(),
+                "sunrise": "05:30",
+                "sunset": "19:20",
+                "moonrise": "20:10",
+                "moonset": "06:40",
+                "moonPhase": "盈凸月",
+                "moonPhaseIcon": "803",
+                "tempMax": str(28 + i),
+                "tempMin": str(19 + i),
+                "iconDay": "101",
+                "textDay": "多云" if i % 2 else "小雨",
+                "iconNight": "151",
+                "textNight": "多云",
+                "wind360Day": "45",
+                "windDirDay": "东北风",
+                "windScaleDay": "1-3",
+                "windSpeedDay": "3",
+                "wind360Night": "0",
+                "windDirNight": "北风",
+                "windScaleNight": "1-3",
+                "windSpeedNight": "3",
+                "humidity": "65",
+                "precip": "0.0" if i % 2 else "2.5",
+                "pressure": "1000",
+                "vis": "25",
+                "cloud": "25",
+                "uvIndex": "6",
+            }
+        )
+    return {
+        "code": "200",
+        "updateTime": datetime.now().strftime("%Y-%m-%dT%H:%M+08:00"),
+        "fxLink": f"https://www.qweather.com/weather/{location_id}.html",
+        "daily": daily,
+        "refer": REFER,
+    }
+
+
+def create_app(latency: float = 0.1, jitter: float = 0.0) -> FastAPI:
+    """创建模拟服务
+
+    参数:
+        latency: 每个请求的固定延迟（秒）
+        jitter: 在固定延迟上叠加的随机抖动上限（秒）
+    """
+    app = FastAPI()
+    app.state.calls = {"geo": 0, "now": 0, "forecast": 0}
+
+    async def _delay():
+        await asyncio.sleep(latency + random.uniform(0, jitter))
+
+    @app.get("/geo/v2/city/lookup")
+    async def city_lookup(location: str):
+        app.state.calls["geo"] += 1
+        await _delay()
+        location_id = CITIES.get(location)
+        if not location_id:
+            return {"code": "404"}
+        return {
+            "code": "200",
+            "location": [{"name": location, "id": location_id, "adm1": location}],
+            "refer": REFER,
+        }
+
+    @app.get("/v7/weather/now")
+    async def weather_now(location: str):
+        app.state.calls["now"] += 1
+        await _delay()
+        return _now_payload(location)
+
+    @app.get("/v7/weather/{days}d")
+    async def weather_forecast(days: int, location: str):
+        app.state.calls["forecast"] += 1
+        await _delay()
+        return _forecast_payload(location, days)
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class MockServer:
+    """在后台线程中运行的 uvicorn 服务"""
+
+    def __init__(self, app: FastAPI, port: int | None = None):
+        self.app = app
+        self.port = port or _free_port()
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "MockServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
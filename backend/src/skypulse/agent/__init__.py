@@ -1,8 +1,17 @@
 """Agent 模块
 
 提供天气查询相关的 AI Agent 功能。
-"""
 
-from skypulse.agent.agent import WeatherAgent
+WeatherAgent 依赖 LangChain / OpenAI SDK（导入约 1.5 秒），在首次访问时才导入，
+导入 skypulse.agent 下的轻量模块（回答缓存、快速路径、预取）不会加载它们。
+"""
 
 __all__ = ["WeatherAgent"]
+
+
+def __getattr__(name: str):
+    if name == "WeatherAgent":
+        from skypulse.agent.agent import WeatherAgent
+
+        return WeatherAgent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,44 +1,85 @@
 """LangChain Weather Agent"""
 
-import re
+import logging
 
 from langchain.agents import create_agent
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import AIMessage, HumanMessage
 
-from skypulse.core.config import settings
+from skypulse.agent import fast_path
+from skypulse.agent.llm_pool import (
+    LLM_FAILURE_ERRORS,
+    AgentContext,
+    LLMPool,
+    LLMRoutingMiddleware,
+)
+from skypulse.agent.prefetch import WeatherPrefetch
+from skypulse.agent.response_cache import response_cache
+from skypulse.core.config import LLMEndpointConfig, settings
+from skypulse.core.metrics import instrument
 from skypulse.services.qweather_service import qweather_tool
+from skypulse.utils import deadline
+from skypulse.utils.resilience import Upstream
 
+logger = logging.getLogger(__name__)
 
-# 检测LLM是否需要城市（回复中包含这类关键词）
-CITY_REQUIRED_PATTERNS = [
-    "哪个城市", "哪个城市", "告诉", "城市名称", "城市吗", 
-    "想查询哪个城市", "请告诉我", "请说", "请问您"
-]
+# LLM 调用保护：限制并发，连续故障时熔断（直接失败而不是堆积在超时上）
+llm_upstream = Upstream(
+    "llm",
+    max_concurrency=settings.llm_max_concurrency,
+    failure_threshold=settings.circuit_failure_threshold,
+    recovery_time=settings.circuit_recovery_time,
+    # 只统计 LLM SDK 的错误，工具调用（和风天气）的失败由各自的熔断器负责
+    failure_errors=LLM_FAILURE_ERRORS,
+)
+
+# 回放缓存回答时每个片段的字符数
+REPLAY_CHUNK_CHARS = 16
+
+
+def _usage_tokens(messages) -> int:
+    """汇总本轮 AI 消息的 token 用量（模型未返回用量时为 0）"""
+    return sum(
+        (getattr(msg, "usage_metadata", None) or {}).get("total_tokens", 0)
+        for msg in messages
+        if msg.type == "ai"
+    )
+
+
+def _is_json_like(content: str) -> bool:
+    """判断片段是否是完整的 JSON 对象或数组"""
+    stripped = content.strip()
+    return (stripped[:1], stripped[-1:]) in (("{", "}"), ("[", "]"))
 
 
 class WeatherAgent:
     """天气 Agent 封装"""
 
-    def __init__(self, api_key: str = None, base_url: str = None, model: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = None,
+        model: str = None,
+        endpoints: list[LLMEndpointConfig] | None = None,
+    ):
         # 使用传入的配置或从 settings 读取
         self.api_key = api_key or settings.openrouter_api_key
         self.base_url = base_url or settings.openrouter_base_url
         self.model = model or settings.openrouter_model
 
-        # 初始化 LLM（使用 OpenRouter 或其他兼容 OpenAI 的 API）
-        self.llm = ChatOpenAI(
-            model=self.model,
-            base_url=self.base_url,
-            api_key=self.api_key,
-            temperature=0.7,
-        )
+        # LLM 端点池（OpenRouter 或其他兼容 OpenAI 的 API）：未配置 LLM_ENDPOINTS 时只有一个端点
+        endpoints = endpoints or settings.llm_endpoints or [
+            LLMEndpointConfig(name="default", base_url=self.base_url, model=self.model)
+        ]
+        self.pool = LLMPool.from_configs(endpoints, api_key=self.api_key)
+        self.llm = self.pool.default_model
 
         self.tools = [qweather_tool]
 
         self.agent = create_agent(
             model=self.llm,
             tools=self.tools,
+            middleware=[LLMRoutingMiddleware(self.pool)],
+            context_schema=AgentContext,
             system_prompt="""
                 你是一个专业的天气助手，专门帮助用户查询天气。
                 工作流程：
@@ -51,78 +92,145 @@ class WeatherAgent:
                 - 如果用户没有指定城市，先询问用户要查询哪个城市
                 - 始终调用工具获取真实的天气数据，不要自己编造
                 - 如果工具调用失败，向用户说明情况
+                - 如果工具结果包含 stale 行，说明对应数据是多少分钟前的
                 - 用中文回复，使用摄氏度表示温度
                 当前日期信息可以帮助你理解用户的需求（如下雨、凉爽等）。
                 """,
             debug=False,
         )
 
-    def _need_city(self, response: str) -> bool:
-        """检测回复是否表明需要城市"""
-        for pattern in CITY_REQUIRED_PATTERNS:
-            if pattern in response:
-                return True
-        return False
+    @staticmethod
+    def _with_city_context(question: str, city: str | None) -> str:
+        """把 IP 定位得到的城市作为上下文放在问题前面"""
+        if not city:
+            return question
+        return f"（用户当前所在城市：{city}，问题中没有指定城市时查询该城市）\n{question}"
 
-    async def query(self, question: str, get_city_by_ip=None) -> str:
+    @instrument("agent.query")
+    async def query(self, question: str, city: str | None = None) -> str:
         """查询天气（非流式）
-        
+
         Args:
             question: 用户问题
-            get_city_by_ip: 可选的同步回调函数，用于通过IP获取城市
+            city: 问题中没有城市时使用的默认城市（由 city_resolver 在调用前解析）
         """
-        # 第一次问LLM
-        result = await self.agent.ainvoke({"messages": [{"role": "user", "content": question}]})
-        
+        # 简单问题直接查询天气并用模板回答
+        if settings.fast_path_enabled:
+            answer = await fast_path.answer(question, city)
+            if answer:
+                return answer
+
+        # 推测要查询的城市，天气请求与回答缓存查找、第一次模型调用并行
+        prefetch = WeatherPrefetch.start(question, city) if settings.prefetch_enabled else None
+        messages = None
+        try:
+            # 同一意图、同一城市、同一天气数据版本的问题直接返回缓存的回答
+            cache_key = None
+            if settings.response_cache_enabled:
+                cache_key = await response_cache.make_key(question, city)
+                cached = await response_cache.get(cache_key) if cache_key else None
+                if cached:
+                    return cached
+
+            # 城市已在调用前确定，LLM 只调用一次；模型和工具调用整体不超过请求的截止时间
+            content = self._with_city_context(question, city)
+            async with deadline.enforce("agent"), llm_upstream.guard():
+                result = await self.agent.ainvoke(
+                    {"messages": [{"role": "user", "content": content}]}
+                )
+            messages = result.get("messages", [])
+        finally:
+            if prefetch is not None and messages is None:
+                prefetch.cancel()
+            elif prefetch is not None:
+                prefetch.finish(
+                    call for msg in messages for call in getattr(msg, "tool_calls", None) or []
+                )
+
         # 获取LLM回复
-        messages = result.get("messages", [])
         response = ""
         for msg in reversed(messages):
             if msg.type == "ai":
                 response = msg.content
                 break
-        
-        # 如果LLM没有要城市，且提供了get_city_by_ip回调，则尝试获取城市
-        if self._need_city(response) and get_city_by_ip:
-            # 获取城市
-            city = get_city_by_ip()
-            if city:
-                print(f"🔍 通过IP获取到城市: {city}")
-                # 把城市加到问题里，再问一次
-                new_question = f"{city} {question}"
-                result = await self.agent.ainvoke({"messages": [{"role": "user", "content": new_question}]})
-                messages = result.get("messages", [])
-                for msg in reversed(messages):
-                    if msg.type == "ai":
-                        return msg.content
-                return str(result)
-        
+
+        # 只缓存基于工具查询结果生成的回答
+        if cache_key and response and any(msg.type == "tool" for msg in messages):
+            await response_cache.set(cache_key, response, _usage_tokens(messages) or None)
+
         return response
 
-    async def stream_query(self, question: str):
-        """流式查询天气 - 逐字输出，只返回AI文本回复"""
-        from langchain_core.messages import HumanMessage, AIMessageChunk
-        
-        # 使用 LLM 的原生流式接口，结合 tool 调用
-        # 首先让 agent 执行 tool 调用
-        full_result = ""
-        
-        async for event in self.agent.astream(
-            {"messages": [HumanMessage(content=question)]},
-            stream_mode="messages"
-        ):
-            # messages 模式返回 (chunk, metadata) 元组
-            if len(event) >= 1:
-                chunk = event[0]
-                # 只处理 AI 消息的增量内容
-                if isinstance(chunk, AIMessageChunk):
+    @instrument("agent.stream_query")
+    async def stream_query(self, question: str, city: str | None = None):
+        """流式查询天气 - 逐字输出AI文本回复
+
+        Args:
+            question: 用户问题
+            city: 问题中没有城市时使用的默认城市
+
+        产出 (事件类型, 数据)：
+            ("message", 文本片段)
+            ("status", 提示信息)，在模型决定调用天气工具时立即发出，工具执行前即可展示
+        """
+        if settings.fast_path_enabled:
+            answer = await fast_path.answer(question, city)
+            if answer:
+                yield "message", answer
+                return
+
+        prefetch = WeatherPrefetch.start(question, city) if settings.prefetch_enabled else None
+        tool_calls: list[dict] = []
+        parts: list[str] = []
+        completed = False
+        try:
+            cache_key = None
+            if settings.response_cache_enabled:
+                cache_key = await response_cache.make_key(question, city)
+                cached = await response_cache.get(cache_key) if cache_key else None
+                if cached:
+                    for i in range(0, len(cached), REPLAY_CHUNK_CHARS):
+                        yield "message", cached[i : i + REPLAY_CHUNK_CHARS]
+                    return
+
+            async with deadline.enforce("agent"), llm_upstream.guard():
+                async for mode, payload in self.agent.astream(
+                    {"messages": [HumanMessage(content=self._with_city_context(question, city))]},
+                    stream_mode=["messages", "updates"],
+                    context=AgentContext(streaming=True),
+                ):
+                    if mode == "updates":
+                        # 模型节点完成：如果决定调用工具，提前告知用户正在查询
+                        for update in payload.values():
+                            for msg in (update or {}).get("messages", []):
+                                for call in getattr(msg, "tool_calls", None) or []:
+                                    tool_calls.append(call)
+                                    tool_city = call.get("args", {}).get("city")
+                                    if tool_city:
+                                        yield "status", f"正在查询{tool_city}的天气…"
+                        continue
+
+                    # messages 模式返回 (chunk, metadata) 元组，只处理 AI 消息的文本增量
+                    # （对冲的模型调用不输出片段，结束时整条发出 AIMessage）
+                    chunk = payload[0]
+                    if not isinstance(chunk, AIMessage) or chunk.tool_calls:
+                        continue
+                    if getattr(chunk, "tool_call_chunks", None):
+                        continue
                     content = chunk.content
-                    if content:
-                        # 过滤掉 JSON 格式的工具返回结果
-                        stripped = content.strip()
-                        if stripped.startswith('{') and stripped.endswith('}'):
-                            continue
-                        if stripped.startswith('[') and stripped.endswith(']'):
-                            continue
-                        # 输出内容
-                        yield content
+                    if not content or not isinstance(content, str):
+                        continue
+                    # 过滤掉 JSON 格式的工具返回结果（可能以换行或制表符开头）
+                    if _is_json_like(content):
+                        continue
+                    parts.append(content)
+                    yield "message", content
+            completed = True
+        finally:
+            # 回答缓存命中、出错或被取消（客户端断开）时没有完整的工具调用记录，直接取消预取
+            if prefetch is not None and not completed:
+                prefetch.cancel()
+            elif prefetch is not None:
+                prefetch.finish(tool_calls)
+
+        if cache_key and tool_calls and parts:
+            await response_cache.set(cache_key, "".join(parts))
@@ -0,0 +1,233 @@
+"""天气问题快速路径
+
+大部分请求是 "北京天气怎么样"、"上海明天下雨吗" 这类单城市、单日期的简单问题。
+这里用规则提取意图（城市来自城市索引，日期来自 今天/明天/后天 等关键词），
+有把握时直接查询天气并用模板生成回答，完全不调用 LLM；
+识别不出或问题更复杂时返回 None，由 WeatherAgent 走完整流程。
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from skypulse.core.metrics import counter, instrument
+from skypulse.models.schemas import WeatherForecast, WeatherNow
+from skypulse.services.qweather_service import get_city_weather
+from skypulse.utils.city_index import city_index
+from skypulse.utils.deadline import DeadlineExceeded
+from skypulse.utils.resilience import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+FAST_PATH = counter(
+    "skypulse_fast_path_total",
+    "快速路径处理结果（hit: 模板回答，miss: 未识别意图，fallback: 查询失败转交 Agent）",
+    ["result"],
+)
+
+# 问题过长时通常带有额外要求，交给 LLM
+MAX_QUESTION_CHARS = 30
+
+WEATHER_KEYWORDS = ("天气", "下雨", "有雨", "降雨", "气温", "温度", "带伞", "冷不冷", "热不热")
+RAIN_KEYWORDS = ("下雨", "有雨", "降雨", "带伞")
+
+# 出现这些词说明问题涉及多个城市、时间段或建议，模板无法准确回答
+REJECT_KEYWORDS = (
+    ("和", "与", "跟", "还是", "对比", "比较", "哪个", "哪里")
+    + ("昨天", "周末", "这周", "本周", "下周", "一周", "未来", "几天")
+    + ("早上", "上午", "中午", "下午", "晚上", "夜里", "今晚")
+    + ("穿", "适合", "建议", "为什么")
+)
+
+# 按长度从长到短匹配，避免 "大后天" 被识别为 "后天"
+DAY_KEYWORDS = (
+    ("大后天", 3),
+    ("后天", 2),
+    ("明天", 1),
+    ("明日", 1),
+    ("今天", 0),
+    ("今日", 0),
+    ("现在", 0),
+    ("目前", 0),
+)
+
+DAY_NAMES = {0: "今天", 1: "明天", 2: "后天", 3: "大后天"}
+
+# 问题去掉这些词后为空，说明没有提到任何地点，可以放心使用默认城市
+_FILLER_RE = re.compile(
+    "|".join(
+        [keyword for keyword, _ in DAY_KEYWORDS]
+        + list(WEATHER_KEYWORDS)
+        + ["请问", "怎么样", "如何", "多少", "度", "会", "要", "吗", "呢", "啊", "的", "了"]
+    )
+    + r"|[\s\W_]+"
+)
+
+
+@dataclass
+class WeatherIntent:
+    """从问题中提取出的查询意图"""
+
+    city: str
+    day_offset: int  # 0 = 今天（附带实时天气），1 = 明天 ...
+    rain: bool  # 是否在问会不会下雨
+
+
+def _day_offset(question: str) -> Optional[int]:
+    """提取日期偏移，未提到日期时按今天处理，提到多个不同日期时返回 None"""
+    offsets = set()
+    for keyword, offset in DAY_KEYWORDS:
+        if keyword in question:
+            offsets.add(offset)
+            question = question.replace(keyword, "")
+    if len(offsets) > 1:
+        return None
+    return offsets.pop() if offsets else 0
+
+
+def extract_intent(question: str, default_city: Optional[str] = None) -> Optional[WeatherIntent]:
+    """从问题中提取城市和日期，不能确定时返回 None
+
+    参数:
+        question: 用户问题
+        default_city: 问题中没有城市时使用的城市（IP 定位结果，可能是英文名），
+            只在问题除天气和日期词外不含其他内容时使用，回答中使用城市索引里的中文名
+
+    返回:
+        WeatherIntent，或 None（交给 Agent 处理）
+    """
+    question = question.strip()
+    if not question or len(question) > MAX_QUESTION_CHARS:
+        return None
+    # 含英文字母的问题（英文提问、拼音城市名等）交给 LLM
+    if any(c.isascii() and c.isalpha() for c in question):
+        return None
+    if not any(keyword in question for keyword in WEATHER_KEYWORDS):
+        return None
+    if any(keyword in question for keyword in REJECT_KEYWORDS):
+        return None
+
+    cities = city_index.find_in_text(question)
+    if not cities and default_city and not _FILLER_RE.sub("", question):
+        city = city_index.chinese_name(default_city)
+        if city is None and not default_city.isascii():
+            city = default_city
+        if city is None:
+            # 没有中文名的英文城市名无法套用中文模板
+            return None
+    elif len(cities) == 1:
+        city = cities[0][0]
+    else:
+        return None
+
+    day_offset = _day_offset(question)
+    if day_offset is None:
+        return None
+
+    return WeatherIntent(
+        city=city,
+        day_offset=day_offset,
+        rain=any(keyword in question for keyword in RAIN_KEYWORDS),
+    )
+
+
+def _format_date(value: str) -> str:
+    """2024-05-01 -> 5月1日"""
+    _, month, day = value.split("-")
+    return f"{int(month)}月{int(day)}日"
+
+
+def _rain_sentence(forecast: WeatherForecast) -> str:
+    if "雨" in forecast.textDay:
+        return f"预计有{forecast.textDay}，出门记得带伞。"
+    return f"预计不会下雨，白天{forecast.textDay}。"
+
+
+def _stale_note(weather: dict, names: tuple[str, ...]) -> str:
+    """使用了过期数据时附加的数据龄说明"""
+    ages = [age for name, age in (weather.get("stale") or {}).items() if name in names]
+    if not ages:
+        return ""
+    return f"（数据更新于约 {max(1, round(max(ages) / 60))} 分钟前）"
+
+
+def render_answer(intent: WeatherIntent, weather: dict) -> Optional[str]:
+    """根据天气数据生成模板回答，数据不完整时返回 None
+
+    参数:
+        intent: 查询意图
+        weather: get_city_weather 的返回值
+    """
+    if weather.get("errors"):
+        return None
+    forecast_data = weather["forecast"]
+    if forecast_data.get("code") != "200":
+        return None
+    daily = forecast_data.get("daily") or []
+    if len(daily) <= intent.day_offset:
+        return None
+
+    forecast = WeatherForecast.from_qweather(daily[intent.day_offset])
+    day_name = DAY_NAMES[intent.day_offset]
+    temp_range = f"{forecast.tempMin}~{forecast.tempMax}°C"
+    wind = f"{forecast.windDirDay} {forecast.windScaleDay} 级"
+
+    if intent.day_offset > 0:
+        header = f"{intent.city}{day_name}（{_format_date(forecast.date)}）"
+        note = _stale_note(weather, ("forecast",))
+        if intent.rain:
+            return f"{header}{_rain_sentence(forecast)}气温 {temp_range}，{wind}。{note}"
+        return f"{header}白天{forecast.textDay}，气温 {temp_range}，{wind}。{note}"
+
+    current_data = weather["current"]
+    if current_data.get("code") != "200":
+        return None
+    now = WeatherNow(**current_data["now"])
+    current = (
+        f"{intent.city}现在{now.text}，气温 {now.temp}°C（体感 {now.feelsLike}°C），"
+        f"{now.windDir} {now.windScale} 级，湿度 {now.humidity}%。"
+    )
+    note = _stale_note(weather, ("current", "forecast"))
+    if intent.rain:
+        return f"{current}今天{_rain_sentence(forecast)}气温 {temp_range}。{note}"
+    return f"{current}今天白天{forecast.textDay}，气温 {temp_range}。{note}"
+
+
+@instrument("agent.fast_path")
+async def answer(question: str, default_city: Optional[str] = None) -> Optional[str]:
+    """尝试用快速路径回答问题
+
+    参数:
+        question: 用户问题
+        default_city: 问题中没有城市时使用的城市
+
+    返回:
+        模板生成的回答；无法识别意图或查询失败时返回 None
+
+    异常:
+        DeadlineExceeded: 超过请求的截止时间（不再转交 Agent）
+        UpstreamUnavailable: 上游熔断或限速（Agent 调用同一个上游也会失败）
+    """
+    intent = extract_intent(question, default_city)
+    if intent is None:
+        FAST_PATH.inc(result="miss")
+        return None
+
+    try:
+        days = 3 if intent.day_offset < 3 else 7
+        weather = await get_city_weather(intent.city, days)
+        text = render_answer(intent, weather)
+    except (DeadlineExceeded, UpstreamUnavailable):
+        raise
+    except Exception as e:
+        logger.warning("fast_path_error", extra={"city": intent.city, "error": str(e)})
+        text = None
+
+    if text is None:
+        FAST_PATH.inc(result="fallback")
+        return None
+
+    FAST_PATH.inc(result="hit")
+    logger.info("fast_path_hit", extra={"city": intent.city, "day_offset": intent.day_offset})
+    return text
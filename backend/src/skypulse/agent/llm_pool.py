@@ -0,0 +1,355 @@
+"""LLM 端点池与路由
+
+配置多个 OpenAI 兼容端点（LLM_ENDPOINTS）后，Agent 的每次模型调用由 LLMRoutingMiddleware 选择端点：
+- 分级: 工具选择调用和普通回答使用 fast 端点；一轮查询的工具结果数达到 llm_strong_min_tool_calls
+  （如多城市对比）时，回答由 strong 端点生成。某一级没有可用端点时使用另一级
+- 路由: 同一级中选择该类调用平均耗时（EWMA）最短、且熔断器放行的端点；没有耗时数据的端点优先，
+  并按 llm_explore_ratio 随机选择其他端点，使恢复正常的端点重新获得统计
+- 故障转移: 端点返回连接错误、5xx 或限流时换下一个端点重试
+- 对冲: 调用超过该端点同类调用耗时的 p95（llm_hedge_quantile）仍未返回时，向下一个端点再发一次，
+  取先返回的结果；同一级没有其他端点时不对冲（向同一端点重复请求只会加重它的负载）。
+  流式接口的回答生成不对冲（片段已经发给用户，无法在两个请求之间切换），
+  工具选择调用照常对冲：对冲的请求不输出流式片段（langgraph 的 nostream 标签），
+  结果在模型节点结束时整条发出
+
+端点耗时和调用结果见 skypulse_llm_call_seconds、skypulse_llm_calls_total，
+各端点的状态见 GET /api/v1/llm/stats。
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import openai
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_openai import ChatOpenAI
+from langgraph.constants import TAG_NOSTREAM
+
+from skypulse.core.config import LLMEndpointConfig, settings
+from skypulse.core.metrics import counter, histogram
+from skypulse.utils.resilience import CircuitBreaker, UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+LLM_CALLS = counter(
+    "skypulse_llm_calls_total",
+    "LLM 端点调用结果（ok / error / failover: 故障转移到该端点 / hedge: 发出对冲请求"
+    " / hedge_won: 对冲请求先返回）",
+    ["endpoint", "result"],
+)
+LLM_LATENCY = histogram(
+    "skypulse_llm_call_seconds",
+    "LLM 单次调用耗时（秒，kind: tool 为工具选择，answer 为回答生成）",
+    ["endpoint", "kind"],
+)
+
+# 视为端点故障（计入熔断、触发故障转移）的 LLM SDK 异常
+LLM_FAILURE_ERRORS = (openai.APIConnectionError, openai.InternalServerError, openai.RateLimitError)
+
+# 计算对冲延迟所需的最少样本数
+HEDGE_MIN_SAMPLES = 8
+
+
+@dataclass
+class AgentContext:
+    """Agent 运行时上下文（create_agent 的 context_schema）"""
+
+    # 流式输出：回答生成的片段直接发给用户，不能对冲
+    streaming: bool = False
+
+
+class LatencyTracker:
+    """最近若干次调用的耗时：EWMA 用于选择端点，分位数用于计算对冲延迟"""
+
+    def __init__(self, window: int = 64, alpha: float = 0.2):
+        self.samples: deque[float] = deque(maxlen=window)
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.ewma = seconds if self.ewma is None else self.ewma + self.alpha * (seconds - self.ewma)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """最近样本的 q 分位数，样本不足时返回 None"""
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _call_kind(messages: list) -> tuple[str, int]:
+    """判断模型调用的类型
+
+    返回:
+        (类型, 本轮工具结果数)；最后一条消息是工具结果时为 "answer"（生成回答），
+        否则为 "tool"（工具选择）
+    """
+    tool_results = 0
+    for msg in reversed(messages):
+        if msg.type == "human":
+            break
+        if msg.type == "tool":
+            tool_results += 1
+    kind = "answer" if messages and messages[-1].type == "tool" else "tool"
+    return kind, tool_results
+
+
+class LLMEndpoint:
+    """一个 LLM 端点：模型客户端、熔断器和耗时统计"""
+
+    def __init__(self, name: str, tier: str, model: ChatOpenAI):
+        self.name = name
+        self.tier = tier
+        self.model = model
+        # 对冲时使用的副本：不输出流式片段，避免两个请求的片段混在一起
+        self.silent_model = model.model_copy(update={"tags": [*(model.tags or []), TAG_NOSTREAM]})
+        self.breaker = CircuitBreaker(
+            f"llm:{name}", settings.circuit_failure_threshold, settings.circuit_recovery_time
+        )
+        self.latency = {"tool": LatencyTracker(), "answer": LatencyTracker()}
+
+    async def connect(self):
+        """与端点建立连接（服务启动预热用），连接留在 OpenAI SDK 的连接池中供后续调用复用
+
+        请求模型列表接口；收到任何响应（包括 4xx）都说明连接已建立。
+        """
+        client = self.model.root_async_client.with_options(max_retries=0)
+        try:
+            await client.models.list()
+        except openai.APIStatusError:
+            pass
+
+    def score(self, kind: str) -> float:
+        """路由排序依据：该类调用的平均耗时，没有数据时为 0（优先尝试）"""
+        return self.latency[kind].ewma or 0.0
+
+    def stats(self) -> dict:
+        return {
+            "tier": self.tier,
+            "model": self.model.model_name,
+            "circuit": self.breaker.state,
+            **{
+                f"{kind}_ewma_ms": round(tracker.ewma * 1000, 1) if tracker.ewma else None
+                for kind, tracker in self.latency.items()
+            },
+        }
+
+
+class LLMPool:
+    """LLM 端点池：分级、按耗时排序和对冲延迟计算"""
+
+    def __init__(
+        self,
+        endpoints: list[LLMEndpoint],
+        hedge_enabled: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.3,
+        strong_min_tool_calls: int = 2,
+        explore_ratio: float = 0.05,
+    ):
+        """
+        参数:
+            endpoints: 端点列表，第一个为创建 Agent 时使用的默认端点
+            hedge_enabled: 是否发出对冲请求
+            hedge_quantile: 对冲延迟取端点耗时的分位数
+            hedge_min_delay: 对冲延迟下限（秒）
+            strong_min_tool_calls: 工具结果数达到该值时由 strong 端点生成回答，0 表示不使用
+            explore_ratio: 随机选择非最快端点的比例
+        """
+        if not endpoints:
+            raise ValueError("LLM 端点池至少需要一个端点")
+        self.endpoints = endpoints
+        self.hedge_enabled = hedge_enabled
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.strong_min_tool_calls = strong_min_tool_calls
+        self.explore_ratio = explore_ratio
+
+    @classmethod
+    def from_configs(cls, configs: list[LLMEndpointConfig], api_key: str = "") -> "LLMPool":
+        """按配置创建端点池（端点未配置 api_key 时使用 api_key）"""
+        endpoints = [
+            LLMEndpoint(
+                config.name,
+                config.tier,
+                ChatOpenAI(
+                    model=config.model,
+                    base_url=config.base_url,
+                    api_key=config.api_key or api_key,
+                    temperature=0.7,
+                    timeout=settings.llm_timeout,
+                    max_retries=settings.llm_max_retries,
+                ),
+            )
+            for config in configs
+        ]
+        return cls(
+            endpoints,
+            hedge_enabled=settings.llm_hedge_enabled,
+            hedge_quantile=settings.llm_hedge_quantile,
+            hedge_min_delay=settings.llm_hedge_min_delay,
+            strong_min_tool_calls=settings.llm_strong_min_tool_calls,
+            explore_ratio=settings.llm_explore_ratio,
+        )
+
+    @property
+    def default_model(self) -> ChatOpenAI:
+        return self.endpoints[0].model
+
+    def tier_for(self, kind: str, tool_results: int) -> str:
+        """工具结果数达到阈值的回答生成使用 strong 端点，其余使用 fast 端点"""
+        if kind == "answer" and 0 < self.strong_min_tool_calls <= tool_results:
+            return "strong"
+        return "fast"
+
+    def candidates(self, tier: str, kind: str) -> list[LLMEndpoint]:
+        """按优先级排列的端点：同一级按平均耗时排序（偶尔随机提前一个），另一级排在后面"""
+        same = sorted((e for e in self.endpoints if e.tier == tier), key=lambda e: e.score(kind))
+        others = sorted((e for e in self.endpoints if e.tier != tier), key=lambda e: e.score(kind))
+        if len(same) > 1 and random.random() < self.explore_ratio:
+            same.insert(0, same.pop(random.randrange(1, len(same))))
+        return same + others
+
+    def hedge_delay(self, endpoint: LLMEndpoint, kind: str, streaming: bool) -> Optional[float]:
+        """对冲延迟：端点该类调用耗时的分位数（不低于下限）
+
+        未启用、流式回答生成或样本不足时返回 None（不对冲）
+        """
+        if not self.hedge_enabled or (streaming and kind == "answer"):
+            return None
+        quantile = endpoint.latency[kind].quantile(self.hedge_quantile)
+        if quantile is None:
+            return None
+        return max(self.hedge_min_delay, quantile)
+
+    async def connect(self):
+        """并发与所有端点建立连接（服务启动预热用），连接失败只记录日志（调用时会重新连接）"""
+        results = await asyncio.gather(
+            *(endpoint.connect() for endpoint in self.endpoints), return_exceptions=True
+        )
+        for endpoint, result in zip(self.endpoints, results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    "llm_connect_failed", extra={"endpoint": endpoint.name, "error": str(result)}
+                )
+
+    def stats(self) -> dict:
+        return {endpoint.name: endpoint.stats() for endpoint in self.endpoints}
+
+
+def _admit(endpoint: LLMEndpoint) -> bool:
+    """熔断器是否放行该端点（放行后必须记录结果或释放）"""
+    try:
+        endpoint.breaker.before_call()
+    except UpstreamUnavailable:
+        return False
+    return True
+
+
+class LLMRoutingMiddleware(AgentMiddleware):
+    """为 Agent 的每次模型调用选择端点，负责故障转移和对冲"""
+
+    def __init__(self, pool: LLMPool):
+        super().__init__()
+        self.pool = pool
+
+    async def _attempt(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+        endpoint: LLMEndpoint,
+        kind: str,
+        silent: bool = False,
+    ) -> ModelResponse:
+        """在已被熔断器放行的端点上执行一次调用，并记录耗时和结果"""
+        start = time.perf_counter()
+        model = endpoint.silent_model if silent else endpoint.model
+        try:
+            response = await handler(request.override(model=model))
+        except LLM_FAILURE_ERRORS as e:
+            endpoint.breaker.record_failure()
+            LLM_CALLS.inc(endpoint=endpoint.name, result="error")
+            logger.warning("llm_endpoint_error", extra={"endpoint": endpoint.name, "error": str(e)})
+            raise
+        except BaseException:
+            endpoint.breaker.release()
+            raise
+        elapsed = time.perf_counter() - start
+        endpoint.breaker.record_success()
+        endpoint.latency[kind].observe(elapsed)
+        LLM_LATENCY.observe(elapsed, endpoint=endpoint.name, kind=kind)
+        LLM_CALLS.inc(endpoint=endpoint.name, result="ok")
+        return response
+
+    async def _hedged(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+        primary: LLMEndpoint,
+        backups: list[LLMEndpoint],
+        kind: str,
+        delay: float,
+    ) -> ModelResponse:
+        """先调用 primary，delay 秒后仍未返回时向 backups 中第一个可用端点再发一次
+
+        backups 都被熔断时不发对冲请求，只等待 primary。
+        """
+        first = self._attempt(request, handler, primary, kind, silent=True)
+        tasks = {asyncio.ensure_future(first): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                backup = next((e for e in backups if e is not primary and _admit(e)), None)
+                if backup is not None:
+                    LLM_CALLS.inc(endpoint=backup.name, result="hedge")
+                    task = self._attempt(request, handler, backup, kind, silent=True)
+                    tasks[asyncio.ensure_future(task)] = backup
+
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1 and next(iter(tasks)) is not task:
+                            LLM_CALLS.inc(endpoint=tasks[task].name, result="hedge_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        kind, tool_results = _call_kind(request.messages)
+        streaming = getattr(request.runtime.context, "streaming", False)
+        candidates = self.pool.candidates(self.pool.tier_for(kind, tool_results), kind)
+
+        error: Optional[BaseException] = None
+        for i, endpoint in enumerate(candidates):
+            if not _admit(endpoint):
+                continue
+            if error is not None:
+                LLM_CALLS.inc(endpoint=endpoint.name, result="failover")
+            try:
+                delay = self.pool.hedge_delay(endpoint, kind, streaming)
+                backups = [e for e in candidates[i + 1 :] if e.tier == endpoint.tier]
+                if delay is not None and backups:
+                    return await self._hedged(request, handler, endpoint, backups, kind, delay)
+                return await self._attempt(request, handler, endpoint, kind)
+            except LLM_FAILURE_ERRORS as e:
+                error = e
+
+        if error is not None:
+            raise error
+        retry_after = min(endpoint.breaker.retry_after() for endpoint in candidates)
+        raise UpstreamUnavailable("llm", "all endpoints unavailable", retry_after)
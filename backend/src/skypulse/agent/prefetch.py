@@ -0,0 +1,124 @@
+"""Agent 天气数据推测预取
+
+问题里已经写了城市时，LLM 几乎一定会调用 qweather_tool 查询它，但天气请求要等到
+第一次模型调用返回后才开始。这里在调用 LLM 之前按本地规则推测要查询的城市
+（城市索引在问题中找到的城市，没有时用 IP 定位得到的默认城市），
+立即开始解析 LocationID 并获取实时天气和预报，与第一次模型调用并行。
+
+预取结果写入 QWeatherService 的缓存：工具执行时数据已在缓存中，或正在加载（请求合并，
+等待同一个请求而不是重新发起）。Agent 结束后对照实际的工具调用结算：
+- used: 工具查询了该城市
+- wasted: 工具没有查询该城市（未完成的预取被取消）
+- error: 预取失败（工具调用时会重新请求）
+回答缓存命中、Agent 出错或被取消（客户端断开、超过截止时间）时取消全部预取，不计入统计。
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from skypulse.core.metrics import counter
+from skypulse.services.qweather_service import qweather_service
+from skypulse.utils.city_index import city_index
+
+logger = logging.getLogger(__name__)
+
+PREFETCH = counter(
+    "skypulse_weather_prefetch_total",
+    "推测预取的城市数（used: 工具查询了该城市，wasted: 未查询，error: 预取失败）",
+    ["result"],
+)
+
+# 一个问题最多预取的城市数
+MAX_CITIES = 3
+
+# 出现这些词时模型通常会查询 7 天预报
+WEEK_KEYWORDS = ("一周", "7天", "七天", "未来", "下周", "这周", "本周", "周末", "几天")
+
+
+@dataclass
+class _Speculation:
+    city: str
+    location_id: Optional[str]
+    task: asyncio.Task
+
+
+async def _fetch(city: str, location_id: Optional[str], days: int):
+    """预取一个城市的实时天气和预报（不计入 popularity，避免推测请求影响热门城市统计）"""
+    if location_id is None:
+        location_id = await qweather_service.get_location_id(city)
+    await asyncio.gather(
+        qweather_service.get_current_weather(location_id),
+        qweather_service.get_forecast(location_id, days),
+    )
+
+
+def _log_error(task: asyncio.Task):
+    """取走预取任务的异常（失败由工具调用时重新请求兜底，这里只记录）"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.debug("prefetch_error", extra={"error": str(task.exception())})
+
+
+class WeatherPrefetch:
+    """一次 Agent 调用中的推测预取"""
+
+    def __init__(self, speculations: list[_Speculation]):
+        self.speculations = speculations
+
+    @classmethod
+    def start(cls, question: str, default_city: Optional[str] = None) -> "WeatherPrefetch":
+        """推测问题要查询的城市并开始预取
+
+        参数:
+            question: 用户问题
+            default_city: 问题中没有城市时使用的城市（IP 定位结果）
+        """
+        cities: list[tuple[str, Optional[str]]] = list(city_index.find_in_text(question))
+        if not cities and default_city:
+            cities = [(default_city, city_index.lookup(default_city))]
+        days = 7 if any(keyword in question for keyword in WEEK_KEYWORDS) else 3
+
+        speculations = []
+        for city, location_id in cities[:MAX_CITIES]:
+            task = asyncio.ensure_future(_fetch(city, location_id, days))
+            task.add_done_callback(_log_error)
+            speculations.append(_Speculation(city, location_id, task))
+        return cls(speculations)
+
+    def cancel(self):
+        """Agent 没有完成（回答缓存命中、出错或被取消）时取消尚未完成的预取，不计入统计"""
+        for speculation in self.speculations:
+            speculation.task.cancel()
+        self.speculations = []
+
+    def _is_used(self, speculation: _Speculation, tool_cities: set[str]) -> bool:
+        if speculation.city in tool_cities:
+            return True
+        return speculation.location_id is not None and any(
+            city_index.lookup(city) == speculation.location_id for city in tool_cities
+        )
+
+    def finish(self, tool_calls: Iterable[dict]):
+        """按实际的工具调用结算预取结果，取消没有用上且尚未完成的预取
+
+        参数:
+            tool_calls: 本次 Agent 运行中模型发出的工具调用（LangChain tool_calls 格式）
+        """
+        tool_cities = {
+            call["args"]["city"]
+            for call in tool_calls
+            if call.get("name") == "qweather_tool" and call.get("args", {}).get("city")
+        }
+        for speculation in self.speculations:
+            task = speculation.task
+            if task.done() and (task.cancelled() or task.exception() is not None):
+                result = "error"
+            elif self._is_used(speculation, tool_cities):
+                result = "used"
+            else:
+                result = "wasted"
+                # 取消等待；没有其他请求在等待的缓存加载随之取消，不再占用上游
+                task.cancel()
+            PREFETCH.inc(result=result)
+        self.speculations = []
@@ -0,0 +1,192 @@
+"""Agent 回答缓存
+
+同一城市、同一问法的问题在天气数据更新之前得到的回答相同，没必要每次都让 LLM 重新生成。
+缓存键由三部分组成：
+- 归一化的问题意图：去掉城市名、标点、空白和语气词
+- 城市的 LocationID（来自城市索引）
+- 天气数据版本：实时天气的 obsTime + 问题所需天数（3 或 7 天）预报的 updateTime，
+  数据更新后旧回答自然失效
+
+TTL 与实时天气缓存一致，超出条目数上限时按 LRU 淘汰；
+配置 RESPONSE_CACHE_PATH 后在退出时写入 JSON 文件，启动时加载；
+配置 CACHE_BACKEND_URL 后回答在多个 worker 之间共享。
+"""
+
+import json
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Optional
+
+from skypulse.core.config import settings
+from skypulse.core.metrics import counter, register_cache
+from skypulse.services.qweather_service import qweather_service
+from skypulse.utils.cache_backend import shared_cache
+from skypulse.utils.city_index import city_index
+from skypulse.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+TOKENS_SAVED = counter(
+    "skypulse_response_cache_tokens_saved_total",
+    "回答缓存命中时节省的 LLM token 数（无用量数据时按回答字数估算）",
+)
+
+_NOISE_RE = re.compile(r"[\s\W_]+|请问|一下|呢|啊|呀|吧|嘛")
+
+# 问到这些时间范围时 Agent 会查询 7 天预报（见 query_city_weather 的 days 参数）
+WEEK_KEYWORDS = ("一周", "七天", "7天", "这周", "本周", "下周", "周末", "星期", "未来", "几天")
+
+CacheKey = tuple[str, str, str]
+
+
+def normalize_question(question: str, city: str) -> str:
+    """去掉城市名（及紧跟的 "市"）、标点、空白和语气词，得到问题意图"""
+    intent = re.sub(re.escape(city) + "市?", "", question, count=1)
+    return _NOISE_RE.sub("", intent).lower()
+
+
+def weather_version(weather: dict) -> Optional[str]:
+    """天气数据版本：实时天气观测时间 + 预报更新时间，数据不完整时返回 None"""
+    if weather.get("errors"):
+        return None
+    try:
+        return f"{weather['current']['now']['obsTime']}|{weather['forecast']['updateTime']}"
+    except (KeyError, TypeError):
+        return None
+
+
+def forecast_days(question: str) -> int:
+    """问题需要的预报天数：问到一周或更远时为 7，否则为 3"""
+    return 7 if any(keyword in question for keyword in WEEK_KEYWORDS) else 3
+
+
+def estimate_tokens(text: str) -> int:
+    """没有用量数据时的粗略估算：中文约每字一个 token"""
+    return len(text)
+
+
+class ResponseCache:
+    """按问题意图、LocationID 和天气数据版本缓存 Agent 回答"""
+
+    def __init__(self, max_entries: int = 1024, path: str = ""):
+        """
+        参数:
+            max_entries: 最大条目数
+            path: 持久化文件路径，为空时不落盘
+        """
+        self.path = path
+        self.cache = TTLCache(max_entries=max_entries)
+        self.shared = shared_cache("response")
+        self.tokens_saved = 0
+
+    async def make_key(
+        self, question: str, default_city: Optional[str] = None
+    ) -> Optional[CacheKey]:
+        """计算问题的缓存键
+
+        只处理问题中明确提到一个城市、或没有城市但有默认城市的情况；天气数据取自天气缓存
+        （未命中时会请求上游，Agent 随后的工具调用直接命中缓存）。读取数据版本不计入城市热度，
+        热度只由真正的天气查询累计。
+
+        参数:
+            question: 用户问题
+            default_city: 问题中没有城市时使用的城市（IP 定位结果）
+
+        返回:
+            (问题意图, LocationID, 天气数据版本)，无法确定时返回 None
+        """
+        cities = city_index.find_in_text(question)
+        if not cities and default_city:
+            city, location_id = default_city, city_index.lookup(default_city)
+        elif len(cities) == 1:
+            city, location_id = cities[0]
+        else:
+            return None
+        if not location_id:
+            return None
+
+        try:
+            weather = await qweather_service.fetch_weather(
+                location_id, forecast_days(question), count=False
+            )
+        except Exception as e:
+            logger.warning("response_cache_key_error", extra={"city": city, "error": str(e)})
+            return None
+
+        version = weather_version(weather)
+        if version is None:
+            return None
+        return normalize_question(question, city), location_id, version
+
+    async def get(self, key: CacheKey) -> Optional[str]:
+        """读取缓存的回答（进程内未命中时查共享后端），命中时累计节省的 token 数"""
+        entry = self.cache.get(key)
+        if entry is None and self.shared:
+            found = await self.shared.get(key)
+            if found is not None:
+                entry, remaining = found
+                self.cache.set(key, entry, remaining)
+        if entry is None:
+            return None
+        self.tokens_saved += entry["tokens"]
+        TOKENS_SAVED.inc(entry["tokens"])
+        return entry["text"]
+
+    async def set(self, key: CacheKey, text: str, tokens: Optional[int] = None):
+        """缓存回答
+
+        参数:
+            key: make_key 返回的缓存键
+            text: 回答文本
+            tokens: 生成该回答消耗的 token 数，未知时按字数估算
+        """
+        entry = {"text": text, "tokens": tokens or estimate_tokens(text)}
+        self.cache.set(key, entry, ttl=settings.qweather_cache_now_ttl)
+        await self.shared.set(key, entry, settings.qweather_cache_now_ttl)
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {**self.cache.stats(), "tokens_saved": self.tokens_saved}
+
+    def load(self):
+        """从持久化文件加载未过期的条目"""
+        if not self.path or not Path(self.path).exists():
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("response_cache_load_error", extra={"path": self.path, "error": str(e)})
+            return
+
+        now = time.time()
+        for item in entries:
+            ttl = item["expires_at"] - now
+            if ttl > 0:
+                self.cache.set(tuple(item["key"]), item["value"], ttl)
+        logger.info("response_cache_loaded", extra={"entries": len(self.cache)})
+
+    def save(self):
+        """把未过期的条目写入持久化文件（过期时间转换为墙上时钟）"""
+        if not self.path:
+            return
+        now = time.time()
+        entries = [
+            {"key": list(key), "value": value, "expires_at": now + ttl}
+            for key, value, ttl in self.cache.items()
+        ]
+        try:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning("response_cache_save_error", extra={"path": self.path, "error": str(e)})
+
+
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    path=settings.response_cache_path,
+)
+register_cache("response", response_cache.stats)
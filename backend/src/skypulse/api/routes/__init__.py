@@ -4,5 +4,7 @@
 """
 
 from skypulse.api.routes.agent import router
+from skypulse.api.routes.metrics import router as metrics_router
+from skypulse.api.routes.weather import router as weather_router
 
-__all__ = ["router"]
+__all__ = ["router", "metrics_router", "weather_router"]
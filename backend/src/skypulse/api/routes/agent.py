@@ -1,19 +1,64 @@
 """REST API 路由"""
 
-from fastapi import APIRouter, Request
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Callable, Optional
+
+from fastapi import APIRouter, Request, Response
 from fastapi.responses import StreamingResponse
 
-from skypulse.agent.agent import WeatherAgent
+from skypulse.agent.response_cache import response_cache
 from skypulse.core.config import settings
+from skypulse.core.metrics import counter, histogram
 from skypulse.models.schemas import ChatRequest, ChatResponse
-from skypulse.services.ip_service import get_city_by_ip, get_public_ip
+from skypulse.services import ip_service
+from skypulse.services.city_resolver import client_ip_from_request, resolve_city
+from skypulse.services.qweather_service import qweather_service
+from skypulse.utils import deadline
+from skypulse.utils.admission import AdmissionController
+from skypulse.utils.deadline import DeadlineExceeded
+from skypulse.utils.disconnect import ClientDisconnected, cancel_on_disconnect
+from skypulse.utils.resilience import UpstreamUnavailable
+from skypulse.utils.sse import sse_frame, sse_stream
+
+if TYPE_CHECKING:
+    from skypulse.agent.agent import WeatherAgent
 
 router = APIRouter(prefix="/api/v1", tags=["weather"])
+logger = logging.getLogger(__name__)
+
+STREAM_TTFB = histogram("skypulse_stream_ttfb_seconds", "流式接口首字节延迟（秒）")
+STREAM_TTFT = histogram("skypulse_stream_ttft_seconds", "流式接口首个文本片段延迟（秒）")
+STREAM_FRAMES = histogram(
+    "skypulse_stream_frames", "每个流式响应发送的 SSE 帧数", buckets=(1, 2, 5, 10, 20, 50, 100, 200)
+)
+CHAT_CANCELLED = counter(
+    "skypulse_chat_cancelled_total",
+    "中途取消的聊天请求数（disconnect: 客户端断开，deadline: 超过截止时间）",
+    ["endpoint", "reason"],
+)
+
+# 客户端已断开时记录的状态码（沿用 Nginx 的 499 Client Closed Request）
+STATUS_CLIENT_CLOSED = 499
 
+# /chat 和 /chat/stream 共用的准入控制
+chat_admission = AdmissionController(
+    max_concurrency=settings.chat_max_concurrency,
+    max_queue=settings.chat_queue_size,
+    queue_timeout=settings.chat_queue_timeout,
+    per_client=settings.chat_client_max_concurrency,
+)
 
-def get_agent() -> WeatherAgent:
-    """获取天气 Agent 实例（懒加载）"""
+
+def get_agent() -> "WeatherAgent":
+    """获取天气 Agent 实例（懒加载，服务启动时由 warmup 提前创建）
+
+    WeatherAgent 依赖的 LangChain / OpenAI SDK 在这里才导入，不影响其他接口的启动。
+    """
     if not hasattr(get_agent, "_instance"):
+        from skypulse.agent.agent import WeatherAgent
+
         # 从配置文件读取 API key 和 base_url
         get_agent._instance = WeatherAgent(
             api_key=settings.openrouter_api_key,
@@ -29,191 +74,206 @@ async def health_check():
     return {"status": "ok", "service": "skypulse"}
 
 
+@router.get("/cache/stats")
+async def cache_stats():
+    """缓存统计（命中、未命中、合并请求数等）"""
+    return {
+        "weather": qweather_service.cache.stats(),
+        "ip": ip_service.ip_cache.stats(),
+        "response": response_cache.stats(),
+    }
+
+
+@router.get("/admission/stats")
+async def admission_stats():
+    """聊天请求准入控制状态（执行数、排队数、估算的 Retry-After）"""
+    return chat_admission.stats()
+
+
+@router.get("/llm/stats")
+async def llm_stats():
+    """LLM 端点池状态（分级、熔断状态、各类调用的平均耗时）"""
+    return get_agent().pool.stats()
+
+
 @router.get("/ip")
 async def get_client_ip(request: Request):
     """
     获取客户端 IP 地址（调试用）
     正常情况下 IP 由 Nginx 通过 X-Real-IP 传递
     """
-    # 优先从 X-Real-IP 获取（Nginx 传递的真实 IP）
-    real_ip = request.headers.get("X-Real-IP")
-    if real_ip:
-        return {"ip": real_ip, "source": "X-Real-IP"}
-    
-    # 其次从 X-Forwarded-For 获取
-    forwarded_for = request.headers.get("X-Forwarded-For")
-    if forwarded_for:
-        ip = forwarded_for.split(",")[0].strip()
-        return {"ip": ip, "source": "X-Forwarded-For"}
-    
-    # 最后使用客户端 IP
-    if request.client:
-        return {"ip": request.client.host, "source": "client"}
-    
-    return {"ip": None, "source": "unknown"}
+    ip, source = client_ip_from_request(request)
+    return {"ip": ip, "source": source}
+
+
+def _client_key(request: ChatRequest, http_request: Request) -> str:
+    """准入控制的客户端标识：优先使用 user_id，其次使用客户端 IP"""
+    if request.user_id:
+        return f"user:{request.user_id}"
+    ip = client_ip_from_request(http_request)[0]
+    return f"ip:{ip or 'unknown'}"
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """发送结束（包括客户端断开、生成器没有开始执行）时释放准入名额的流式响应"""
+
+    def __init__(self, content, release: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+def _start_city_resolution(request: ChatRequest, http_request: Request) -> asyncio.Task:
+    """在请求入口启动城市解析（本地提取 + IP 定位），与后续处理并发进行"""
+    client_ip = request.ip or client_ip_from_request(http_request)[0]
+    return asyncio.create_task(resolve_city(request.message, client_ip))
 
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest, http_request: Request):
     """
     聊天接口 - 接收用户消息，调用天气 Agent 处理
-    
-    如果LLM无法从问题中提取城市，会自动通过IP获取城市并再次询问LLM
+
+    调用 LLM 之前先解析城市：问题中没有城市时通过 IP 定位，结果作为上下文传给 Agent。
+    整个处理不超过 chat_deadline（超时返回 504），客户端断开时立即取消进行中的模型和上游调用。
+    同时执行的请求数受准入控制限制，满载时排队，队列满或排队超时返回 503，单客户端超限返回 429。
     """
-    # 获取客户端IP
-    def get_city_from_ip():
-        return _get_city_from_request(http_request)
-    
+    deadline.set_deadline(settings.chat_deadline)
+
     # 获取 Agent 实例
     agent = get_agent()
 
-    # 调用 Agent 处理用户消息（传入IP获取城市的回调）
-    response_text = await agent.query(request.message, get_city_by_ip=get_city_from_ip)
+    async def answer() -> str:
+        async with chat_admission.admit(_client_key(request, http_request)):
+            resolution = _start_city_resolution(request, http_request)
+            async with deadline.enforce("city"):
+                city = (await resolution).city
+            # 调用 Agent 处理用户消息（只调用一次）
+            return await agent.query(request.message, city=city)
+
+    try:
+        response_text = await cancel_on_disconnect(http_request, answer())
+    except ClientDisconnected:
+        CHAT_CANCELLED.inc(endpoint="chat", reason="disconnect")
+        logger.info("chat_cancelled", extra={"reason": "disconnect"})
+        return Response(status_code=STATUS_CLIENT_CLOSED)
+    except DeadlineExceeded:
+        CHAT_CANCELLED.inc(endpoint="chat", reason="deadline")
+        raise
 
     # 返回响应
     return ChatResponse(response=response_text)
 
 
-def _get_city_from_request(request: Request) -> str:
-    """从请求中获取IP并转换为城市"""
-    # 直接获取公网IP并转换为城市（不依赖Nginx header）
-    # 使用 ipify.org 获取公网IP，然后用 ip-api.com 获取城市
-    
-    try:
-        import requests
-        # 获取公网IP
-        ip_resp = requests.get("https://api.ipify.org?format=json", timeout=5)
-        public_ip = ip_resp.json().get("ip")
-        
-        if not public_ip:
-            return None
-            
-        print(f"✅ 获取到公网IP: {public_ip}")
-        
-        # 获取城市和国籍
-        city_resp = requests.get(f"http://ip-api.com/json/{public_ip}?fields=status,country,countryCode,city", timeout=5)
-        data = city_resp.json()
-        
-        if data.get("status") == "success":
-            country = data.get("country", "")
-            city = data.get("city", "")
-            
-            # 只返回中国城市的IP定位结果
-            if country in ("China", "中国") or data.get("countryCode") == "CN":
-                print(f"✅ 获取到中国城市: {city}")
-                return city
-            else:
-                print(f"⚠️ IP位于 {country} {city}，不是中国城市，跳过自动定位")
-                return None
-        
-        return None
-    except Exception as e:
-        print(f"❌ 获取城市失败: {e}")
-        return None
-
-
-async def get_user_message(message: str, http_request: Request) -> tuple[str, str]:
-    """
-    获取用户消息，如果没提供城市则自动获取当前城市
-    
-    返回: (处理后的消息, 提示信息)
-    """
-    print()
-    print("=" * 80)
-    print("🔍 开始处理用户消息 - 自动城市识别")
-    print("=" * 80)
-    print(f"📝 原始用户消息: {message}")
-    
-    # 检查消息是否包含城市关键词
-    city_keywords = ["北京", "上海", "广州", "深圳", "杭州", "南京", "成都", "重庆", 
-                    "武汉", "西安", "苏州", "天津", "长沙", "郑州", "济南", "青岛",
-                    "城市", "地点", "哪里", "哪个城市"]
-    
-    has_city = any(keyword in message for keyword in city_keywords)
-    print(f"🔍 是否包含城市关键词: {has_city}")
-    
-    hint = ""
-    
-    # 如果没有提到城市，自动获取用户 IP 对应的城市
-    if not has_city:
-        client_ip = None
-        ip_source = None
-        
-        # 1. 优先从 X-Real-IP 获取（Nginx 传递的真实 IP）
-        real_ip = http_request.headers.get("X-Real-IP")
-        if real_ip:
-            client_ip = real_ip
-            ip_source = "X-Real-IP"
-            print(f"📍 从 X-Real-IP 获取到 IP: {client_ip}")
-        
-        # 2. 其次从 X-Forwarded-For 获取
-        if not client_ip:
-            forwarded_for = http_request.headers.get("X-Forwarded-For")
-            if forwarded_for:
-                client_ip = forwarded_for.split(",")[0].strip()
-                ip_source = "X-Forwarded-For"
-                print(f"📍 从 X-Forwarded-For 获取到 IP: {client_ip}")
-        
-        # 3. 最后使用客户端 IP
-        if not client_ip and http_request.client:
-            client_ip = http_request.client.host
-            ip_source = "client"
-            print(f"📍 从客户端获取到 IP: {client_ip}")
-        
-        print(f"📍 最终使用的 IP: {client_ip} (来源: {ip_source})")
-        
-        if client_ip:
-            # 调用 IP 定位服务
-            city, status = await get_city_by_ip(client_ip)
-            
-            if city:
-                message = f"{city} {message}"
-                print(f"✅ 已将城市添加到消息: {message}")
-            else:
-                # IP 定位失败（可能是内网 IP）
-                hint = f"⚠️ 当前为内网访问模式，无法自动获取您所在城市。请在问题中直接说明您想查询的城市，例如：'上海天气怎么样？'"
-                print(f"❌ {hint}")
-        else:
-            hint = "⚠️ 无法获取您的IP地址，请在问题中直接说明您想查询的城市。"
-            print(f"❌ {hint}")
-    else:
-        print("✅ 用户消息已包含城市关键词，跳过自动城市识别")
-    
-    print("=" * 80)
-    return message, hint
-
-
 @router.post("/chat/stream")
 async def chat_stream(request: ChatRequest, http_request: Request):
     """
     流式聊天接口 - SSE 流式传输
     
-    如果用户没有提供城市，会自动根据 Nginx 传递的真实 IP 获取用户所在城市
+    如果用户没有提供城市，会自动根据 Nginx 传递的真实 IP 获取用户所在城市，
+    城市解析与响应头发送并发进行。
+    文本片段按 stream_flush_interval 合并成帧，模型决定查询天气时先发送 status 事件，
+    长时间无输出时发送心跳注释。
+    整个流不超过 chat_stream_deadline（超时发送提示后结束）；客户端断开时 Starlette 取消响应生成器，
+    取消沿生成器传递到 Agent 和进行中的上游调用。
+    准入控制与 /chat 相同，排队在发送响应头之前进行，因此未被准入时仍能返回 429 / 503。
     """
-    # 处理消息，自动补充城市信息
-    processed_message, hint = await get_user_message(request.message, http_request)
-    
+    start_time = time.perf_counter()
+    deadline.set_deadline(settings.chat_stream_deadline)
     agent = get_agent()
 
+    try:
+        release = await cancel_on_disconnect(
+            http_request, chat_admission.acquire(_client_key(request, http_request))
+        )
+    except ClientDisconnected:
+        CHAT_CANCELLED.inc(endpoint="chat_stream", reason="disconnect")
+        return Response(status_code=STATUS_CLIENT_CLOSED)
+
+    resolution_task: Optional[asyncio.Task] = None
+    timings = {}
+
+    def on_first_message():
+        ttft = time.perf_counter() - start_time
+        timings["ttft_ms"] = round(ttft * 1000, 2)
+        STREAM_TTFT.observe(ttft)
+
     async def generate():
         """生成 SSE 事件流"""
-        # 如果有提示，先发送提示
-        if hint:
-            yield f"data: {hint}\n\n"
-        
-        async for chunk in agent.stream_query(processed_message):
-            # SSE 格式: data: <内容>\n\n
-            yield f"data: {chunk}\n\n"
-
-        # 发送结束标记
-        yield "data: [DONE]\n\n"
-
-    return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
+        frames = 0
+        try:
+            async with deadline.enforce("city"):
+                resolution = await resolution_task
+            # 无法确定城市时先发送提示
+            if resolution.hint:
+                yield sse_frame(resolution.hint)
+                frames += 1
+
+            async for frame in sse_stream(
+                agent.stream_query(request.message, city=resolution.city),
+                flush_interval=settings.stream_flush_interval,
+                heartbeat_interval=settings.stream_heartbeat_interval,
+                max_chars=settings.stream_max_frame_chars,
+                on_first_message=on_first_message,
+            ):
+                if frames == 0:
+                    ttfb = time.perf_counter() - start_time
+                    timings["ttfb_ms"] = round(ttfb * 1000, 2)
+                    STREAM_TTFB.observe(ttfb)
+                frames += 1
+                yield frame
+
+            # 发送结束标记
+            yield sse_frame("[DONE]")
+        except UpstreamUnavailable as e:
+            # 响应头已经发出，无法再返回 503，改为发送提示
+            logger.warning(
+                "chat_stream_unavailable", extra={"upstream": e.upstream, "reason": e.reason}
+            )
+            yield sse_frame("⚠️ 天气助手暂时繁忙，请稍后再试。")
+            yield sse_frame("[DONE]")
+        except DeadlineExceeded as e:
+            CHAT_CANCELLED.inc(endpoint="chat_stream", reason="deadline")
+            logger.warning("chat_stream_deadline", extra={"stage": e.stage})
+            yield sse_frame("⚠️ 查询超时，请稍后再试。")
+            yield sse_frame("[DONE]")
+        except asyncio.CancelledError:
+            # 客户端断开，Starlette 取消了响应
+            CHAT_CANCELLED.inc(endpoint="chat_stream", reason="disconnect")
+            raise
+        finally:
+            resolution_task.cancel()
+            STREAM_FRAMES.observe(frames)
+            logger.info(
+                "chat_stream",
+                extra={
+                    "frames": frames,
+                    "duration_ms": round((time.perf_counter() - start_time) * 1000, 2),
+                    **timings,
+                },
+            )
+
+    # 名额交给响应之后由响应在发送结束时释放，在此之前出错时在这里释放
+    try:
+        # 城市解析在后台进行，响应头无需等待 IP 定位
+        resolution_task = _start_city_resolution(request, http_request)
+        return _AdmittedStreamingResponse(
+            generate(),
+            release=release,
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",
+            },
+        )
+    except BaseException:
+        if resolution_task is not None:
+            resolution_task.cancel()
+        release()
+        raise
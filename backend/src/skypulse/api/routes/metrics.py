@@ -0,0 +1,21 @@
+"""监控指标路由"""
+
+import asyncio
+import os
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from skypulse.core.config import settings
+from skypulse.core.metrics import CONTENT_TYPE, read_snapshots, registry
+
+router = APIRouter(tags=["monitoring"])
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus 格式的监控指标（多 worker 时合并所有 worker 的快照）"""
+    others = []
+    if settings.metrics_dir:
+        others = await asyncio.to_thread(read_snapshots, settings.metrics_dir, os.getpid())
+    return Response(registry.exposition(others), media_type=CONTENT_TYPE)
@@ -0,0 +1,43 @@
+"""天气数据路由（不经过 LLM）"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from skypulse.core.config import settings
+from skypulse.models.schemas import WeatherBatchRequest, WeatherBatchResponse
+from skypulse.services.weather_batch import fetch_batch
+
+router = APIRouter(prefix="/api/v1/weather", tags=["weather"])
+
+
+@router.post("/batch", response_model=WeatherBatchResponse)
+async def weather_batch(request: WeatherBatchRequest):
+    """
+    批量天气查询 - 一次获取多个城市的实时天气和预报
+
+    locations 可以是城市名或 LocationID，重复的地点只查询一次。
+    stream 为 true 时以 NDJSON（application/x-ndjson）逐行返回，每个城市完成即输出一行；
+    否则等全部完成后按请求顺序返回。
+    """
+    if len(request.locations) > settings.weather_batch_max_locations:
+        raise HTTPException(
+            status_code=422,
+            detail=f"单次最多查询 {settings.weather_batch_max_locations} 个地点",
+        )
+
+    items = fetch_batch(
+        request.locations, days=request.days, concurrency=settings.weather_batch_concurrency
+    )
+
+    if request.stream:
+
+        async def generate():
+            async for item in items:
+                yield item.model_dump_json() + "\n"
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    results = {item.query: item async for item in items}
+    return WeatherBatchResponse(
+        results=[results[query.strip()] for query in request.locations if query.strip()]
+    )
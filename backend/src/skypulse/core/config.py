@@ -1,21 +1,169 @@
 """配置管理模块"""
 
+from typing import Literal
+
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 
 
+class LLMEndpointConfig(BaseModel):
+    """LLM 端点配置（OpenAI 兼容接口）"""
+
+    name: str
+    base_url: str
+    model: str
+    # 为空时使用 OPENROUTER_API_KEY
+    api_key: str = ""
+    # fast: 工具选择和普通回答，strong: 需要时才使用的大模型
+    tier: Literal["fast", "strong"] = "fast"
+
+
 class Settings(BaseSettings):
     """应用配置"""
 
     # API Keys
     qweather_api_key: str = ""
     qweather_base_url: str = ""
+    # IP 定位服务地址（基准测试时指向本地模拟服务）
+    ip_api_base_url: str = "http://ip-api.com"
+    public_ip_url: str = "https://api.ipify.org?format=json"
     openrouter_api_key: str = ""
     openrouter_base_url: str = ""
     openrouter_model: str = ""
 
+    # 和风天气 HTTP 客户端（连接池与分阶段超时，单位：秒）
+    qweather_http2: bool = False
+    qweather_max_connections: int = 100
+    qweather_max_keepalive_connections: int = 20
+    qweather_keepalive_expiry: float = 30.0
+    qweather_connect_timeout: float = 5.0
+    qweather_read_timeout: float = 10.0
+    qweather_write_timeout: float = 10.0
+    qweather_pool_timeout: float = 5.0
+
+    # 和风天气响应缓存（TTL 单位：秒，与和风天气的数据更新频率对齐）
+    qweather_cache_now_ttl: int = 600
+    qweather_cache_forecast_ttl: int = 3 * 3600
+    qweather_cache_max_entries: int = 2048
+    qweather_cache_max_bytes: int = 32 * 1024 * 1024
+    # 过期后再保留的时长（下面各窗口的上限）
+    qweather_cache_stale_ttl: int = 3600
+    # stale-while-revalidate：过期不超过该时长的数据立即返回并在后台刷新（0 表示关闭）
+    qweather_cache_now_swr: int = 300
+    qweather_cache_forecast_swr: int = 1800
+    # stale-if-error：上游故障或熔断时最多返回过期多久的数据
+    qweather_cache_now_stale_if_error: int = 1800
+    qweather_cache_forecast_stale_if_error: int = 3600
+
+    # 上游保护：限速（每秒请求数，0 表示不限）、突发容量、并发上限、重试次数、
+    # 对冲延迟（秒，0 表示不对冲）
+    qweather_rate_limit: float = 20.0
+    qweather_rate_burst: int = 40
+    qweather_max_concurrency: int = 64
+    qweather_retries: int = 2
+    qweather_hedge_delay: float = 1.0
+    # ip-api.com 免费版限制 45 次/分钟；令牌不足时直接跳过 IP 定位
+    ip_api_rate_limit: float = 0.75
+    ip_api_rate_burst: int = 45
+    # LLM 调用：并发上限、单次请求超时（秒）、SDK 内部重试次数
+    llm_max_concurrency: int = 32
+    llm_timeout: float = 60.0
+    llm_max_retries: int = 1
+    # LLM 端点池（JSON 列表，见 LLMEndpointConfig），为空时只使用上面的 OpenRouter 配置
+    llm_endpoints: list[LLMEndpointConfig] = []
+    # LLM 对冲请求：超过该端点同类调用耗时的 llm_hedge_quantile 分位数（不低于最小延迟）仍未返回时
+    # 向另一个端点再发一次，取先返回的结果（流式接口只对冲工具选择调用）
+    llm_hedge_enabled: bool = False
+    llm_hedge_quantile: float = 0.95
+    llm_hedge_min_delay: float = 0.3
+    # 一轮查询的工具结果数达到该值时（如多城市对比）由 strong 端点生成回答，0 表示不使用 strong 端点
+    llm_strong_min_tool_calls: int = 2
+    # 随机选择非最快端点的比例，使恢复正常的端点重新获得耗时统计
+    llm_explore_ratio: float = 0.05
+    # 等待限速令牌的最长时间（秒），超过直接失败
+    upstream_max_wait: float = 1.0
+    # 熔断：连续失败次数阈值、熔断持续时间（秒）
+    circuit_failure_threshold: int = 5
+    circuit_recovery_time: float = 30.0
+    # 聊天请求的端到端截止时间（秒，含城市解析、模型调用和工具调用），0 表示不限
+    chat_deadline: float = 90.0
+    chat_stream_deadline: float = 120.0
+    # 聊天请求准入控制：同时执行的请求数上限（0 表示不限）、等待队列长度、最长排队时间（秒）、
+    # 单个客户端（user_id 或 IP）执行中 + 排队中的请求数上限（0 表示不限）
+    chat_max_concurrency: int = 32
+    chat_queue_size: int = 64
+    chat_queue_timeout: float = 10.0
+    chat_client_max_concurrency: int = 4
+
+    # 热门城市后台预热：在缓存过期前 提前量 + 随机抖动 秒刷新前 N 个城市（单位：秒）
+    prewarm_enabled: bool = True
+    prewarm_top_n: int = 32
+    prewarm_interval: float = 30.0
+    prewarm_lead: float = 120.0
+    prewarm_jitter: float = 60.0
+    # 预热请求的全局速率预算（每秒请求数）
+    prewarm_rate: float = 5.0
+
+    # IP 定位缓存（TTL 单位：秒）
+    ip_cache_ttl: int = 24 * 3600
+    ip_cache_max_entries: int = 10000
+    # 本地 IP 段数据库（CSV 或 .mmdb），为空时只使用 ip-api.com
+    ip_database_path: str = ""
+
+    # SSE 流式输出：文本片段合并间隔、单帧最大字符数、心跳间隔（秒）
+    stream_flush_interval: float = 0.05
+    stream_max_frame_chars: int = 512
+    stream_heartbeat_interval: float = 10.0
+
+    # 批量天气接口：单次请求的地点数上限、并发请求上游的地点数
+    weather_batch_max_locations: int = 50
+    weather_batch_concurrency: int = 8
+
+    # 天气工具返回给 LLM 的数据格式：table（紧凑表格）/ json（紧凑 JSON）/ raw（原始响应）
+    tool_payload_format: str = "table"
+
+    # 快速路径：简单的单城市天气问题直接查询并用模板回答，不调用 LLM
+    fast_path_enabled: bool = True
+    # 调用 LLM 前推测要查询的城市，天气请求与模型调用并行
+    prefetch_enabled: bool = True
+
+    # Agent 回答缓存：相同意图 + 相同城市 + 相同天气数据版本直接返回上次的回答
+    response_cache_enabled: bool = True
+    response_cache_max_entries: int = 1024
+    # 持久化文件路径（JSON），为空时只保存在内存中
+    response_cache_path: str = ""
+
+    # 日志配置
+    log_level: str = "INFO"
+    log_json: bool = True
+    # 请求日志采样率（0~1），状态码 >= 400 的请求总是记录
+    log_sample_rate: float = 1.0
+    # 不记录请求日志的路径
+    log_skip_paths: list[str] = ["/health", "/api/v1/health", "/metrics"]
+
+    # 多 worker 指标汇总：各 worker 把指标快照写入该目录，/metrics 抓取时合并；
+    # 为空且 worker 数大于 1 时启动命令自动创建临时目录。写入间隔单位：秒
+    metrics_dir: str = ""
+    metrics_flush_interval: float = 5.0
+
+    # 跨 worker 共享的缓存后端（sqlite:///path 或 redis://host:6379/0），留空则只使用进程内缓存
+    cache_backend_url: str = ""
+
     # 应用配置
     app_host: str = "0.0.0.0"
     app_port: int = 8000
+    # worker 进程数（0 表示按可用 CPU 核数），大于 1 时建议配置 CACHE_BACKEND_URL
+    app_workers: int = 0
+    # 代码变更时自动重载（仅用于开发，开启时只能单进程）
+    app_reload: bool = False
+    # 事件循环和 HTTP 解析器，auto 表示已安装 uvloop / httptools 时使用它们
+    app_loop: str = "auto"
+    app_http: str = "auto"
+    # worker 启动（导入模块、启动预热）的最长等待时间（秒），超时的 worker 会被重启
+    app_worker_startup_timeout: int = 30
+    # 开始接受请求前预热 Agent、上游连接和本地数据；单个网络步骤的最长等待时间（秒）
+    warmup_enabled: bool = True
+    warmup_timeout: float = 10.0
 
     class Config:
         env_file = ".env"
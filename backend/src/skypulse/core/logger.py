@@ -0,0 +1,90 @@
+"""结构化日志模块
+
+所有日志输出为 JSON Lines（或开发时的纯文本），经 QueueHandler 放入队列，
+由后台线程的 QueueListener 写到 stdout，请求处理协程不会阻塞在 I/O 上。
+
+使用方式:
+    logger = logging.getLogger(__name__)
+    logger.info("ip_lookup", extra={"ip": ip, "city": city})
+
+extra 中的字段会原样出现在 JSON 中。
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+from skypulse.core.config import settings
+
+# LogRecord 自带的属性，其余属性视为 extra 字段
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JSONFormatter(logging.Formatter):
+    """把日志记录格式化为单行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """开发用的单行文本格式，extra 字段以 key=value 追加"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(
+            f"{key}={value}"
+            for key, value in vars(record).items()
+            if key not in _RESERVED_ATTRS and not key.startswith("_")
+        )
+        return f"{line} {fields}" if fields else line
+
+
+def setup_logging():
+    """配置 skypulse 日志：队列 + 后台线程输出（重复调用无副作用）"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter() if settings.log_json else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    _listener.start()
+
+    logger = logging.getLogger("skypulse")
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    logger.setLevel(settings.log_level.upper())
+    logger.propagate = False
+
+
+def shutdown_logging():
+    """停止后台线程并输出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
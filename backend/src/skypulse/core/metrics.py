@@ -0,0 +1,481 @@
+"""Prometheus 格式的轻量指标模块
+
+- Counter / Gauge / Histogram 支持标签
+- 每个指标一把锁；写入只在锁内更新一个字典项，开销远小于一次请求
+- 每个 worker 进程各自计数；多 worker 时由 SnapshotWriter 周期性把本进程的快照写入共享目录
+  （<pid>.json），抓取时读取其他 worker 的快照与本进程的合并：计数器和直方图求和，
+  已退出 worker 的仪表不再计入
+- instrument 装饰器为协程、异步生成器和普通函数记录耗时、错误数和进行中的数量
+- register_cache 注册缓存的 stats() 回调，抓取时导出为 skypulse_cache_* 指标
+
+不依赖 prometheus_client，输出 text exposition format 0.0.4。
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类：按标签值存储，写入和抓取共用一把锁"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def _snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def dump(self) -> dict:
+        """可 JSON 序列化的快照，用于跨 worker 汇总"""
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "documentation": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": [[list(key), value] for key, value in self._snapshot().items()],
+        }
+
+    def merge(self, values: list):
+        """把另一个 worker 的快照值（dump()["values"]）累加到本指标"""
+        with self._lock:
+            for key, value in values:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._snapshot().items()):
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """可增可减的仪表"""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                # [每个桶的计数..., sum, count]
+                data = self._values[key] = [0] * (len(self.buckets) + 2)
+            data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def _snapshot(self) -> dict:
+        with self._lock:
+            return {key: list(data) for key, data in self._values.items()}
+
+    def dump(self) -> dict:
+        data = super().dump()
+        data["buckets"] = list(self.buckets[:-1])
+        return data
+
+    def merge(self, values: list):
+        with self._lock:
+            for key, counts in values:
+                key = tuple(key)
+                data = self._values.get(key)
+                if data is None:
+                    self._values[key] = list(counts)
+                else:
+                    self._values[key] = [a + b for a, b in zip(data, counts)]
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for key, data in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_count{labels} {data[-1]}")
+        return lines
+
+
+CACHE_FIELDS = (
+    ("hits", "counter"),
+    ("misses", "counter"),
+    ("coalesced", "counter"),
+    ("evictions", "counter"),
+    ("stale", "counter"),
+    ("revalidations", "counter"),
+    ("shared_hits", "counter"),
+    ("abandoned", "counter"),
+    ("entries", "gauge"),
+    ("bytes", "gauge"),
+    ("hit_ratio", "gauge"),
+)
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._caches: dict[str, Callable[[], dict]] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def register_cache(self, name: str, stats: Callable[[], dict]):
+        """注册缓存统计回调（返回 TTLCache.stats() 格式的字典）"""
+        self._caches[name] = stats
+
+    def snapshot(self) -> dict:
+        """当前进程所有指标和缓存统计的快照（可 JSON 序列化）"""
+        return {
+            "pid": os.getpid(),
+            "live": True,
+            "metrics": [metric.dump() for metric in self._metrics.values()],
+            "caches": {name: stats() for name, stats in self._caches.items()},
+        }
+
+    def exposition(self, others: Iterable[dict] = ()) -> str:
+        """输出 text exposition format；others 为其他 worker 的快照，与本进程的合并后输出"""
+        return render([self.snapshot(), *others])
+
+
+def _merge_caches(snapshots: list[dict]) -> dict[str, dict]:
+    """合并各 worker 的缓存统计：计数求和，已退出 worker 的仪表不计入，命中率按合并后的计数重算"""
+    kinds = dict(CACHE_FIELDS)
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot["caches"].items():
+            target = merged.setdefault(name, {})
+            for field, value in data.items():
+                if field == "hit_ratio" or field not in kinds:
+                    continue
+                if kinds[field] == "gauge" and not snapshot["live"]:
+                    continue
+                target[field] = target.get(field, 0) + value
+            if "hit_ratio" in data:
+                target["hit_ratio"] = data["hit_ratio"]
+    if len(snapshots) > 1:
+        for data in merged.values():
+            if "hit_ratio" in data and "hits" in data and "misses" in data:
+                total = data["hits"] + data["misses"]
+                data["hit_ratio"] = round(data["hits"] / total, 4) if total else 0.0
+    return merged
+
+
+def _collect_caches(caches: dict[str, dict]) -> list[str]:
+    lines = []
+    for field, kind in CACHE_FIELDS:
+        suffix = "_total" if kind == "counter" else ""
+        metric = f"skypulse_cache_{field}{suffix}"
+        samples = [
+            f'{metric}{{cache="{_escape(name)}"}} {_format_value(data[field])}'
+            for name, data in caches.items()
+            if field in data
+        ]
+        if samples:
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(samples)
+    return lines
+
+
+def _from_dump(data: dict) -> _Metric:
+    if data["kind"] == "histogram":
+        return Histogram(data["name"], data["documentation"], data["labelnames"], data["buckets"])
+    cls = Gauge if data["kind"] == "gauge" else Counter
+    return cls(data["name"], data["documentation"], data["labelnames"])
+
+
+def render(snapshots: list[dict]) -> str:
+    """合并多个 worker 的快照（Registry.snapshot() 格式）并输出 text exposition format
+
+    计数器和直方图按标签求和；仪表只累加仍在运行的 worker（live 为真）的值。
+    """
+    merged: dict[str, _Metric] = {}
+    for snapshot in snapshots:
+        for data in snapshot["metrics"]:
+            metric = merged.get(data["name"])
+            if metric is None:
+                metric = merged[data["name"]] = _from_dump(data)
+            if metric.kind == "gauge" and not snapshot["live"]:
+                continue
+            metric.merge(data["values"])
+
+    lines = []
+    for metric in merged.values():
+        lines.extend(metric.collect())
+    lines.extend(_collect_caches(_merge_caches(snapshots)))
+    return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshots(directory: str, exclude_pid: Optional[int] = None) -> list[dict]:
+    """读取目录中其他 worker 写入的快照
+
+    参数:
+        directory: 快照目录
+        exclude_pid: 跳过该进程的快照（抓取的 worker 直接使用内存中的最新数据）
+
+    返回:
+        快照列表；进程已不存在的快照 live 置为 False，读取失败的文件跳过
+    """
+    snapshots = []
+    for path in sorted(Path(directory).glob("*.json")):
+        try:
+            snapshot = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "metrics_snapshot_unreadable", extra={"path": str(path), "error": str(e)}
+            )
+            continue
+        if snapshot.get("pid") == exclude_pid:
+            continue
+        snapshot["live"] = bool(snapshot.get("live")) and _pid_alive(snapshot["pid"])
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def clear_snapshots(directory: str):
+    """删除目录中上一次运行留下的快照（启动 worker 之前调用）"""
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    for path in Path(directory).glob("*.json*"):
+        path.unlink(missing_ok=True)
+
+
+class SnapshotWriter:
+    """周期性地把本进程的指标快照写入 <目录>/<pid>.json，供其他 worker 抓取时合并"""
+
+    def __init__(self, registry: Registry, directory: str, interval: float = 5.0):
+        """
+        参数:
+            registry: 指标注册表
+            directory: 快照目录（所有 worker 相同）
+            interval: 写入间隔（秒），其他 worker 看到的数据最多落后这么久
+        """
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    @property
+    def path(self) -> Path:
+        return Path(self.directory) / f"{os.getpid()}.json"
+
+    def write(self, live: bool = True):
+        """写入快照（先写临时文件再替换，读取方不会读到半个文件）"""
+        snapshot = self.registry.snapshot()
+        snapshot["live"] = live
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(snapshot, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.to_thread(self.write)
+            except Exception as e:
+                logger.warning("metrics_snapshot_write_failed", extra={"error": str(e)})
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except TimeoutError:
+                pass
+
+    def start(self):
+        """启动后台任务（需要在事件循环中调用）"""
+        if self._task is None or self._task.done():
+            Path(self.directory).mkdir(parents=True, exist_ok=True)
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并写入最终快照（标记为已退出，仪表不再计入，计数器保留）"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        try:
+            self.write(live=False)
+        except OSError as e:
+            logger.warning("metrics_snapshot_write_failed", extra={"error": str(e)})
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Iterable[str] = (),
+    buckets: Iterable[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def register_cache(name: str, stats: Callable[[], dict]):
+    registry.register_cache(name, stats)
+
+
+# 各处理阶段（LLM、Geo、天气接口、IP 定位、缓存）的通用指标
+STAGE_DURATION = histogram("skypulse_stage_duration_seconds", "各处理阶段耗时（秒）", ["stage"])
+STAGE_ERRORS = counter("skypulse_stage_errors_total", "各处理阶段抛出异常的次数", ["stage"])
+STAGE_IN_FLIGHT = gauge("skypulse_stage_in_flight", "各处理阶段正在执行的数量", ["stage"])
+
+
+def instrument(stage: str):
+    """记录函数耗时、异常次数和进行中数量的装饰器
+
+    支持普通函数、协程函数和异步生成器（耗时从开始迭代到迭代结束）。
+    """
+
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+
+            @functools.wraps(func)
+            async def gen_wrapper(*args, **kwargs):
+                STAGE_IN_FLIGHT.inc(stage=stage)
+                start = time.perf_counter()
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                except Exception:
+                    STAGE_ERRORS.inc(stage=stage)
+                    raise
+                finally:
+                    STAGE_DURATION.observe(time.perf_counter() - start, stage=stage)
+                    STAGE_IN_FLIGHT.dec(stage=stage)
+
+            return gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                STAGE_IN_FLIGHT.inc(stage=stage)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    STAGE_ERRORS.inc(stage=stage)
+                    raise
+                finally:
+                    STAGE_DURATION.observe(time.perf_counter() - start, stage=stage)
+                    STAGE_IN_FLIGHT.dec(stage=stage)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            STAGE_IN_FLIGHT.inc(stage=stage)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                STAGE_ERRORS.inc(stage=stage)
+                raise
+            finally:
+                STAGE_DURATION.observe(time.perf_counter() - start, stage=stage)
+                STAGE_IN_FLIGHT.dec(stage=stage)
+
+        return wrapper
+
+    return decorator
@@ -1,23 +1,74 @@
 """FastAPI 应用入口"""
 
-import json
+import argparse
+import atexit
+import logging
+import os
+import random
+import shutil
+import tempfile
 import time
 from contextlib import asynccontextmanager
-from datetime import datetime
 
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
-from skypulse.api.routes import router
-from skypulse.utils.location_cache import init_cache
+from skypulse.agent.response_cache import response_cache
+from skypulse.api.routes import metrics_router, router, weather_router
+from skypulse.api.routes.agent import get_agent
+from skypulse.core.config import settings
+from skypulse.core.logger import setup_logging, shutdown_logging
+from skypulse.core.metrics import SnapshotWriter, clear_snapshots, counter, histogram, registry
+from skypulse.services import ip_service
+from skypulse.services.prewarmer import prewarmer
+from skypulse.services.qweather_service import qweather_service
+from skypulse.services.warmup import warm_up
+from skypulse.utils.admission import AdmissionRejected
+from skypulse.utils.cache_backend import close_backend
+from skypulse.utils.deadline import DeadlineExceeded
+from skypulse.utils.location_cache import close_cache, init_cache
+from skypulse.utils.resilience import UpstreamUnavailable
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = counter(
+    "skypulse_http_requests_total", "HTTP 请求数", ["method", "route", "status"]
+)
+HTTP_DURATION = histogram(
+    "skypulse_http_request_duration_seconds", "HTTP 请求耗时（秒）", ["method", "route"]
+)
+
+metrics_writer = SnapshotWriter(registry, settings.metrics_dir, settings.metrics_flush_interval)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """启动时初始化缓存数据库"""
+    """启动时初始化缓存数据库、本地 IP 库，预热 Agent 和上游连接，启动后台预热
+
+    预热完成后才开始接受请求（健康检查可访问即表示服务已就绪）。配置了 METRICS_DIR 时
+    周期性写入本 worker 的指标快照。退出时停止预热、提交缓存写入并关闭共享的 HTTP 连接池
+    """
+    setup_logging()
     init_cache()
+    ip_service.init_ip_database()
+    response_cache.load()
+    if settings.warmup_enabled:
+        await warm_up(get_agent)
+    if settings.prewarm_enabled:
+        prewarmer.start()
+    if settings.metrics_dir:
+        metrics_writer.start()
     yield
+    await metrics_writer.stop()
+    await prewarmer.stop()
+    response_cache.save()
+    await qweather_service.aclose()
+    await ip_service.aclose()
+    await close_cache()
+    await close_backend()
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -28,87 +79,90 @@ app = FastAPI(
 )
 
 
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable):
+    """上游熔断或限速时快速返回 503，并告知客户端何时重试"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "服务繁忙，请稍后再试", "upstream": exc.upstream, "reason": exc.reason},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """聊天请求未被准入：单客户端超限返回 429，服务满载返回 503，并告知客户端何时重试"""
+    detail = "请求过于频繁，请稍后再试" if exc.status_code == 429 else "服务繁忙，请稍后再试"
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": detail, "reason": exc.reason},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    """请求超过截止时间，进行中的上游调用已取消"""
+    return JSONResponse(
+        status_code=504, content={"detail": "请求超时，请稍后再试", "stage": exc.stage}
+    )
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """日志中间件 - 记录所有请求的详细信息"""
-    start_time = time.time()
-    
-    # 记录请求开始时间
-    request_start = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-    
-    # 获取客户端 IP
-    client_ip = request.client.host if request.client else "unknown"
-    real_ip = request.headers.get("X-Real-IP", "N/A")
-    forwarded_for = request.headers.get("X-Forwarded-For", "N/A")
-    
-    # 记录请求头（只记录关键 header）
-    important_headers = {
-        "X-Real-IP": real_ip,
-        "X-Forwarded-For": forwarded_for,
-        "Content-Type": request.headers.get("Content-Type", "N/A"),
-        "User-Agent": request.headers.get("User-Agent", "N/A")[:50] + "..." if len(request.headers.get("User-Agent", "")) > 50 else request.headers.get("User-Agent", "N/A"),
+    """日志中间件 - 记录请求指标，按采样率记录请求日志，DEBUG 级别时才记录请求体"""
+    start_time = time.perf_counter()
+
+    if request.url.path in settings.log_skip_paths:
+        response = await call_next(request)
+        _observe_request(request, response.status_code, start_time)
+        return response
+
+    fields = {
+        "method": request.method,
+        "path": request.url.path,
+        "client_ip": request.client.host if request.client else None,
+        "real_ip": request.headers.get("X-Real-IP"),
+        "forwarded_for": request.headers.get("X-Forwarded-For"),
     }
-    
-    # 尝试获取请求体
-    request_body = {}
-    if request.method in ["POST", "PUT", "PATCH"]:
-        try:
-            body = await request.body()
-            if body:
-                request_body = json.loads(body.decode("utf-8"))
-                # 隐藏敏感信息
-                if "ip" in request_body:
-                    request_body["ip"] = f"[隐藏:{request_body.get('ip')}]"
-        except Exception:
-            request_body = {"error": "无法解析请求体"}
-    
-    # 打印请求开始日志
-    print()
-    print("=" * 80)
-    print(f"📥 请求开始 | {request_start}")
-    print("=" * 80)
-    print(f"🌐 方法: {request.method}")
-    print(f"🔗 URL: {request.url}")
-    print(f"👤 客户端IP: {client_ip}")
-    print(f"📍 X-Real-IP: {real_ip}")
-    print(f"🔄 X-Forwarded-For: {forwarded_for}")
-    print(f"📋 请求头: {json.dumps(important_headers, ensure_ascii=False)}")
-    print(f"📦 请求体: {json.dumps(request_body, ensure_ascii=False, indent=2)}")
-    print("-" * 80)
-    
-    # 继续处理请求
-    response = await call_next(request)
-    
-    # 计算耗时
-    process_time = (time.time() - start_time) * 1000
-    
-    # 记录响应状态
-    response_body = ""
+
+    # 请求体只在 DEBUG 级别记录（需要读取并缓存整个请求体）
+    if logger.isEnabledFor(logging.DEBUG) and request.method in ("POST", "PUT", "PATCH"):
+        body = await request.body()
+        fields["body"] = body[:1000].decode("utf-8", errors="replace")
+
     try:
-        if hasattr(response, 'body') and response.headers.get("content-type", "").startswith("application/json"):
-            response_body = response.body
-            try:
-                response_body = json.loads(response_body.decode("utf-8"))
-                # 隐藏敏感信息
-                if isinstance(response_body, dict) and "response" in response_body:
-                    response_body["response"] = response_body["response"][:100] + "..." if len(response_body.get("response", "")) > 100 else response_body["response"]
-            except Exception:
-                response_body = {"error": "无法解析响应体"}
+        response = await call_next(request)
     except Exception:
-        response_body = {"error": "无法获取响应体"}
-    
-    # 打印请求结束日志
-    print(f"✅ 状态码: {response.status_code}")
-    print(f"⏱️ 耗时: {process_time:.2f}ms")
-    print(f"📦 响应体: {json.dumps(response_body, ensure_ascii=False, indent=2) if isinstance(response_body, dict) else response_body}")
-    print("=" * 80)
-    print()
-    
+        _observe_request(request, 500, start_time)
+        fields["duration_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+        logger.exception("request_failed", extra=fields)
+        raise
+
+    _observe_request(request, response.status_code, start_time)
+    fields["status"] = response.status_code
+    fields["duration_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+
+    if response.status_code >= 400 or random.random() < settings.log_sample_rate:
+        logger.info("request", extra=fields)
+
     return response
 
 
+def _observe_request(request: Request, status: int, start_time: float):
+    """记录 HTTP 请求指标（按路由模板聚合，避免路径参数导致标签爆炸）"""
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "unmatched")
+    HTTP_REQUESTS.inc(method=request.method, route=route_path, status=status)
+    HTTP_DURATION.observe(
+        time.perf_counter() - start_time, method=request.method, route=route_path
+    )
+
+
 # 注册路由
 app.include_router(router)
+app.include_router(weather_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -123,9 +177,63 @@ async def health():
     return {"status": "ok"}
 
 
-def main():
-    """启动服务"""
-    uvicorn.run("skypulse.main:app", host="0.0.0.0", port=8000, reload=True)
+def _available_cpus() -> int:
+    """当前进程可用的 CPU 核数（容器限制了 CPU 亲和性时少于机器核数）"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="skypulse", description="启动 SkyPulse 后端服务")
+    parser.add_argument("--host", default=settings.app_host)
+    parser.add_argument("--port", type=int, default=settings.app_port)
+    parser.add_argument(
+        "--workers", type=int, default=settings.app_workers, help="worker 进程数，0 表示按 CPU 核数"
+    )
+    parser.add_argument(
+        "--reload",
+        action=argparse.BooleanOptionalAction,
+        default=settings.app_reload,
+        help="代码变更时自动重载（开发用，只能单进程）",
+    )
+    parser.add_argument("--loop", default=settings.app_loop, help="auto / uvloop / asyncio")
+    parser.add_argument("--http", default=settings.app_http, help="auto / httptools / h11")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    """启动服务
+
+    生产环境按 --workers / APP_WORKERS 启动多个 worker 进程（由 uvicorn 管理，
+    worker 异常退出时自动重启）；--loop / --http 为 auto 时，安装了 uvloop / httptools
+    （`skypulse[server]`）就使用它们。多 worker 时通过 CACHE_BACKEND_URL 共享缓存，
+    通过 METRICS_DIR（未配置时创建临时目录，经环境变量传给 worker）汇总指标。
+    """
+    args = _parse_args(argv)
+    workers = args.workers or _available_cpus()
+    if args.reload and workers > 1:
+        logger.warning("reload_forces_single_worker", extra={"workers": workers})
+        workers = 1
+    if workers > 1 and not settings.cache_backend_url:
+        logger.warning("workers_without_shared_cache", extra={"workers": workers})
+    if settings.metrics_dir:
+        clear_snapshots(settings.metrics_dir)
+    elif workers > 1:
+        metrics_dir = tempfile.mkdtemp(prefix="skypulse-metrics-")
+        atexit.register(shutil.rmtree, metrics_dir, ignore_errors=True)
+        os.environ["METRICS_DIR"] = metrics_dir
+
+    uvicorn.run(
+        "skypulse.main:app",
+        host=args.host,
+        port=args.port,
+        workers=None if args.reload else workers,
+        reload=args.reload,
+        loop=args.loop,
+        http=args.http,
+        timeout_worker_healthcheck=settings.app_worker_startup_timeout,
+    )
 
 
 if __name__ == "__main__":
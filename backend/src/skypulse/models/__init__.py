@@ -6,6 +6,9 @@
 from skypulse.models.schemas import (
     ChatRequest,
     ChatResponse,
+    WeatherBatchItem,
+    WeatherBatchRequest,
+    WeatherBatchResponse,
     WeatherForecast,
     WeatherNow,
     WeatherResponse,
@@ -15,6 +18,9 @@ __all__ = [
     "WeatherNow",
     "WeatherForecast",
     "WeatherResponse",
+    "WeatherBatchRequest",
+    "WeatherBatchItem",
+    "WeatherBatchResponse",
     "ChatRequest",
     "ChatResponse",
 ]
@@ -1,9 +1,9 @@
 """Pydantic 数据模型"""
 
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class WeatherNow(BaseModel):
@@ -28,6 +28,11 @@ class WeatherForecast(BaseModel):
     windDirDay: str
     windScaleDay: str
 
+    @classmethod
+    def from_qweather(cls, daily: dict) -> "WeatherForecast":
+        """从和风天气 daily 条目构造（fxDate -> date）"""
+        return cls(date=daily["fxDate"], **daily)
+
 
 class WeatherResponse(BaseModel):
     """天气响应"""
@@ -37,6 +42,39 @@ class WeatherResponse(BaseModel):
     location: str
     updated_at: datetime = datetime.now()
 
+    @classmethod
+    def from_qweather(cls, location: str, current: dict, forecast: dict) -> "WeatherResponse":
+        """从和风天气实时天气和预报的原始响应构造"""
+        return cls(
+            current=WeatherNow(**current["now"]),
+            forecast=[WeatherForecast.from_qweather(day) for day in forecast["daily"]],
+            location=location,
+            updated_at=datetime.fromisoformat(current["updateTime"]),
+        )
+
+
+class WeatherBatchRequest(BaseModel):
+    """批量天气查询请求"""
+
+    locations: list[str] = Field(min_length=1)  # 城市名或 LocationID（纯数字）
+    days: Literal[3, 7] = 3  # 预报天数
+    stream: bool = False  # 为 True 时以 NDJSON 逐城市返回
+
+
+class WeatherBatchItem(BaseModel):
+    """批量查询中单个地点的结果"""
+
+    query: str
+    location_id: Optional[str] = None
+    weather: Optional[WeatherResponse] = None
+    error: Optional[str] = None
+
+
+class WeatherBatchResponse(BaseModel):
+    """批量天气查询响应（顺序与请求一致）"""
+
+    results: list[WeatherBatchItem]
+
 
 class ChatRequest(BaseModel):
     """聊天请求"""
@@ -3,6 +3,19 @@
 提供外部 API 集成服务。
 """
 
-from skypulse.services.qweather_service import QWeatherService, qweather_service, qweather_tool
+from skypulse.services.qweather_service import (
+    QWeatherService,
+    get_city_weather,
+    qweather_service,
+)
 
-__all__ = ["QWeatherService", "qweather_service", "qweather_tool"]
+__all__ = ["QWeatherService", "qweather_service", "qweather_tool", "get_city_weather"]
+
+
+def __getattr__(name: str):
+    # qweather_tool 依赖 LangChain，首次访问时才创建（见 qweather_service.__getattr__）
+    if name == "qweather_tool":
+        from skypulse.services.qweather_service import qweather_tool
+
+        return qweather_tool
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,119 @@
+"""城市解析
+
+/chat 和 /chat/stream 共用的城市解析流程，在调用 LLM 之前完成：
+1. 本地提取：问题里出现了城市索引中的城市名，直接使用，不做 IP 定位
+2. 问题提到了索引之外的地点（如 "厦门天气"），或者在问地点本身（"哪个城市"、"哪里"），
+   交给 Agent 处理，同样不做 IP 定位
+3. IP 定位：问题完全没有提到地点时，从请求头取客户端 IP（X-Real-IP → X-Forwarded-For →
+   连接地址），内网 IP 改用本机公网 IP（本地部署时与用户所在位置一致），只接受中国城市
+
+解析出的城市作为上下文传给 Agent，Agent 只调用一次。
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Request
+
+from skypulse.core.metrics import instrument
+from skypulse.services.ip_service import get_city_by_ip, is_private_ip
+from skypulse.utils.city_index import city_index
+
+logger = logging.getLogger(__name__)
+
+NO_CITY_HINT = (
+    "⚠️ 无法自动获取您所在的城市，请在问题中直接说明您想查询的城市，例如：'上海天气怎么样？'"
+)
+
+# 问题在问地点本身，交给 LLM 追问，不用 IP 定位结果代替
+PLACE_QUESTION_KEYWORDS = ("城市", "地点", "哪里")
+
+# 问题开头的请求语和语气词，如 "请问"、"帮我查一下"、"给我说说"
+_REQUEST_WORDS = (
+    "请问|麻烦|请|帮我|帮忙|帮|给我|给|告诉我|我想知道|想知道|"
+    "查一下|查查|查询|查|看一下|看看|看|说一下|说说|说|一下"
+)
+
+# 去掉开头的请求语后，天气或时间词之前的部分可能是地点名，如 "厦门天气"、"鼓浪屿明天下雨吗"
+_LEADING_PLACE_RE = re.compile(
+    rf"(?:{_REQUEST_WORDS})*(?P<place>[\u4e00-\u9fffA-Za-z]{{2,8}}?)(?:市|县|区)?的?"
+    r"(?:天气|气温|温度|今天|明天|后天|今晚|现在|这周|本周|下周|周末|未来|最近|"
+    r"下雨|有雨|降雨|带伞|冷不冷|热不热|多少度|几度)"
+)
+
+# 指代用户所在地、时间、请求或语气的词，去掉后剩下的才可能是地点名
+_NOT_PLACE_RE = re.compile(
+    f"{_REQUEST_WORDS}|"
+    "我们|咱们|我|这边|这里|那边|本地|当地|附近|外面|出门|"
+    "今天|明天|后天|今晚|现在|目前|这周|本周|下周|周末|未来|最近|几天|"
+    "需要|应该|要|会|能|该|得|还|也|都"
+)
+
+
+@dataclass
+class CityResolution:
+    """城市解析结果"""
+
+    city: Optional[str]  # IP 定位得到的城市（问题中已有城市时为 None，无需补充）
+    source: str  # "question" | "ip" | "none"
+    hint: str = ""  # 无法确定城市时给用户的提示
+
+
+def client_ip_from_request(request: Request) -> tuple[Optional[str], str]:
+    """从请求中获取客户端 IP
+
+    返回:
+        (IP, 来源)，来源为 "X-Real-IP"、"X-Forwarded-For"、"client" 或 "unknown"
+    """
+    # 优先从 X-Real-IP 获取（Nginx 传递的真实 IP）
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip:
+        return real_ip, "X-Real-IP"
+
+    # 其次从 X-Forwarded-For 获取
+    forwarded_for = request.headers.get("X-Forwarded-For")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip(), "X-Forwarded-For"
+
+    # 最后使用客户端 IP
+    if request.client:
+        return request.client.host, "client"
+
+    return None, "unknown"
+
+
+def mentions_place(question: str) -> bool:
+    """问题是否提到了地点（城市索引之外的地名）或在问地点本身"""
+    if any(keyword in question for keyword in PLACE_QUESTION_KEYWORDS):
+        return True
+    match = _LEADING_PLACE_RE.match(question.strip())
+    return bool(match) and len(_NOT_PLACE_RE.sub("", match["place"])) >= 2
+
+
+@instrument("city_resolver.resolve")
+async def resolve_city(question: str, client_ip: Optional[str] = None) -> CityResolution:
+    """解析问题对应的城市
+
+    参数:
+        question: 用户问题
+        client_ip: 客户端 IP，为空或内网 IP 时使用本机公网 IP
+
+    返回:
+        CityResolution
+    """
+    if city_index.find_in_text(question) or mentions_place(question):
+        return CityResolution(city=None, source="question")
+
+    if client_ip and is_private_ip(client_ip):
+        client_ip = None
+    city, status = await get_city_by_ip(client_ip, china_only=True)
+
+    logger.info(
+        "city_resolved",
+        extra={"client_ip": client_ip, "city": city, "status": status},
+    )
+    if city:
+        return CityResolution(city=city, source="ip")
+    return CityResolution(city=None, source="none", hint=NO_CITY_HINT)
@@ -0,0 +1,176 @@
+"""离线 IP 定位数据库
+
+把 IP 段数据库加载为按起始地址排序的区间索引，使用二分查找定位，
+命中时不再调用 ip-api.com。返回值与 ip-api 的响应格式一致。
+
+支持的数据文件：
+- CSV（简单格式）: start_ip,end_ip,country_code,city
+- CSV（DB-IP "IP to City Lite" 格式）: ip_start,ip_end,continent,country,stateprov,city,...
+- MMDB（MaxMind GeoLite2-City 等）: 需要安装 maxminddb
+
+IPv4 区间存放在 array('I') 中（每个端点 4 字节），IPv6 区间存放在整数列表中；
+城市信息去重后按下标引用。
+"""
+
+import csv
+import socket
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Optional, Protocol
+
+COUNTRY_NAMES = {"CN": "China", "HK": "Hong Kong", "MO": "Macao", "TW": "Taiwan"}
+
+
+class IPDatabase(Protocol):
+    """IP 定位数据库接口"""
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        """查询 IP，返回 ip-api 格式的结果，未收录返回 None"""
+        ...
+
+
+def _location(country_code: str, city: str) -> dict:
+    return {
+        "status": "success",
+        "country": COUNTRY_NAMES.get(country_code, country_code),
+        "countryCode": country_code,
+        "city": city,
+    }
+
+
+def parse_ip(ip: str) -> tuple[int, int]:
+    """把 IP 字符串转换为 (地址族版本, 整数)，格式错误时抛出 ValueError
+
+    使用 socket.inet_pton 解析，比 ipaddress.ip_address 快得多。
+    """
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+    except OSError:
+        raise ValueError(f"无效的 IP 地址: {ip}") from None
+
+
+class _RangeIndex:
+    """单个地址族的有序区间索引"""
+
+    def __init__(self, starts, ends, values):
+        self.starts = starts
+        self.ends = ends
+        self.values = values
+
+    def find(self, n: int) -> Optional[int]:
+        i = bisect_right(self.starts, n) - 1
+        if i >= 0 and n <= self.ends[i]:
+            return self.values[i]
+        return None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class CSVIPDatabase:
+    """基于 CSV IP 段文件的区间索引"""
+
+    def __init__(self, rows: list[tuple[str, str, str, str]]):
+        """
+        参数:
+            rows: (start_ip, end_ip, country_code, city) 列表，无需预先排序
+        """
+        self.locations: list[dict] = []
+        location_ids: dict[tuple[str, str], int] = {}
+
+        v4, v6 = [], []
+        for start_ip, end_ip, country_code, city in rows:
+            version, start = parse_ip(start_ip)
+            _, end = parse_ip(end_ip)
+            key = (country_code, city)
+            if key not in location_ids:
+                location_ids[key] = len(self.locations)
+                self.locations.append(_location(country_code, city))
+            target = v4 if version == 4 else v6
+            target.append((start, end, location_ids[key]))
+
+        v4.sort()
+        v6.sort()
+        self.v4 = _RangeIndex(
+            array("I", (r[0] for r in v4)),
+            array("I", (r[1] for r in v4)),
+            array("I", (r[2] for r in v4)),
+        )
+        self.v6 = _RangeIndex(
+            [r[0] for r in v6],
+            [r[1] for r in v6],
+            array("I", (r[2] for r in v6)),
+        )
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "CSVIPDatabase":
+        """从 CSV 文件加载（自动识别简单格式和 DB-IP 格式，跳过表头）"""
+        rows = []
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                if not row or row[0].startswith("#"):
+                    continue
+                if len(row) >= 6:
+                    start_ip, end_ip, _, country_code, _, city = row[:6]
+                else:
+                    start_ip, end_ip, country_code, city = row[:4]
+                if start_ip[:1].isalpha() and ":" not in start_ip:
+                    continue  # 表头
+                rows.append((start_ip, end_ip, country_code, city))
+        return cls(rows)
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        try:
+            version, n = parse_ip(ip)
+        except ValueError:
+            return None
+
+        index = self.v4 if version == 4 else self.v6
+        location_id = index.find(n)
+        if location_id is None:
+            return None
+        return self.locations[location_id]
+
+    def __len__(self) -> int:
+        return len(self.v4) + len(self.v6)
+
+
+class MMDBIPDatabase:
+    """基于 MMDB 文件（MaxMind 格式）的查询"""
+
+    def __init__(self, path: Path, language: str = "en"):
+        import maxminddb
+
+        self.reader = maxminddb.open_database(str(path))
+        self.language = language
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        try:
+            record = self.reader.get(ip)
+        except ValueError:
+            return None
+        if not record or "city" not in record:
+            return None
+
+        country_code = record.get("country", {}).get("iso_code", "")
+        names = record["city"].get("names", {})
+        city = names.get(self.language) or names.get("en")
+        if not city:
+            return None
+        return _location(country_code, city)
+
+    def close(self):
+        self.reader.close()
+
+
+def open_ip_database(path: str | Path) -> IPDatabase:
+    """根据文件扩展名打开 IP 数据库"""
+    path = Path(path)
+    if path.suffix == ".mmdb":
+        return MMDBIPDatabase(path)
+    return CSVIPDatabase.from_csv(path)
@@ -1,9 +1,63 @@
 """IP 定位服务 - 根据 IP 获取用户城市"""
 
-import json
+import logging
 
 import httpx
 
+from skypulse.core.config import settings
+from skypulse.core.metrics import instrument, register_cache
+from skypulse.services.ip_database import IPDatabase, open_ip_database
+from skypulse.utils.resilience import Upstream, check_status
+from skypulse.utils.ttl_cache import TTLCache
+
+# 整个进程共享的 HTTP 客户端，由 FastAPI 的 lifespan 在退出时关闭
+_client: httpx.AsyncClient | None = None
+
+logger = logging.getLogger(__name__)
+
+# IP -> ip-api 定位结果；公网 IP 在进程内只查询一次
+ip_cache = TTLCache(max_entries=settings.ip_cache_max_entries)
+_PUBLIC_IP_KEY = ("public_ip",)
+register_cache("ip", ip_cache.stats)
+
+# ip-api.com 调用保护：按免费版配额限速，令牌不足时直接失败（IP 定位是可选的，不值得等待）
+ip_api_upstream = Upstream(
+    "ip-api",
+    rate=settings.ip_api_rate_limit,
+    burst=settings.ip_api_rate_burst,
+    max_wait=0.0,
+    retries=1,
+    failure_threshold=settings.circuit_failure_threshold,
+    recovery_time=settings.circuit_recovery_time,
+)
+
+# 本地 IP 段数据库（配置了 IP_DATABASE_PATH 时启用），未命中再调用 ip-api
+ip_database: IPDatabase | None = None
+
+
+def init_ip_database():
+    """加载本地 IP 数据库（未配置路径时跳过）"""
+    global ip_database
+    if ip_database is None and settings.ip_database_path:
+        ip_database = open_ip_database(settings.ip_database_path)
+        logger.info("ip_database_loaded", extra={"path": settings.ip_database_path})
+
+
+def get_client() -> httpx.AsyncClient:
+    """获取共享的 HTTP 客户端（首次使用时创建）"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=5.0)
+    return _client
+
+
+async def aclose():
+    """关闭共享的 HTTP 客户端"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
 def is_private_ip(ip: str) -> bool:
     """
@@ -41,90 +95,119 @@ def is_private_ip(ip: str) -> bool:
     return False
 
 
-async def get_public_ip() -> str | None:
-    """获取当前公网IP"""
+async def _fetch_public_ip() -> str | None:
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            # 使用 ipify 获取公网IP
-            resp = await client.get("https://api.ipify.org?format=json")
-            data = resp.json()
-            return data.get("ip")
+        # 使用 ipify 获取公网IP
+        resp = await get_client().get(settings.public_ip_url)
+        data = resp.json()
+        return data.get("ip")
     except Exception as e:
-        print(f"❌ 获取公网IP失败: {e}")
+        logger.warning("public_ip_failed", extra={"error": str(e)})
         return None
 
 
-async def get_city_by_ip(client_ip: str = None) -> tuple[str | None, str]:
+async def get_public_ip() -> str | None:
+    """获取当前公网IP（整个进程相同，成功后缓存，并发调用只请求一次）"""
+    return await ip_cache.get_or_load(
+        _PUBLIC_IP_KEY,
+        _fetch_public_ip,
+        ttl=float("inf"),
+        should_cache=bool,
+    )
+
+
+async def _fetch_ip_location(client_ip: str) -> dict:
+    url = (
+        f"{settings.ip_api_base_url}/json/{client_ip}"
+        "?fields=status,message,country,countryCode,city"
+    )
+
+    async def request() -> httpx.Response:
+        return check_status("ip-api", await get_client().get(url))
+
+    response = await ip_api_upstream.call(request)
+    data = response.json()
+    logger.debug(
+        "ip_api_response", extra={"ip": client_ip, "status": response.status_code, "data": data}
+    )
+    return data
+
+
+@instrument("ip.lookup")
+async def lookup_ip(client_ip: str) -> dict:
+    """查询 IP 的地理位置
+
+    优先查本地 IP 数据库，未命中再调用 ip-api.com，成功结果按 IP 缓存。
+
+    返回:
+        ip-api 格式的结果，包含 status、message、country、countryCode、city 字段
+    """
+    if ip_database is not None:
+        data = ip_database.lookup(client_ip)
+        if data:
+            return data
+
+    return await ip_cache.get_or_load(
+        ("ip", client_ip),
+        lambda: _fetch_ip_location(client_ip),
+        ttl=settings.ip_cache_ttl,
+        should_cache=lambda data: data.get("status") == "success",
+    )
+
+
+def is_china(data: dict) -> bool:
+    """判断 ip-api 的定位结果是否位于中国"""
+    return data.get("country") in ("China", "中国") or data.get("countryCode") == "CN"
+
+
+@instrument("ip.get_city")
+async def get_city_by_ip(
+    client_ip: str = None, china_only: bool = False
+) -> tuple[str | None, str]:
     """
     根据 IP 地址获取城市名
-    
+
     参数:
         client_ip: 客户端 IP 地址（可选，不传则自动获取公网IP）
-        
+        china_only: 是否只接受中国城市的定位结果
+
     返回:
         (城市名, 状态消息)
         - 成功时: ("北京", "成功消息")
         - 失败时: (None, "错误原因")
     """
-    print("=" * 80)
-    print("🌍 IP 定位服务 - 开始")
-    print("=" * 80)
-    
     # 如果没有提供 IP，自动获取公网IP
     if not client_ip:
-        print("📍 未提供IP，自动获取公网IP...")
         client_ip = await get_public_ip()
-        print(f"✅ 获取到公网IP: {client_ip}")
-    
+
     if not client_ip:
-        print("❌ 无法获取公网IP")
-        print("=" * 80)
+        logger.warning("ip_locate_failed", extra={"reason": "no_public_ip"})
         return None, "无法获取公网IP"
-    
-    # 检查是否为内网IP（如果是内网IP，ip-api.com也可以返回当前出口IP的城市）
-    # 所以这里不做内网检查，直接调用API
-    
-    print("=" * 80)
-    print("🌍 IP 定位服务 - 开始")
-    print("=" * 80)
-    print(f"📍 接收到的 IP: {client_ip}")
-    
+
     # 检查是否为内网 IP
     if is_private_ip(client_ip):
-        print(f"⚠️ 检测到内网 IP: {client_ip}")
-        print("=" * 80)
+        logger.info("ip_locate_skipped", extra={"ip": client_ip, "reason": "private_ip"})
         return None, f"内网IP({client_ip})，无法自动获取城市"
-    
+
     try:
-        # 如果没有提供 IP，使用请求者的 IP
-        if not client_ip:
-            # 使用 ip-api.com 的免费 API（无需 API key）
-            url = "http://ip-api.com/json/"
-            print(f"🔗 未提供 IP，使用自动检测: {url}")
-        else:
-            # 查询指定 IP
-            url = f"http://ip-api.com/json/{client_ip}"
-            print(f"🔗 调用 IP 定位 API: {url}")
-        
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(url)
-            data = response.json()
-            
-            print(f"📬 API 响应状态码: {response.status_code}")
-            print(f"📬 API 响应内容: {json.dumps(data, ensure_ascii=False)}")
-            
-            if data.get("status") == "success":
-                city = data.get("city")
-                country = data.get("country")
-                print(f"✅ IP 定位成功! 城市: {city}, 国家: {country}")
-                print("=" * 80)
-                return city, f"成功"
-            else:
-                error_msg = data.get('message', '未知错误')
-                print(f"❌ IP 定位失败: {error_msg}")
-                print("=" * 80)
-                return None, f"API错误: {error_msg}"
+        data = await lookup_ip(client_ip)
     except Exception as e:
-        print(f"❌ IP 定位异常: {e}")
-        print("=" * 80)
+        logger.warning("ip_locate_failed", extra={"ip": client_ip, "error": str(e)})
         return None, f"异常: {str(e)}"
+
+    if data.get("status") != "success":
+        error_msg = data.get("message", "未知错误")
+        logger.warning("ip_locate_failed", extra={"ip": client_ip, "error": error_msg})
+        return None, f"API错误: {error_msg}"
+
+    city = data.get("city")
+    country = data.get("country")
+    if china_only and not is_china(data):
+        logger.info(
+            "ip_locate_skipped",
+            extra={"ip": client_ip, "city": city, "country": country, "reason": "not_china"},
+        )
+        return None, f"非中国城市: {country} {city}"
+
+    logger.info("ip_located", extra={"ip": client_ip, "city": city, "country": country})
+    return city, "成功"
@@ -0,0 +1,200 @@
+"""热门城市天气数据后台预热
+
+由 FastAPI 的 lifespan 启动，周期性地：
+1. 按请求次数（QWeatherService.popularity，每轮按比例衰减）选出前 N 个热门城市，
+   不足 N 个时用随包发布的热门城市补齐
+2. 检查它们的实时天气和预报缓存，剩余存活时间小于 提前量 + 随机抖动 时重新获取，
+   让用户请求总是命中缓存；抖动避免同一批条目在同一时刻一起刷新
+3. 所有预热请求共享一个全局速率预算（每秒请求数）。预热请求同样经过 qweather_service.upstream
+   的限速和熔断，与用户请求共用上游配额，预算（PREWARM_RATE）应明显小于 QWEATHER_RATE_LIMIT，
+   为用户请求留出余量
+
+多个 worker 共用缓存后端时，每轮开始前通过后端租约（SharedCache.claim）选出一个 worker 执行预热，
+刷新结果写入共享后端供其他 worker 读取；未配置后端时每个 worker 各自预热自己的缓存。
+
+stop() 会让当前一轮在下一个请求前退出并等待后台任务结束。
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from typing import Optional
+
+from skypulse.core.config import settings
+from skypulse.core.metrics import counter
+from skypulse.services.qweather_service import QWeatherService, qweather_service
+from skypulse.utils.cache_backend import SharedCache, shared_cache
+from skypulse.utils.city_index import hot_location_ids
+from skypulse.utils.resilience import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+PREWARM_REFRESHES = counter(
+    "skypulse_prewarm_refreshes_total", "后台预热刷新的缓存条目数", ["kind", "result"]
+)
+
+
+class WeatherPrewarmer:
+    """热门城市天气预热调度器"""
+
+    def __init__(
+        self,
+        service: QWeatherService = qweather_service,
+        top_n: int = 32,
+        interval: float = 30.0,
+        lead: float = 120.0,
+        jitter: float = 60.0,
+        rate: float = 5.0,
+        decay: float = 0.9,
+        seeds: Optional[list[str]] = None,
+        lease: Optional[SharedCache] = None,
+    ):
+        """
+        参数:
+            service: 天气服务（使用其缓存和请求计数）
+            top_n: 预热的城市数
+            interval: 两轮检查之间的间隔（秒）
+            lead: 缓存剩余存活时间小于该值时刷新（秒）
+            jitter: 叠加在 lead 上的随机抖动上限（秒）
+            rate: 预热请求的全局速率预算（每秒请求数）
+            decay: 每轮结束后请求计数乘以的衰减系数，让热度反映近期流量
+            seeds: 种子城市的 LocationID，默认使用随包发布的热门城市
+            lease: 用于选出执行预热的 worker 的共享缓存，默认使用 CACHE_BACKEND_URL 配置的后端
+        """
+        self.service = service
+        self.top_n = top_n
+        self.interval = interval
+        self.lead = lead
+        self.jitter = jitter
+        self.rate = rate
+        self.decay = decay
+        self.seeds = seeds if seeds is not None else hot_location_ids()
+        self.lease = lease if lease is not None else shared_cache("prewarm")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.leader = False
+
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        # 容量为 1：预热请求均匀分布，不产生突发
+        self._budget = TokenBucket(rate, capacity=1)
+
+    def targets(self) -> list[tuple[str, int]]:
+        """本轮要预热的 (LocationID, 预报天数)，热门的在前"""
+        ranked = [key for key, _ in self.service.popularity.most_common(self.top_n)]
+        for location_id in self.seeds:
+            if len(ranked) >= self.top_n:
+                break
+            if (location_id, 3) not in ranked:
+                ranked.append((location_id, 3))
+        return ranked
+
+    async def _acquire_budget(self):
+        """全局速率预算：相邻两个预热请求至少间隔 1/rate 秒"""
+        wait = self._budget.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _needs_refresh(self, key: tuple) -> bool:
+        remaining = self.service.cache.remaining_ttl(key)
+        return remaining is None or remaining < self.lead + random.uniform(0, self.jitter)
+
+    async def warm_once(self) -> int:
+        """执行一轮预热，返回刷新的条目数"""
+        refreshed = 0
+        for location_id, days in self.targets():
+            # 与 QWeatherService 的缓存键一致
+            now_key = ("now", location_id, None)
+            forecast_key = ("forecast", location_id, days)
+            jobs = (
+                ("now", now_key, self.service.refresh_current_weather, ()),
+                ("forecast", forecast_key, self.service.refresh_forecast, (days,)),
+            )
+            for kind, key, refresh, extra in jobs:
+                if self._stopping.is_set():
+                    return refreshed
+                if not self._needs_refresh(key):
+                    continue
+                await self._acquire_budget()
+                try:
+                    await refresh(location_id, *extra)
+                    refreshed += 1
+                    PREWARM_REFRESHES.inc(kind=kind, result="ok")
+                except Exception as e:
+                    PREWARM_REFRESHES.inc(kind=kind, result="error")
+                    logger.warning(
+                        "prewarm_error",
+                        extra={"location_id": location_id, "kind": kind, "error": str(e)},
+                    )
+
+        self._decay()
+        return refreshed
+
+    def _decay(self):
+        popularity = self.service.popularity
+        for key in list(popularity):
+            popularity[key] *= self.decay
+            if popularity[key] < 0.5:
+                del popularity[key]
+
+    async def _claim_leader(self) -> bool:
+        """获取或续期预热租约（有效期为 3 轮间隔，持有者退出后由其他 worker 接替）"""
+        leader = await self.lease.claim("leader", self.owner, self.interval * 3)
+        if leader != self.leader:
+            logger.info("prewarm_leader_changed", extra={"owner": self.owner, "leader": leader})
+            self.leader = leader
+        return leader
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            start = time.perf_counter()
+            try:
+                if await self._claim_leader():
+                    refreshed = await self.warm_once()
+                else:
+                    # 其他 worker 在预热，只衰减本进程的请求计数
+                    refreshed = 0
+                    self._decay()
+            except Exception as e:
+                logger.exception("prewarm_cycle_failed", extra={"error": str(e)})
+            else:
+                if refreshed:
+                    logger.info(
+                        "prewarm_cycle",
+                        extra={
+                            "refreshed": refreshed,
+                            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                        },
+                    )
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except TimeoutError:
+                pass
+
+    def start(self):
+        """启动后台任务（需要在事件循环中调用）"""
+        if self._task is None or self._task.done():
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """通知后台任务退出并等待，超时后取消"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except (TimeoutError, asyncio.CancelledError):
+            pass
+        self._task = None
+
+
+prewarmer = WeatherPrewarmer(
+    top_n=settings.prewarm_top_n,
+    interval=settings.prewarm_interval,
+    lead=settings.prewarm_lead,
+    jitter=settings.prewarm_jitter,
+    rate=settings.prewarm_rate,
+)
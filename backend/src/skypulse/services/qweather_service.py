@@ -1,25 +1,136 @@
 """和风天气 API 封装"""
 
+import asyncio
 import json as json_module
+from collections import Counter
 
 import httpx
-from langchain_core.tools import tool
 
 from skypulse.core.config import settings
+from skypulse.core.metrics import instrument, register_cache
+from skypulse.services.weather_projection import format_tool_payload
+from skypulse.utils.cache_backend import shared_cache
+from skypulse.utils.city_index import city_index
 from skypulse.utils.location_cache import get_location_id, save_location_id
+from skypulse.utils.resilience import Upstream, check_status
+from skypulse.utils.ttl_cache import TTLCache
+
+# LocationID 基本不会变化，在共享后端中长期保存
+LOCATION_SHARED_TTL = 30 * 24 * 3600
+
+
+def _http2_available() -> bool:
+    """检查是否安装了 HTTP/2 依赖（h2）"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _is_success(data: dict) -> bool:
+    """只缓存成功的响应（code == "200"）"""
+    return isinstance(data, dict) and data.get("code") == "200"
 
 
 class QWeatherService:
-    """和风天气服务"""
+    """和风天气服务
+
+    整个进程共享一个长连接的 httpx.AsyncClient，复用 TCP/TLS 连接，
+    由 FastAPI 的 lifespan 在退出时调用 aclose() 关闭。
+
+    实时天气和预报按 (接口, LocationID, 天数) 缓存，TTL 见 Settings，
+    同一个 key 的并发未命中只会请求一次上游。
+
+    所有请求经过 self.upstream（限速、并发上限、重试、对冲和熔断）。
+    过期数据按接口配置的窗口处理：刚过期的数据立即返回并在后台刷新（stale-while-revalidate），
+    上游不可用时在更长的窗口内用过期数据代替错误（stale-if-error）。
+
+    popularity 记录每个 (LocationID, 预报天数) 被请求的次数，供后台预热选择热门城市。
+    """
 
     def __init__(self):
         self.api_key = settings.qweather_api_key
         self.base_url = settings.qweather_base_url
+        self._client: httpx.AsyncClient | None = None
+        self.cache = TTLCache(
+            max_entries=settings.qweather_cache_max_entries,
+            max_bytes=settings.qweather_cache_max_bytes,
+            stale_ttl=settings.qweather_cache_stale_ttl,
+            shared=shared_cache("weather"),
+        )
+        self.shared_locations = shared_cache("location")
+        self.upstream = Upstream(
+            "qweather",
+            rate=settings.qweather_rate_limit,
+            burst=settings.qweather_rate_burst,
+            max_wait=settings.upstream_max_wait,
+            max_concurrency=settings.qweather_max_concurrency,
+            retries=settings.qweather_retries,
+            hedge_delay=settings.qweather_hedge_delay,
+            failure_threshold=settings.circuit_failure_threshold,
+            recovery_time=settings.circuit_recovery_time,
+        )
+        self.popularity: Counter[tuple[str, int]] = Counter()
 
     def _get_auth_header(self) -> dict:
         """获取认证请求头"""
         return {"X-QW-Api-Key": self.api_key}
 
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """获取共享的 HTTP 客户端（首次使用时创建）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    connect=settings.qweather_connect_timeout,
+                    read=settings.qweather_read_timeout,
+                    write=settings.qweather_write_timeout,
+                    pool=settings.qweather_pool_timeout,
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.qweather_max_connections,
+                    max_keepalive_connections=settings.qweather_max_keepalive_connections,
+                    keepalive_expiry=settings.qweather_keepalive_expiry,
+                ),
+                http2=settings.qweather_http2 and _http2_available(),
+            )
+        return self._client
+
+    async def connect(self):
+        """与和风天气建立连接（服务启动预热用），不调用天气接口、不占用限速配额"""
+        await self.client.head(self.base_url)
+
+    async def aclose(self):
+        """关闭共享的 HTTP 客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get_json(self, url: str, params: dict, api_name: str) -> dict:
+        """发送 GET 请求并解析 JSON 响应
+
+        参数:
+            url: 请求地址
+            params: 查询参数
+            api_name: 接口名称，用于错误信息
+        """
+
+        async def request() -> httpx.Response:
+            response = await self.client.get(url, params=params, headers=self._get_auth_header())
+            return check_status("qweather", response)
+
+        response = await self.upstream.call(request)
+
+        if not response.text:
+            raise ValueError(f"{api_name} 返回空响应，请检查 API Key 和 URL 配置")
+
+        try:
+            return response.json()
+        except json_module.JSONDecodeError as e:
+            raise ValueError(f"{api_name} 返回无效 JSON: {response.text}") from e
+
+    @instrument("qweather.geo")
     async def get_location_id(self, city: str) -> str:
         """根据城市名称获取 LocationID
 
@@ -29,54 +140,72 @@ class QWeatherService:
         返回:
             LocationID，如 "101010100"
         """
-        # 先检查本地缓存
+        # 先查预构建的城市索引（支持 市/区/县 后缀、拼音和英文别名）
+        indexed_id = city_index.lookup(city)
+        if indexed_id:
+            return indexed_id
+
+        # 再检查本地缓存
         cached_id = get_location_id(city)
         if cached_id:
             return cached_id
 
-        # 缓存未命中，调用 API
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            url = f"{self.base_url}/geo/v2/city/lookup"
-            params = {"location": city, "lang": "zh"}
-            headers = self._get_auth_header()
-
-            response = await client.get(url, params=params, headers=headers)
-
-            if not response.text:
-                raise ValueError("Geo API 返回空响应，请检查 API Key 和 URL 配置")
-
-            try:
-                data = response.json()
-                if data.get("code") == "200" and data.get("location"):
-                    location_id = data["location"][0]["id"]
-                    # 存入缓存
-                    save_location_id(city, location_id)
-                    return location_id
-                raise ValueError(f"无法找到城市 {city} 的 LocationID: {data}")
-            except json_module.JSONDecodeError as e:
-                raise ValueError(f"Geo API 返回无效 JSON: {response.text}") from e
+        # 其他 worker 查询过的城市（配置了共享缓存后端时）
+        shared = await self.shared_locations.get(city)
+        if shared is not None:
+            save_location_id(city, shared[0])
+            return shared[0]
 
+        # 缓存未命中，调用 API
+        url = f"{self.base_url}/geo/v2/city/lookup"
+        params = {"location": city, "lang": "zh"}
+        data = await self._get_json(url, params, "Geo API")
+
+        if data.get("code") == "200" and data.get("location"):
+            location_id = data["location"][0]["id"]
+            # 存入缓存
+            save_location_id(city, location_id)
+            await self.shared_locations.set(city, location_id, LOCATION_SHARED_TTL)
+            return location_id
+        raise ValueError(f"无法找到城市 {city} 的 LocationID: {data}")
+
+    def _current_weather_request(self, location_id: str) -> tuple:
+        """实时天气的 (缓存键, 加载函数, 缓存参数)"""
+        url = f"{self.base_url}/v7/weather/now"
+        return (
+            ("now", location_id, None),
+            lambda: self._get_json(url, {"location": location_id}, "Weather API"),
+            {
+                "ttl": settings.qweather_cache_now_ttl,
+                "swr": settings.qweather_cache_now_swr,
+                "stale_if_error": settings.qweather_cache_now_stale_if_error,
+            },
+        )
+
+    def _forecast_request(self, location_id: str, days: int) -> tuple:
+        """天气预报的 (缓存键, 加载函数, 缓存参数)"""
+        url = f"{self.base_url}/v7/weather/{days}d"
+        return (
+            ("forecast", location_id, days),
+            lambda: self._get_json(url, {"location": location_id}, "Forecast API"),
+            {
+                "ttl": settings.qweather_cache_forecast_ttl,
+                "swr": settings.qweather_cache_forecast_swr,
+                "stale_if_error": settings.qweather_cache_forecast_stale_if_error,
+            },
+        )
+
+    @instrument("qweather.now")
     async def get_current_weather(self, location_id: str) -> dict:
         """获取当前天气
 
         参数:
             location_id: 地区的 LocationID
         """
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            url = f"{self.base_url}/v7/weather/now"
-            headers = self._get_auth_header()
-            params = {"location": location_id}
-
-            response = await client.get(url, params=params, headers=headers)
-
-            if not response.text:
-                raise ValueError("Weather API 返回空响应")
-
-            try:
-                return response.json()
-            except json_module.JSONDecodeError as e:
-                raise ValueError(f"Weather API 返回无效 JSON: {response.text}") from e
+        key, loader, policy = self._current_weather_request(location_id)
+        return await self.cache.get_or_load(key, loader, should_cache=_is_success, **policy)
 
+    @instrument("qweather.forecast")
     async def get_forecast(self, location_id: str, days: int = 3) -> dict:
         """获取天气预报
 
@@ -84,43 +213,124 @@ class QWeatherService:
             location_id: 地区的 LocationID
             days: 预报天数，可选 3 或 7
         """
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            url = f"{self.base_url}/v7/weather/{days}d"
-            headers = self._get_auth_header()
-            params = {"location": location_id}
+        key, loader, policy = self._forecast_request(location_id, days)
+        return await self.cache.get_or_load(key, loader, should_cache=_is_success, **policy)
 
-            response = await client.get(url, params=params, headers=headers)
+    @instrument("qweather.refresh")
+    async def refresh_current_weather(self, location_id: str) -> dict:
+        """强制重新获取当前天气并写入缓存（后台预热使用）"""
+        key, loader, policy = self._current_weather_request(location_id)
+        return await self.cache.refresh(key, loader, ttl=policy["ttl"], should_cache=_is_success)
 
-            if not response.text:
-                raise ValueError("Forecast API 返回空响应")
+    @instrument("qweather.refresh")
+    async def refresh_forecast(self, location_id: str, days: int = 3) -> dict:
+        """强制重新获取天气预报并写入缓存（后台预热使用）"""
+        key, loader, policy = self._forecast_request(location_id, days)
+        return await self.cache.refresh(key, loader, ttl=policy["ttl"], should_cache=_is_success)
 
-            try:
-                return response.json()
-            except json_module.JSONDecodeError as e:
-                raise ValueError(f"Forecast API 返回无效 JSON: {response.text}") from e
+    @instrument("qweather.fetch_weather")
+    async def fetch_weather(self, location_id: str, days: int = 3, count: bool = True) -> dict:
+        """并发获取当前天气和天气预报
+
+        两个接口同时发起，耗时取决于较慢的一个。某个接口失败时保留另一个的结果，
+        失败原因记录在 errors 字段中；全部失败时抛出第一个异常。
+
+        参数:
+            location_id: 地区的 LocationID
+            days: 预报天数，可选 3 或 7
+            count: 是否计入 popularity（只读取数据版本等内部用途传 False）
+
+        返回:
+            {"current": ..., "forecast": ..., "errors": {...}, "stale": {...}}，
+            errors 为失败原因，stale 为已过期数据的数据龄（秒），没有时不含对应字段
+        """
+        if count:
+            self.popularity[(location_id, days)] += 1
+
+        names = ("current", "forecast")
+        results = await asyncio.gather(
+            self.get_current_weather(location_id),
+            self.get_forecast(location_id, days),
+            return_exceptions=True,
+        )
+
+        keys = (
+            self._current_weather_request(location_id)[0],
+            self._forecast_request(location_id, days)[0],
+        )
+        data = {}
+        errors = {}
+        stale = {}
+        for name, key, result in zip(names, keys, results):
+            if isinstance(result, BaseException):
+                data[name] = None
+                errors[name] = str(result) or type(result).__name__
+                continue
+            data[name] = result
+            # 已过期（stale-while-revalidate 或 stale-if-error）的数据附带数据龄
+            age = self.cache.age(key)
+            if age is not None and self.cache.remaining_ttl(key) is None:
+                stale[name] = round(age)
+
+        if len(errors) == len(names):
+            raise results[0]
+        if errors:
+            data["errors"] = errors
+        if stale:
+            data["stale"] = stale
+        return data
 
 
 qweather_service = QWeatherService()
+register_cache("weather", qweather_service.cache.stats)
 
 
-@tool
-async def qweather_tool(city: str) -> str:
-    """获取指定城市的天气信息
+async def get_city_weather(city: str, days: int = 3) -> dict:
+    """获取城市的 LocationID、当前天气和天气预报（天气工具和快速路径共用）
 
     参数:
-        city: 城市名称，如 "北京"、"上海"、"广州" 等（必填）
+        city: 城市名称
+        days: 预报天数，可选 3 或 7，其他值按 3 处理
 
     返回:
-        城市的当前天气和未来天气预报
+        {"city", "location_id", "current", "forecast"[, "errors"]}
     """
-    import json
+    if days not in (3, 7):
+        days = 3
 
     # 先根据城市名称获取 LocationID
     location_id = await qweather_service.get_location_id(city)
 
-    # 调用天气 API
-    current = await qweather_service.get_current_weather(location_id)
-    forecast = await qweather_service.get_forecast(location_id)
+    # 并发调用天气 API（当前天气 + 预报）
+    weather = await qweather_service.fetch_weather(location_id, days)
+
+    return {"city": city, "location_id": location_id, **weather}
+
+
+async def query_city_weather(city: str, days: int = 3, focus: str = "basic") -> str:
+    """获取指定城市的天气信息
+
+    参数:
+        city: 城市名称，如 "北京"、"上海"、"广州" 等（必填）
+        days: 预报天数，可选 3 或 7，用户询问一周或更远的天气时使用 7（默认 3）
+        focus: 问题类型，决定返回哪些字段：basic（默认）、rain（降水）、wind（风力）、
+            sun（日出日落、紫外线）、full（全部常用字段）
+
+    返回:
+        城市的当前天气（now）和逐天预报（daily 表格）
+    """
+    result = await get_city_weather(city, days)
+    return format_tool_payload(result, focus, settings.tool_payload_format)
+
+
+def __getattr__(name: str):
+    """qweather_tool（query_city_weather 包装的 LangChain 工具）在首次访问时创建
+
+    LangChain 导入较慢，只有 Agent 需要这个工具，健康检查、IP 定位等接口不加载它。
+    """
+    if name == "qweather_tool":
+        from langchain_core.tools import tool
 
-    result = {"city": city, "location_id": location_id, "current": current, "forecast": forecast}
-    return json.dumps(result, ensure_ascii=False)
+        globals()[name] = tool("qweather_tool")(query_city_weather)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,105 @@
+"""服务启动预热
+
+没有预热时，每次部署（开发时每次 --reload）后的第一个聊天请求要额外承担：
+- 导入 LangChain / OpenAI SDK 并创建 Agent（编译 Agent 图），约 1.5 秒
+- 与 LLM 端点、和风天气建立 TCP/TLS 连接
+- 加载城市索引、获取本机公网 IP（内网客户端按它定位）
+- 导入产生的大量对象触发的第一次完整垃圾回收（约 100ms）
+
+lifespan 在开始接受请求之前调用 warm_up() 完成这些工作。uvicorn 在 lifespan 启动完成后才监听端口
+（多 worker 时每个 worker 各自预热），健康检查能访问时服务已经预热完毕。
+
+预热尽力而为：任一步骤失败或超过 WARMUP_TIMEOUT 秒只记录日志，不阻止服务启动，
+对应的工作推迟到第一个请求。各步骤耗时见 skypulse_startup_warmup_seconds{step}。
+"""
+
+import asyncio
+import gc
+import logging
+import time
+from typing import TYPE_CHECKING, Callable
+
+from skypulse.core.config import settings
+from skypulse.core.metrics import histogram
+from skypulse.services import ip_service
+from skypulse.services.qweather_service import qweather_service
+from skypulse.utils.city_index import city_index
+
+if TYPE_CHECKING:
+    from skypulse.agent.agent import WeatherAgent
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SECONDS = histogram(
+    "skypulse_startup_warmup_seconds",
+    "启动预热各步骤耗时（秒）",
+    ["step"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+async def _public_ip():
+    if await ip_service.get_public_ip() is None:
+        raise RuntimeError("未获取到公网 IP")
+
+
+def _freeze_startup_objects():
+    """完整回收一次，再把现存对象（模块、类、Agent 图等常驻对象）移出 GC 跟踪范围
+
+    之后的完整回收不再扫描这些对象，第一个请求也不会碰上导入后积累的那次完整回收。
+    """
+    gc.collect()
+    gc.freeze()
+
+
+async def _step(name: str, step: Callable[[], object], report: dict, timeout: float):
+    """执行一个预热步骤，记录结果（ok / error / timeout）和耗时"""
+    start = time.perf_counter()
+    try:
+        result = step()
+        if asyncio.iscoroutine(result):
+            await asyncio.wait_for(result, timeout)
+        report[name] = "ok"
+    except TimeoutError:
+        report[name] = "timeout"
+        logger.warning("warmup_step_timeout", extra={"step": name, "timeout": timeout})
+    except Exception as e:
+        report[name] = "error"
+        logger.warning("warmup_step_failed", extra={"step": name, "error": str(e) or repr(e)})
+    finally:
+        WARMUP_SECONDS.observe(time.perf_counter() - start, step=name)
+
+
+async def warm_up(agent_factory: Callable[[], "WeatherAgent"]) -> dict[str, str]:
+    """预热 Agent、上游连接和本地数据
+
+    参数:
+        agent_factory: 返回（并缓存）天气 Agent 单例的函数，即 routes.agent.get_agent
+
+    返回:
+        各步骤的结果，如 {"city_index": "ok", "agent": "ok", "llm": "timeout", ...}
+    """
+    start = time.perf_counter()
+    report: dict[str, str] = {}
+    timeout = settings.warmup_timeout
+
+    # 本地 CPU 工作，依次执行
+    await _step("city_index", city_index.load, report, timeout)
+    await _step("agent", agent_factory, report, timeout)
+
+    # 网络连接，并发执行
+    steps = {
+        "qweather": qweather_service.connect,
+        "public_ip": _public_ip,
+    }
+    if report["agent"] == "ok":
+        steps["llm"] = agent_factory().pool.connect
+    await asyncio.gather(*(_step(name, step, report, timeout) for name, step in steps.items()))
+
+    await _step("gc", _freeze_startup_objects, report, timeout)
+
+    logger.info(
+        "warmup_finished",
+        extra={"duration_ms": round((time.perf_counter() - start) * 1000, 2), **report},
+    )
+    return report
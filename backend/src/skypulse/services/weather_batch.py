@@ -0,0 +1,96 @@
+"""批量天气查询（不经过 LLM）
+
+给多城市看板等场景使用：
+- 重复的地点只查询一次：相同的查询字符串先去重，解析到同一 LocationID 的地点共享一次上游请求
+- LocationID 先在本地批量解析（纯数字视为 LocationID，其余查城市索引和城市缓存），
+  只有未命中的城市才调用 Geo API
+- 上游请求（Geo + 实时天气/预报）由信号量限制并发数
+- 结果按完成顺序逐个产出，便于以 NDJSON 流式返回
+"""
+
+import asyncio
+from typing import AsyncIterator, Iterable, Optional
+
+from skypulse.core.metrics import instrument
+from skypulse.models.schemas import WeatherBatchItem, WeatherResponse
+from skypulse.services.qweather_service import qweather_service
+from skypulse.utils.city_index import city_index
+from skypulse.utils.location_cache import get_location_id
+
+
+def resolve_local(query: str) -> Optional[str]:
+    """不发请求地解析 LocationID：纯数字原样返回，其余查城市索引和城市缓存"""
+    if query.isdigit():
+        return query
+    return city_index.lookup(query) or get_location_id(query)
+
+
+def _weather_error(weather: dict) -> Optional[str]:
+    errors = weather.get("errors")
+    if errors:
+        return "; ".join(f"{name}: {error}" for name, error in errors.items())
+    for name in ("current", "forecast"):
+        code = weather[name].get("code")
+        if code != "200":
+            return f"{name}: 和风天气返回 code {code}"
+    return None
+
+
+@instrument("weather_batch.fetch")
+async def fetch_batch(
+    queries: Iterable[str], days: int = 3, concurrency: int = 8
+) -> AsyncIterator[WeatherBatchItem]:
+    """批量获取多个地点的天气，按完成顺序产出结果
+
+    参数:
+        queries: 城市名或 LocationID 列表（重复项只查询一次、只产出一次）
+        days: 预报天数，可选 3 或 7
+        concurrency: 同时请求上游的地点数上限
+
+    返回:
+        异步迭代 WeatherBatchItem，失败的地点 error 字段为失败原因
+    """
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    semaphore = asyncio.Semaphore(concurrency)
+    fetches: dict[str, asyncio.Task] = {}
+
+    async def fetch_weather(location_id: str) -> dict:
+        async with semaphore:
+            return await qweather_service.fetch_weather(location_id, days)
+
+    async def run(query: str) -> WeatherBatchItem:
+        location_id = resolve_local(query)
+        try:
+            if location_id is None:
+                async with semaphore:
+                    location_id = await qweather_service.get_location_id(query)
+
+            # 解析到同一 LocationID 的地点共享一次请求
+            task = fetches.get(location_id)
+            if task is None:
+                task = fetches[location_id] = asyncio.ensure_future(fetch_weather(location_id))
+            weather = await asyncio.shield(task)
+
+            error = _weather_error(weather)
+            if error:
+                return WeatherBatchItem(query=query, location_id=location_id, error=error)
+            return WeatherBatchItem(
+                query=query,
+                location_id=location_id,
+                weather=WeatherResponse.from_qweather(
+                    query, weather["current"], weather["forecast"]
+                ),
+            )
+        except Exception as e:
+            return WeatherBatchItem(
+                query=query, location_id=location_id, error=str(e) or type(e).__name__
+            )
+
+    tasks = [asyncio.ensure_future(run(query)) for query in queries]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 调用方提前停止迭代（如客户端断开）时取消剩余请求
+        for task in (*tasks, *fetches.values()):
+            task.cancel()
@@ -0,0 +1,113 @@
+"""天气数据投影：把和风天气的原始响应压缩成给 LLM 看的紧凑格式
+
+原始响应里的 refer/fxLink/updateTime、月相、夜间风速等字段对回答问题没有帮助，
+却会占用大量 prompt token。这里先按 WeatherNow / WeatherForecast 模型取出核心字段，
+再按问题类型（focus）追加少量相关字段，最后输出为：
+- table: 紧凑的表格文本（默认，token 最少）
+- json: 紧凑 JSON
+- raw: 原始响应（用于对比或排查问题）
+"""
+
+import json
+from typing import Optional
+
+from skypulse.models.schemas import WeatherForecast, WeatherNow
+
+# 问题类型 -> (实时天气附加字段, 逐天预报附加字段)
+FIELD_SETS: dict[str, tuple[tuple[str, ...], tuple[str, ...]]] = {
+    "basic": ((), ()),
+    "rain": (("precip",), ("textNight", "precip", "humidity")),
+    "wind": (("wind360", "windSpeed"), ("windSpeedDay", "windDirNight", "windScaleNight")),
+    "sun": ((), ("sunrise", "sunset", "uvIndex")),
+    "full": (
+        ("precip", "windSpeed", "pressure", "vis", "cloud"),
+        ("textNight", "precip", "humidity", "uvIndex", "sunrise", "sunset"),
+    ),
+}
+
+
+def _fields(focus: str) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    extra_now, extra_daily = FIELD_SETS.get(focus, FIELD_SETS["basic"])
+    now_fields = tuple(dict.fromkeys((*WeatherNow.model_fields, *extra_now)))
+    daily_fields = tuple(dict.fromkeys((*WeatherForecast.model_fields, *extra_daily)))
+    return now_fields, daily_fields
+
+
+def _project(row: dict, fields: tuple[str, ...], model) -> dict:
+    """先用 pydantic 模型校验核心字段，再按字段列表取值"""
+    data = {**row, **model.model_validate(row).model_dump()}
+    return {field: data.get(field, "") for field in fields}
+
+
+def project_weather(weather: dict, focus: str = "basic") -> dict:
+    """把 get_city_weather 的结果投影为只包含所需字段的字典
+
+    参数:
+        weather: get_city_weather 的返回值（含原始 current / forecast 响应）
+        focus: 问题类型，见 FIELD_SETS，未知类型按 basic 处理
+
+    返回:
+        {"city", "location_id", "now", "daily"[, "errors"][, "stale"]}，
+        stale 为过期数据的数据龄（分钟）
+    """
+    now_fields, daily_fields = _fields(focus)
+    result = {"city": weather.get("city"), "location_id": weather.get("location_id")}
+
+    current: Optional[dict] = weather.get("current")
+    if current and current.get("now"):
+        result["now"] = _project(current["now"], now_fields, WeatherNow)
+
+    forecast: Optional[dict] = weather.get("forecast")
+    if forecast and forecast.get("daily"):
+        result["daily"] = [
+            _project({"date": day.get("fxDate"), **day}, daily_fields, WeatherForecast)
+            for day in forecast["daily"]
+        ]
+
+    errors = dict(weather.get("errors") or {})
+    for name, response in (("current", current), ("forecast", forecast)):
+        if response and response.get("code") not in (None, "200"):
+            errors[name] = f"code {response.get('code')}"
+    if errors:
+        result["errors"] = errors
+    stale = weather.get("stale")
+    if stale:
+        result["stale"] = {name: max(1, round(age / 60)) for name, age in stale.items()}
+    return result
+
+
+def render_table(projected: dict) -> str:
+    """渲染为表格文本：实时天气一行 key=value，预报为 | 分隔的表格"""
+    lines = [f"city={projected['city']} id={projected['location_id']}"]
+    now = projected.get("now")
+    if now:
+        lines.append("now: " + " ".join(f"{k}={v}" for k, v in now.items()))
+    daily = projected.get("daily")
+    if daily:
+        columns = list(daily[0])
+        lines.append("daily:")
+        lines.append("|".join(columns))
+        lines.extend("|".join(str(day[c]) for c in columns) for day in daily)
+    errors = projected.get("errors")
+    if errors:
+        lines.append("errors: " + "; ".join(f"{k}={v}" for k, v in errors.items()))
+    stale = projected.get("stale")
+    if stale:
+        lines.append("stale: " + " ".join(f"{k}={v}min" for k, v in stale.items()))
+    return "\n".join(lines)
+
+
+def format_tool_payload(weather: dict, focus: str = "basic", fmt: str = "table") -> str:
+    """生成 qweather_tool 返回给 LLM 的文本
+
+    参数:
+        weather: get_city_weather 的返回值
+        focus: 问题类型，见 FIELD_SETS
+        fmt: 输出格式，table / json / raw
+    """
+    if fmt == "raw":
+        return json.dumps(weather, ensure_ascii=False)
+    projected = project_weather(weather, focus)
+    if fmt == "json":
+        return json.dumps(projected, ensure_ascii=False, separators=(",", ":"))
+    return render_table(projected)
@@ -0,0 +1,220 @@
+"""聊天请求准入控制
+
+每个聊天请求都会调用 LLM 和和风天气，突发流量下同时执行的 Agent 过多时所有请求一起变慢。
+AdmissionController 在路由入口限制同时执行的请求数：
+- 全局并发上限: 超出的请求进入有界等待队列，队列满时直接返回 503
+- 排队时间上限: 超过 queue_timeout（或请求剩余的截止时间）仍未轮到时返回 503
+- 单客户端上限: 同一客户端（user_id 或 IP）执行中 + 排队中的请求数超过上限时返回 429
+- 公平分配: 名额空出时优先分给执行中请求最少的客户端，同等情况下先到先得
+
+拒绝时抛出 AdmissionRejected，附带按平均执行时间估算的 Retry-After。
+执行数、队列长度、排队时间和准入结果见 skypulse_chat_admission_* 指标。
+
+使用方式:
+    async with admission.admit(client):
+        ...
+
+    release = await admission.acquire(client)   # 名额需要跨越函数边界时（如流式响应）
+    ...
+    release()
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Callable
+
+from skypulse.core.metrics import counter, gauge, histogram
+from skypulse.utils import deadline
+
+ADMISSION_ACTIVE = gauge("skypulse_chat_admission_active", "正在执行的聊天请求数")
+ADMISSION_QUEUED = gauge("skypulse_chat_admission_queue_depth", "排队等待执行的聊天请求数")
+ADMISSION_WAIT = histogram(
+    "skypulse_chat_admission_wait_seconds", "聊天请求排队等待时间（秒，只统计进入队列的请求）"
+)
+ADMISSION_RESULTS = counter(
+    "skypulse_chat_admission_total",
+    "准入结果（admitted: 直接执行，queued: 排队后执行，rejected_client: 单客户端超限，"
+    "rejected_queue_full: 队列已满，rejected_timeout: 排队超时，cancelled: 排队时客户端断开）",
+    ["result"],
+)
+
+# 平均执行时间的初始估计和平滑系数（用于估算 Retry-After）
+INITIAL_HOLD_TIME = 1.0
+HOLD_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入（429: 单客户端超限，503: 服务繁忙）"""
+
+    def __init__(self, reason: str, status_code: int, retry_after: float):
+        super().__init__(f"请求未被准入: {reason}")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    client: str
+    future: asyncio.Future
+
+
+class AdmissionController:
+    """全局并发上限 + 有界等待队列 + 单客户端公平分配"""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int = 0,
+        queue_timeout: float = 10.0,
+        per_client: int = 0,
+    ):
+        """
+        参数:
+            max_concurrency: 同时执行的请求数上限，0 表示不限
+            max_queue: 等待队列长度上限，0 表示不排队（满载时直接拒绝）
+            queue_timeout: 最长排队时间（秒）
+            per_client: 单个客户端执行中 + 排队中的请求数上限，0 表示不限
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.per_client = per_client
+
+        self.active = 0
+        self._queue: list[_Waiter] = []
+        # 客户端 -> 执行中的请求数 / 执行中 + 排队中的请求数
+        self._active_by_client: dict[str, int] = {}
+        self._pending_by_client: dict[str, int] = {}
+        self._hold_time = INITIAL_HOLD_TIME
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def retry_after(self) -> float:
+        """估算多久后可能有空闲名额：平均执行时间 × (排队数 / 并发上限 + 1)"""
+        if self.max_concurrency <= 0:
+            return self._hold_time
+        return self._hold_time * (self.queued / self.max_concurrency + 1)
+
+    def _reject(self, reason: str, status_code: int):
+        ADMISSION_RESULTS.inc(result=f"rejected_{reason}")
+        raise AdmissionRejected(reason, status_code, self.retry_after())
+
+    def _grant(self, client: str):
+        self.active += 1
+        self._active_by_client[client] = self._active_by_client.get(client, 0) + 1
+        ADMISSION_ACTIVE.inc()
+
+    def _decrement(self, counts: dict[str, int], client: str):
+        remaining = counts.pop(client) - 1
+        if remaining > 0:
+            counts[client] = remaining
+
+    def _release(self, client: str, held: float):
+        self.active -= 1
+        self._decrement(self._active_by_client, client)
+        self._decrement(self._pending_by_client, client)
+        ADMISSION_ACTIVE.dec()
+        self._hold_time += HOLD_TIME_ALPHA * (held - self._hold_time)
+        self._wake()
+
+    def _wake(self):
+        """把空出的名额分给执行中请求最少的客户端（同等情况下排队最久的请求）"""
+        while self._queue and (self.max_concurrency <= 0 or self.active < self.max_concurrency):
+            waiter = min(self._queue, key=lambda w: self._active_by_client.get(w.client, 0))
+            self._queue.remove(waiter)
+            ADMISSION_QUEUED.dec()
+            self._grant(waiter.client)
+            waiter.future.set_result(None)
+
+    def _abandon(self, waiter: _Waiter):
+        """排队的请求超时或被取消：已经分到名额时归还（不计入平均执行时间），否则移出队列"""
+        if waiter.future.done():
+            self._release(waiter.client, self._hold_time)
+            return
+        self._queue.remove(waiter)
+        ADMISSION_QUEUED.dec()
+        self._decrement(self._pending_by_client, waiter.client)
+
+    def _release_once(self, client: str) -> Callable[[], None]:
+        started = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._release(client, time.monotonic() - started)
+
+        return release
+
+    async def acquire(self, client: str) -> Callable[[], None]:
+        """获取执行名额，必要时排队等待
+
+        参数:
+            client: 客户端标识（user_id 或 IP）
+
+        返回:
+            释放名额的函数（可重复调用，只生效一次）
+
+        异常:
+            AdmissionRejected: 单客户端超限（429）、队列已满或排队超时（503）
+        """
+        if self.per_client > 0 and self._pending_by_client.get(client, 0) >= self.per_client:
+            self._reject("client", 429)
+
+        if self.max_concurrency <= 0 or (self.active < self.max_concurrency and not self._queue):
+            self._pending_by_client[client] = self._pending_by_client.get(client, 0) + 1
+            self._grant(client)
+            ADMISSION_RESULTS.inc(result="admitted")
+            return self._release_once(client)
+
+        if self.queued >= self.max_queue:
+            self._reject("queue_full", 503)
+
+        waiter = _Waiter(client, asyncio.get_running_loop().create_future())
+        self._queue.append(waiter)
+        self._pending_by_client[client] = self._pending_by_client.get(client, 0) + 1
+        ADMISSION_QUEUED.inc()
+
+        timeout = self.queue_timeout
+        left = deadline.remaining()
+        if left is not None:
+            timeout = max(0.0, min(timeout, left))
+
+        started = time.monotonic()
+        try:
+            done, _ = await asyncio.wait((waiter.future,), timeout=timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            ADMISSION_RESULTS.inc(result="cancelled")
+            raise
+        ADMISSION_WAIT.observe(time.monotonic() - started)
+        if not done:
+            self._abandon(waiter)
+            self._reject("timeout", 503)
+        ADMISSION_RESULTS.inc(result="queued")
+        return self._release_once(client)
+
+    @asynccontextmanager
+    async def admit(self, client: str):
+        """在代码块执行期间占用一个名额"""
+        release = await self.acquire(client)
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> dict:
+        """当前执行数、排队数和估算的 Retry-After"""
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "clients": len(self._pending_by_client),
+            "avg_hold_seconds": round(self._hold_time, 3),
+            "retry_after": round(self.retry_after(), 3),
+        }
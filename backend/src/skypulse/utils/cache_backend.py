@@ -0,0 +1,260 @@
+"""跨 worker 共享的缓存后端
+
+多 worker 部署时每个进程都有自己的 TTLCache，同一份天气数据会被每个 worker 各请求一次。
+配置 CACHE_BACKEND_URL 后，进程内缓存未命中时先查共享后端，加载成功后写回，
+所有 worker（以及多台机器）共享同一份数据：
+- sqlite:///path/to/cache.db: 同一台机器上的多个 worker 共享一个 SQLite 文件（WAL 模式）
+- redis://host:6379/0: Redis 或兼容 Redis 协议的服务，需安装 `skypulse[redis]`
+
+值以 JSON 存储，过期时间由后端维护；后端读写失败时按未命中处理，不影响请求。
+claim 提供带过期时间的租约，用于只让一个 worker 执行的后台任务（如预热）。
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional
+
+from skypulse.core.config import settings
+from skypulse.core.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+BACKEND_OPS = counter("skypulse_cache_backend_ops_total", "共享缓存后端操作数", ["op", "result"])
+
+
+class CacheBackend(ABC):
+    """共享缓存后端接口（缺少任一抽象方法的实现在创建时即报错）"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[tuple[Any, float]]:
+        """读取值，返回 (值, 剩余存活秒数)，不存在或已过期时返回 None"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        """写入值，ttl 秒后过期"""
+
+    @abstractmethod
+    async def claim(self, key: str, owner: str, ttl: float) -> bool:
+        """获取或续期租约：key 不存在、已过期或已属于 owner 时写入 owner 并返回 True"""
+
+    async def close(self):
+        """关闭连接"""
+
+
+class SQLiteBackend(CacheBackend):
+    """本机多 worker 共享的 SQLite 后端（所有读写在单个后台线程中执行）"""
+
+    # 每写入这么多次清理一次过期条目
+    PURGE_EVERY = 256
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-backend")
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str) -> Optional[tuple[Any, float]]:
+        row = (
+            self._connect()
+            .execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,))
+            .fetchone()
+        )
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            return None
+        return json.loads(row[0]), remaining
+
+    def _set(self, key: str, value: str, ttl: float):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        conn.commit()
+
+    def _claim(self, key: str, owner: str, ttl: float) -> bool:
+        conn = self._connect()
+        now = time.time()
+        # 单条 UPSERT：只覆盖已过期或属于同一 owner 的租约
+        conn.execute(
+            """
+            INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+            WHERE cache.expires_at < ? OR cache.value = excluded.value
+            """,
+            (key, owner, now + ttl, now),
+        )
+        conn.commit()
+        row = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] == owner
+
+    async def get(self, key: str) -> Optional[tuple[Any, float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._get, key)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        data = json.dumps(value, ensure_ascii=False)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._set, key, data, ttl)
+
+    async def claim(self, key: str, owner: str, ttl: float) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._claim, key, owner, ttl)
+
+    async def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, conn.close)
+
+
+class RedisBackend(CacheBackend):
+    """Redis（或兼容协议的服务）后端"""
+
+    # 租约属于自己时续期，否则仅在不存在时写入
+    CLAIM_SCRIPT = """
+    if redis.call("GET", KEYS[1]) == ARGV[1] then
+        return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+    end
+    if redis.call("SET", KEYS[1], ARGV[1], "NX", "PX", ARGV[2]) then
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "使用 Redis 缓存后端需要安装 redis：pip install 'skypulse[redis]'"
+            ) from e
+        self.url = url
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[tuple[Any, float]]:
+        async with self._client.pipeline(transaction=False) as pipe:
+            data, pttl = await pipe.get(key).pttl(key).execute()
+        if data is None or pttl <= 0:
+            return None
+        return json.loads(data), pttl / 1000
+
+    async def set(self, key: str, value: Any, ttl: float):
+        data = json.dumps(value, ensure_ascii=False)
+        await self._client.set(key, data, px=max(1, int(ttl * 1000)))
+
+    async def claim(self, key: str, owner: str, ttl: float) -> bool:
+        claimed = await self._client.eval(self.CLAIM_SCRIPT, 1, key, owner, max(1, int(ttl * 1000)))
+        return bool(claimed)
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_backend(url: str) -> Optional[CacheBackend]:
+    """根据 URL 创建缓存后端，URL 为空时返回 None（只使用进程内缓存）
+
+    参数:
+        url: sqlite:///path 或 redis://host:port/db（rediss:// 亦可）
+    """
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url.removeprefix("sqlite:///"))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"不支持的缓存后端: {url}")
+
+
+class SharedCache:
+    """带命名空间的共享缓存视图，屏蔽后端异常（异常按未命中处理）"""
+
+    def __init__(self, backend: Optional[CacheBackend], namespace: str):
+        self.backend = backend
+        self.namespace = namespace
+
+    def __bool__(self) -> bool:
+        return self.backend is not None
+
+    def _key(self, key) -> str:
+        return f"skypulse:{self.namespace}:{json.dumps(key, ensure_ascii=False)}"
+
+    async def get(self, key) -> Optional[tuple[Any, float]]:
+        """读取 (值, 剩余存活秒数)，未配置后端、未命中或出错时返回 None"""
+        if self.backend is None:
+            return None
+        try:
+            result = await self.backend.get(self._key(key))
+        except Exception as e:
+            BACKEND_OPS.inc(op="get", result="error")
+            logger.warning("cache_backend_error", extra={"op": "get", "error": str(e)})
+            return None
+        BACKEND_OPS.inc(op="get", result="hit" if result is not None else "miss")
+        return result
+
+    async def set(self, key, value: Any, ttl: float):
+        """写入共享后端，出错时只记录日志"""
+        if self.backend is None or ttl <= 0:
+            return
+        try:
+            await self.backend.set(self._key(key), value, ttl)
+            BACKEND_OPS.inc(op="set", result="ok")
+        except Exception as e:
+            BACKEND_OPS.inc(op="set", result="error")
+            logger.warning("cache_backend_error", extra={"op": "set", "error": str(e)})
+
+    async def claim(self, key, owner: str, ttl: float) -> bool:
+        """获取或续期租约，未配置后端时总是成功（单 worker），后端出错时返回 False"""
+        if self.backend is None:
+            return True
+        try:
+            claimed = await self.backend.claim(self._key(key), owner, ttl)
+        except Exception as e:
+            BACKEND_OPS.inc(op="claim", result="error")
+            logger.warning("cache_backend_error", extra={"op": "claim", "error": str(e)})
+            return False
+        BACKEND_OPS.inc(op="claim", result="ok" if claimed else "held")
+        return claimed
+
+
+shared_backend = create_backend(settings.cache_backend_url)
+
+
+def shared_cache(namespace: str) -> SharedCache:
+    """返回指定命名空间的共享缓存视图"""
+    return SharedCache(shared_backend, namespace)
+
+
+async def close_backend():
+    """关闭共享缓存后端连接"""
+    if shared_backend is not None:
+        await shared_backend.close()
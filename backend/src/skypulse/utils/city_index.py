@@ -0,0 +1,231 @@
+"""预构建的城市名 -> LocationID 索引
+
+索引由和风天气城市列表（China-City-List-latest.csv）生成，随包发布为
+gzip 压缩的 TSV（每行 "归一化名称<TAB>LocationID"），首次查询时加载到内存。
+
+同一个地点会生成多个别名：中文名、去掉 市/区/县 后缀的名称、拼音/英文名，
+以及 "上级城市+名称"（如 "北京朝阳"）。重名地点按行政级别取最高的一个，
+级别相同无法区分时不收录，交给 Geo API 处理。
+
+重新生成索引:
+    python -m skypulse.utils.city_index build China-City-List-latest.csv
+"""
+
+import csv
+import gzip
+import re
+import sys
+from pathlib import Path
+from typing import Iterable, Optional
+
+from skypulse.core.metrics import register_cache
+
+PACKAGE_DATA_DIR = Path(__file__).parent.parent / "data"
+INDEX_PATH = PACKAGE_DATA_DIR / "city_index.tsv.gz"
+SEED_CSV_PATH = PACKAGE_DATA_DIR / "hot-cities.csv"
+
+SUFFIXES = ("市", "区", "县")
+_STRIP_RE = re.compile(r"[\s'’\-_.,，。·]+")
+_EN_SUFFIX_RE = re.compile(r"(city|district|county)$")
+
+
+def normalize(name: str) -> str:
+    """归一化城市名：去除空白和标点，英文转小写，去掉英文行政后缀"""
+    key = _STRIP_RE.sub("", name).lower()
+    if key.isascii():
+        key = _EN_SUFFIX_RE.sub("", key)
+    return key
+
+
+def _strip_suffix(name: str) -> str:
+    if len(name) > 2 and name.endswith(SUFFIXES):
+        return name[:-1]
+    return name
+
+
+def candidate_keys(name: str) -> list[str]:
+    """查询时依次尝试的键：原样，再逐个去掉末尾的 市/区/县（名称中间的不动，如 "市北区"）"""
+    key = normalize(name)
+    if not key:
+        return []
+    keys = [key]
+    while (stripped := _strip_suffix(keys[-1])) != keys[-1]:
+        keys.append(stripped)
+    return keys
+
+
+class CityIndex:
+    """城市名索引（懒加载）"""
+
+    def __init__(self, path: Path = INDEX_PATH):
+        self.path = path
+        self._index: Optional[dict[str, str]] = None
+        # LocationID -> 最短的中文别名，用于把英文城市名（IP 定位结果）转成中文
+        self._names: dict[str, str] = {}
+        self._max_key_len = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load(self) -> dict[str, str]:
+        """加载索引文件；文件不存在时使用空索引"""
+        if self._index is None:
+            index = {}
+            if Path(self.path).exists():
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        key, _, location_id = line.rstrip("\n").partition("\t")
+                        index[key] = location_id
+            names: dict[str, str] = {}
+            for key, location_id in index.items():
+                current = names.get(location_id)
+                if not key.isascii() and (current is None or len(key) < len(current)):
+                    names[location_id] = key
+            self._names = names
+            self._max_key_len = max(map(len, index), default=0)
+            self._index = index
+        return self._index
+
+    def lookup(self, name: str) -> Optional[str]:
+        """查找城市的 LocationID，未收录返回 None"""
+        index = self.load()
+        # 快速路径：输入本身就是归一化后的键（最常见的 "北京"、"上海"）
+        location_id = index.get(name)
+        if location_id:
+            self.hits += 1
+            return location_id
+
+        for key in candidate_keys(name):
+            location_id = index.get(key)
+            if location_id:
+                self.hits += 1
+                return location_id
+        self.misses += 1
+        return None
+
+    def chinese_name(self, name: str) -> Optional[str]:
+        """城市的中文名（如 "Beijing" -> "北京"），未收录或没有中文别名时返回 None"""
+        location_id = self.lookup(name)
+        if location_id is None:
+            return None
+        return self._names.get(location_id)
+
+    def find_in_text(self, text: str) -> list[tuple[str, str]]:
+        """在一句话中查找出现的中文城市名（从左到右，优先最长匹配，互不重叠）
+
+        返回:
+            [(城市名, LocationID), ...]，同一个 LocationID 只返回一次
+        """
+        index = self.load()
+        found: dict[str, str] = {}
+        i = 0
+        while i < len(text):
+            for length in range(min(self._max_key_len, len(text) - i), 1, -1):
+                word = text[i : i + length]
+                location_id = index.get(word)
+                if location_id and not word.isascii():
+                    found.setdefault(location_id, word)
+                    i += length
+                    break
+            else:
+                i += 1
+        return [(word, location_id) for location_id, word in found.items()]
+
+    def stats(self) -> dict:
+        """查询统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index or ()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+
+def _read_rows(csv_path: Path) -> Iterable[dict]:
+    """读取和风天气城市列表 CSV（首行可能是版本说明，跳到表头所在行）"""
+    with open(csv_path, encoding="utf-8-sig", newline="") as f:
+        lines = f.readlines()
+    start = next(i for i, line in enumerate(lines) if line.startswith("Location_ID"))
+    yield from csv.DictReader(lines[start:])
+
+
+def hot_location_ids(csv_path: Path = SEED_CSV_PATH) -> list[str]:
+    """热门城市的 LocationID 列表（随包发布的 hot-cities.csv）"""
+    return [row["Location_ID"] for row in _read_rows(csv_path)]
+
+
+def build_index(rows: Iterable[dict]) -> dict[str, str]:
+    """根据城市列表生成别名索引
+
+    参数:
+        rows: CSV 行，需要 Location_ID、Location_Name_ZH、Location_Name_EN、
+              Adm1_Name_ZH、Adm2_Name_ZH 字段
+    """
+    # key -> {rank: set(location_id)}，rank 越小行政级别越高
+    candidates: dict[str, dict[int, set[str]]] = {}
+
+    def add(key: str, rank: int, location_id: str):
+        if key:
+            candidates.setdefault(key, {}).setdefault(rank, set()).add(location_id)
+
+    for row in rows:
+        location_id = row["Location_ID"].strip()
+        name_zh = row["Location_Name_ZH"].strip()
+        name_en = row.get("Location_Name_EN", "").strip()
+        adm1 = row.get("Adm1_Name_ZH", "").strip()
+        adm2 = row.get("Adm2_Name_ZH", "").strip()
+
+        if name_zh == adm1:
+            rank = 0
+        elif name_zh == adm2:
+            rank = 1
+        else:
+            rank = 2
+
+        for name in (name_zh, name_en):
+            key = normalize(name)
+            add(key, rank, location_id)
+            add(_strip_suffix(key), rank, location_id)
+
+        if adm2 and adm2 != name_zh:
+            add(normalize(_strip_suffix(adm2) + _strip_suffix(name_zh)), rank, location_id)
+
+    index = {}
+    for key, ranked in candidates.items():
+        best = ranked[min(ranked)]
+        if len(best) == 1:
+            index[key] = next(iter(best))
+    return index
+
+
+def write_index(index: dict[str, str], path: Path = INDEX_PATH):
+    """写出 gzip 压缩的 TSV 索引（按键排序，mtime 固定以保证可复现）"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    data = "".join(f"{key}\t{index[key]}\n" for key in sorted(index)).encode("utf-8")
+    with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+        f.write(data)
+
+
+city_index = CityIndex()
+register_cache("city_index", city_index.stats)
+
+
+def main(argv: list[str] | None = None):
+    """命令行入口：build [CSV 路径] [输出路径]"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] != "build":
+        print("用法: python -m skypulse.utils.city_index build [CSV 路径] [输出路径]")
+        sys.exit(1)
+
+    csv_path = Path(argv[1]) if len(argv) > 1 else SEED_CSV_PATH
+    out_path = Path(argv[2]) if len(argv) > 2 else INDEX_PATH
+    index = build_index(_read_rows(csv_path))
+    write_index(index, out_path)
+    print(f"已生成 {out_path}，共 {len(index)} 个别名")
+
+
+if __name__ == "__main__":
+    main()
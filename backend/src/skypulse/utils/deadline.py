@@ -0,0 +1,63 @@
+"""请求级截止时间
+
+路由在入口处设置截止时间（ContextVar，随 asyncio 任务的上下文自动传递给 Agent、工具调用、
+城市解析、预取和缓存加载等子任务），各层用 enforce() 把剩余时间作为超时：
+- Upstream.call（和风天气、ip-api）的每次尝试、退避等待和限速等待都不超过剩余时间
+- WeatherAgent 的模型调用（含工具执行）整体不超过剩余时间
+
+超时抛出 DeadlineExceeded（不是上游故障，不计入熔断），/chat 返回 504，流式接口发送提示。
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("skypulse_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """请求超过截止时间"""
+
+    def __init__(self, stage: str = ""):
+        super().__init__(f"请求超时{f'（{stage}）' if stage else ''}")
+        self.stage = stage
+
+
+def set_deadline(seconds: float):
+    """设置当前上下文的截止时间（seconds 秒后），seconds <= 0 表示不限
+
+    每个请求在独立的任务中处理，截止时间只对该请求及其创建的子任务生效。
+    """
+    _deadline.set(time.monotonic() + seconds if seconds > 0 else None)
+
+
+def remaining() -> Optional[float]:
+    """距截止时间的秒数（可能为负），未设置截止时间时返回 None"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@asynccontextmanager
+async def enforce(stage: str = ""):
+    """在剩余时间内执行代码块，超时时取消代码块并抛出 DeadlineExceeded
+
+    参数:
+        stage: 阶段名称，用于错误信息
+    """
+    left = remaining()
+    if left is None:
+        yield
+        return
+    if left <= 0:
+        raise DeadlineExceeded(stage)
+
+    timeout = asyncio.timeout(left)
+    try:
+        async with timeout:
+            yield
+    except TimeoutError as e:
+        if timeout.expired():
+            raise DeadlineExceeded(stage) from e
+        raise
@@ -0,0 +1,46 @@
+"""客户端断开检测
+
+流式响应由 Starlette 监听 http.disconnect 并取消响应生成器；普通 JSON 接口的处理协程
+不会被取消，客户端超时离开后服务端仍会跑完整个 Agent（消耗 LLM token 和上游配额）。
+cancel_on_disconnect 在处理期间同时监听断开事件，客户端断开时立即取消处理，
+取消沿 await 链传递到 Agent、工具调用和上游请求（共享的缓存加载在没有等待者时取消）。
+"""
+
+import asyncio
+from typing import Awaitable, TypeVar
+
+from fastapi import Request
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """处理完成前客户端已断开连接"""
+
+
+async def wait_for_disconnect(request: Request):
+    """等待客户端断开连接（请求体已读取完毕后，receive 只会返回 http.disconnect）"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """执行 awaitable，客户端先断开时取消它并抛出 ClientDisconnected
+
+    参数:
+        request: 当前请求
+        awaitable: 请求的处理协程
+    """
+    work = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait((work, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
+    if work not in done:
+        raise ClientDisconnected()
+    return work.result()
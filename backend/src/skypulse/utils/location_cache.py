@@ -1,29 +1,154 @@
-"""城市名到 LocationID 的本地缓存模块"""
+"""城市名到 LocationID 的本地缓存模块
 
+两级存储：
+- 内存字典：启动时从 SQLite 全量加载，查询只读内存，不触碰磁盘
+- SQLite：单个长连接（WAL 模式），新写入先攒批，再在后台线程中批量提交
+"""
+
+import asyncio
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
+from skypulse.core.metrics import instrument, register_cache
+
 # 数据库文件路径
 DATA_DIR = Path(__file__).parent.parent.parent.parent / "data"
 DB_PATH = DATA_DIR / "location_cache.db"
 
 
+class LocationCache:
+    """城市名 -> LocationID 两级缓存"""
+
+    def __init__(self, db_path: Path = DB_PATH, flush_interval: float = 1.0):
+        """
+        参数:
+            db_path: SQLite 数据库文件路径
+            flush_interval: 写入攒批的等待时间（秒）
+        """
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+
+        self._memory: dict[str, str] = {}
+        self._pending: dict[str, str] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        # 单线程执行器：连接只在这一个线程里写，天然串行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="location-cache")
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def init(self):
+        """打开数据库连接、建表，并把已有记录加载到内存"""
+        if self._conn is not None:
+            return
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS location_cache (
+                city_name TEXT PRIMARY KEY,
+                location_id TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+
+        rows = conn.execute("SELECT city_name, location_id FROM location_cache").fetchall()
+        self._memory.update(rows)
+        self._conn = conn
+
+    def get(self, city_name: str) -> Optional[str]:
+        """从内存获取城市的 LocationID，未命中返回 None"""
+        location_id = self._memory.get(city_name)
+        if location_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return location_id
+
+    def save(self, city_name: str, location_id: str):
+        """写入缓存：内存立即生效，磁盘写入攒批后在后台线程提交"""
+        self._memory[city_name] = location_id
+        self._pending[city_name] = location_id
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中（如 CLI 脚本），直接同步写入
+            self._write_batch(self._take_pending())
+            return
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    @instrument("location_cache.flush")
+    async def flush(self):
+        """把待写入的记录批量提交到 SQLite（在后台线程执行）"""
+        batch = self._take_pending()
+        if batch:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._write_batch, batch)
+
+    async def close(self):
+        """提交剩余写入并关闭连接"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, conn.close)
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _take_pending(self) -> list[tuple[str, str]]:
+        batch = list(self._pending.items())
+        self._pending.clear()
+        return batch
+
+    def _write_batch(self, batch: list[tuple[str, str]]):
+        if self._conn is None or not batch:
+            return
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO location_cache (city_name, location_id) VALUES (?, ?)",
+                batch,
+            )
+            self._conn.commit()
+        except sqlite3.Error:
+            pass  # 静默处理缓存写入失败，内存中的记录仍然有效
+
+
+location_cache = LocationCache()
+register_cache("location", location_cache.stats)
+
+
 def init_cache():
-    """初始化缓存数据库"""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS location_cache (
-            city_name TEXT PRIMARY KEY,
-            location_id TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
+    """初始化缓存数据库并预加载到内存"""
+    location_cache.init()
+
+
+async def close_cache():
+    """提交剩余写入并关闭缓存数据库"""
+    await location_cache.close()
 
 
 def get_location_id(city_name: str) -> Optional[str]:
@@ -35,18 +160,7 @@ def get_location_id(city_name: str) -> Optional[str]:
     返回:
         LocationID，如果缓存未命中则返回 None
     """
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT location_id FROM location_cache WHERE city_name = ?", (city_name,))
-        result = cursor.fetchone()
-        conn.close()
-
-        if result:
-            return result[0]
-        return None
-    except sqlite3.Error:
-        return None
+    return location_cache.get(city_name)
 
 
 def save_location_id(city_name: str, location_id: str):
@@ -56,17 +170,4 @@ def save_location_id(city_name: str, location_id: str):
         city_name: 城市名称
         location_id: LocationID
     """
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT OR REPLACE INTO location_cache (city_name, location_id)
-            VALUES (?, ?)
-        """,
-            (city_name, location_id),
-        )
-        conn.commit()
-        conn.close()
-    except sqlite3.Error:
-        pass  # 静默处理缓存写入失败
+    location_cache.save(city_name, location_id)
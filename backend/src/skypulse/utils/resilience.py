@@ -0,0 +1,338 @@
+"""上游调用保护
+
+上游（和风天气、ip-api、LLM）变慢或故障时，请求不应堆积在超时上拖垮整个服务。
+每个上游对应一个 Upstream 策略，组合以下机制：
+- TokenBucket: 令牌桶限速，对齐上游配额；等待时间超过 max_wait 时直接失败
+- 并发上限: 信号量限制同时进行的请求数
+- 重试: 只用于幂等请求，指数退避 + 全抖动（full jitter）
+- 对冲请求: 幂等请求超过 hedge_delay 仍未返回时再发一个，取先成功的结果
+- CircuitBreaker: 连续失败达到阈值后熔断，recovery_time 内直接失败（调用方可以改用过期缓存），
+  之后放行一个探测请求，成功则恢复
+- 截止时间: 请求设置了截止时间（见 deadline）时，每次尝试、退避和令牌等待都不超过剩余时间
+
+使用方式:
+    response = await upstream.call(lambda: client.get(url), idempotent=True)
+
+    async with upstream.guard():   # 流式调用：只做熔断、限速和并发控制
+        async for chunk in stream():
+            ...
+"""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+from skypulse.core.metrics import counter, gauge
+from skypulse.utils import deadline
+
+T = TypeVar("T")
+
+UPSTREAM_CALLS = counter(
+    "skypulse_upstream_calls_total",
+    "上游调用结果（ok / error / rejected: 熔断或限速直接失败 / cancelled: 客户端断开或超过截止时间"
+    " / retry / hedge）",
+    ["upstream", "result"],
+)
+CIRCUIT_STATE = gauge(
+    "skypulse_circuit_state", "熔断器状态（0: closed, 1: half_open, 2: open）", ["upstream"]
+)
+
+
+class UpstreamUnavailable(Exception):
+    """上游暂时不可用（熔断或限速），调用没有发出"""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float = 0.0):
+        super().__init__(f"{upstream} 暂时不可用: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class UpstreamStatusError(Exception):
+    """上游返回了表示自身故障的 HTTP 状态码（429 或 5xx）"""
+
+    def __init__(self, upstream: str, status_code: int):
+        super().__init__(f"{upstream} 返回 HTTP {status_code}")
+        self.status_code = status_code
+
+
+def check_status(upstream: str, response: httpx.Response) -> httpx.Response:
+    """429 / 5xx 视为上游故障（参与重试和熔断），其余状态码原样返回"""
+    if response.status_code == 429 or response.status_code >= 500:
+        raise UpstreamStatusError(upstream, response.status_code)
+    return response
+
+
+# 视为上游故障的异常：网络错误、超时和故障状态码
+RETRYABLE_ERRORS = (httpx.TransportError, UpstreamStatusError, asyncio.TimeoutError)
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        参数:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发请求数）
+            clock: 时钟函数
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """有足够令牌时立即取走并返回 True，否则返回 False"""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def reserve(self, tokens: float = 1) -> float:
+        """预留令牌（余额可以为负），返回需要等待的秒数"""
+        self._refill()
+        self._tokens -= tokens
+        return max(0.0, -self._tokens / self.rate)
+
+    def cancel(self, tokens: float = 1):
+        """退还 reserve 预留的令牌"""
+        self._tokens += tokens
+
+
+class CircuitBreaker:
+    """熔断器：closed → (连续失败) → open → (recovery_time 后) → half_open → closed / open"""
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        参数:
+            name: 上游名称（用于指标和错误信息）
+            failure_threshold: 连续失败多少次后熔断
+            recovery_time: 熔断持续时间（秒），之后放行一个探测请求
+            clock: 时钟函数
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        CIRCUIT_STATE.inc(0, upstream=name)
+
+    def _set_state(self, state: str):
+        delta = self._STATE_VALUES[state] - self._STATE_VALUES[self.state]
+        self.state = state
+        CIRCUIT_STATE.inc(delta, upstream=self.name)
+
+    def retry_after(self) -> float:
+        """熔断状态下距离放行探测请求的秒数"""
+        return max(0.0, self._opened_at + self.recovery_time - self.clock())
+
+    def before_call(self):
+        """调用前检查，熔断中抛出 UpstreamUnavailable"""
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                raise UpstreamUnavailable(self.name, "circuit open", self.retry_after())
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                raise UpstreamUnavailable(self.name, "circuit half-open", self.recovery_time)
+            self._probing = True
+
+    def record_success(self):
+        self._probing = False
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = self.clock()
+            if self.state != self.OPEN:
+                self._set_state(self.OPEN)
+
+    def release(self):
+        """调用被取消等既不算成功也不算失败的情况，释放探测名额"""
+        self._probing = False
+
+
+class Upstream:
+    """单个上游的调用策略（限速 + 并发上限 + 重试 + 对冲 + 熔断）"""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 0.0,
+        burst: Optional[float] = None,
+        max_wait: float = 1.0,
+        max_concurrency: int = 0,
+        retries: int = 0,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        hedge_delay: float = 0.0,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0,
+        failure_errors: tuple[type[BaseException], ...] = RETRYABLE_ERRORS,
+    ):
+        """
+        参数:
+            name: 上游名称
+            rate: 每秒请求数上限，0 表示不限速
+            burst: 令牌桶容量，默认等于 rate（至少为 1）
+            max_wait: 等待令牌的最长时间（秒），超过则直接失败
+            max_concurrency: 同时进行的请求数上限，0 表示不限
+            retries: 幂等请求失败后的重试次数
+            backoff_base: 退避基数（秒），第 n 次重试前等待 [0, base * 2^n] 的随机时间
+            backoff_max: 单次退避上限（秒）
+            hedge_delay: 幂等请求超过该时间未返回时发出对冲请求，0 表示不对冲
+            failure_threshold: 熔断阈值（连续失败次数），0 表示不熔断
+            recovery_time: 熔断持续时间（秒）
+            failure_errors: 视为上游故障（计入熔断、可以重试）的异常类型
+        """
+        self.name = name
+        self.failure_errors = failure_errors
+        self.bucket = TokenBucket(rate, burst or max(rate, 1.0)) if rate > 0 else None
+        self.max_wait = max_wait
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_delay = hedge_delay
+        self.breaker = None
+        if failure_threshold > 0:
+            self.breaker = CircuitBreaker(name, failure_threshold, recovery_time)
+
+    async def _acquire_token(self):
+        if self.bucket is None:
+            return
+        wait = self.bucket.reserve()
+        left = deadline.remaining()
+        if wait > self.max_wait or (left is not None and wait >= left):
+            self.bucket.cancel()
+            UPSTREAM_CALLS.inc(upstream=self.name, result="rejected")
+            raise UpstreamUnavailable(self.name, "rate limited", wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def guard(self):
+        """熔断检查 + 限速 + 并发上限，并根据代码块是否抛出上游故障记录结果"""
+        if self.breaker is not None:
+            try:
+                self.breaker.before_call()
+            except UpstreamUnavailable:
+                UPSTREAM_CALLS.inc(upstream=self.name, result="rejected")
+                raise
+        try:
+            await self._acquire_token()
+            if self.semaphore is not None:
+                await self.semaphore.acquire()
+        except BaseException:
+            if self.breaker is not None:
+                self.breaker.release()
+            raise
+
+        try:
+            yield
+        except self.failure_errors:
+            UPSTREAM_CALLS.inc(upstream=self.name, result="error")
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        except BaseException as e:
+            # 业务错误或取消：不代表上游不健康
+            if isinstance(e, asyncio.CancelledError):
+                UPSTREAM_CALLS.inc(upstream=self.name, result="cancelled")
+            if self.breaker is not None:
+                self.breaker.release()
+            raise
+        else:
+            UPSTREAM_CALLS.inc(upstream=self.name, result="ok")
+            if self.breaker is not None:
+                self.breaker.record_success()
+        finally:
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """先发一个请求，hedge_delay 后仍未完成且有令牌时再发一个，返回先成功的结果"""
+        tasks = [asyncio.ensure_future(fn())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done and (self.bucket is None or self.bucket.try_acquire()):
+                UPSTREAM_CALLS.inc(upstream=self.name, result="hedge")
+                tasks.append(asyncio.ensure_future(fn()))
+
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[T]], idempotent: bool = True) -> T:
+        """按策略调用上游
+
+        参数:
+            fn: 无参协程函数，每次调用发起一次请求
+            idempotent: 是否幂等；只有幂等请求会重试和对冲
+
+        异常:
+            UpstreamUnavailable: 熔断或限速，请求没有发出
+            DeadlineExceeded: 超过请求的截止时间，进行中的请求已取消
+            其他异常: 最后一次尝试的异常
+        """
+        retries = self.retries if idempotent else 0
+        attempt = 0
+        while True:
+            try:
+                async with deadline.enforce(self.name), self.guard():
+                    if idempotent and self.hedge_delay > 0:
+                        return await self._hedged(fn)
+                    return await fn()
+            except self.failure_errors:
+                if attempt >= retries:
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+                left = deadline.remaining()
+                # 退避结束时已超过截止时间：不再重试，直接返回本次的错误
+                if left is not None and delay >= left:
+                    raise
+            UPSTREAM_CALLS.inc(upstream=self.name, result="retry")
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,116 @@
+"""Server-Sent Events 输出工具
+
+把 (事件类型, 数据) 流转换为 SSE 帧：
+- 默认 "message" 事件的小片段先攒在缓冲区，按 flush_interval 或 max_chars 合并成一帧发送，
+  第一个片段立即发送，保证首字延迟不受合并影响
+- 其他事件（如 "status"）先冲刷缓冲区再立即发送
+- 长时间没有输出（例如工具调用期间）时发送注释行心跳，防止代理缓冲或断开连接
+"""
+
+import asyncio
+from typing import AsyncIterator, Callable, Optional
+
+HEARTBEAT = ": ping\n\n"
+
+_DONE = object()
+
+
+def sse_frame(data: str, event: Optional[str] = None) -> str:
+    """格式化一个 SSE 帧（多行数据拆成多个 data: 行）"""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_stream(
+    events: AsyncIterator[tuple[str, str]],
+    flush_interval: float = 0.05,
+    heartbeat_interval: float = 10.0,
+    max_chars: int = 512,
+    on_first_message: Optional[Callable[[], None]] = None,
+) -> AsyncIterator[str]:
+    """把事件流转换为合并后的 SSE 帧
+
+    参数:
+        events: 异步迭代器，产出 (事件类型, 数据)，"message" 为普通文本片段
+        flush_interval: 文本片段最长缓冲时间（秒）
+        heartbeat_interval: 无输出时发送心跳的间隔（秒）
+        max_chars: 缓冲区达到该长度时立即发送
+        on_first_message: 第一个文本片段发送时的回调（用于统计首字延迟）
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for item in events:
+                await queue.put(item)
+            await queue.put(_DONE)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+
+    buffer: list[str] = []
+    buffered_chars = 0
+    buffer_started = 0.0
+    last_sent = loop.time()
+    first_sent = False
+
+    def flush() -> str:
+        nonlocal buffered_chars, last_sent
+        frame = sse_frame("".join(buffer))
+        buffer.clear()
+        buffered_chars = 0
+        last_sent = loop.time()
+        return frame
+
+    try:
+        while True:
+            if buffer:
+                timeout = buffer_started + flush_interval - loop.time()
+            else:
+                timeout = last_sent + heartbeat_interval - loop.time()
+
+            try:
+                item = await asyncio.wait_for(queue.get(), max(timeout, 0))
+            except TimeoutError:
+                if buffer:
+                    yield flush()
+                else:
+                    last_sent = loop.time()
+                    yield HEARTBEAT
+                continue
+
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            event, data = item
+            if event != "message":
+                if buffer:
+                    yield flush()
+                last_sent = loop.time()
+                yield sse_frame(data, event)
+                continue
+
+            if not data:
+                continue
+            if not buffer:
+                buffer_started = loop.time()
+            buffer.append(data)
+            buffered_chars += len(data)
+
+            if not first_sent:
+                first_sent = True
+                if on_first_message:
+                    on_first_message()
+                yield flush()
+            elif buffered_chars >= max_chars:
+                yield flush()
+
+        if buffer:
+            yield flush()
+    finally:
+        producer.cancel()
@@ -0,0 +1,322 @@
+"""带 TTL 的进程内 LRU 缓存
+
+- 每个条目有独立的过期时间
+- 条目数和估算内存占用都有上限，超出时淘汰最久未使用的条目
+- get_or_load 对同一个 key 的并发未命中做合并（single-flight），只发起一次加载
+- 设置 stale_ttl 后，过期条目再保留 stale_ttl 秒，在此期间：
+  - stale-if-error: 加载失败（上游故障或熔断）时返回过期值
+  - stale-while-revalidate: 过期不超过 swr 秒的条目立即返回，同时在后台发起一次刷新
+- 等待加载结果的调用方全部被取消（客户端断开、超过截止时间）时取消加载本身，不再占用上游；
+  没有调用方等待的后台刷新不受影响
+- 时钟可以注入（clock 参数），便于用假时钟验证过期行为
+- 传入 shared（见 cache_backend）后作为二级缓存：加载前先查共享后端，加载成功后写回，
+  多个 worker 共享同一份数据
+"""
+
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from skypulse.utils.cache_backend import SharedCache
+
+
+def estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数（按 JSON 序列化长度计算）"""
+    try:
+        return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class TTLCache:
+    """带 TTL、LRU 淘汰和请求合并的异步缓存"""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+        stale_ttl: float = 0.0,
+        shared: Optional[SharedCache] = None,
+    ):
+        """
+        参数:
+            max_entries: 最大条目数
+            max_bytes: 估算内存占用上限（字节）
+            clock: 时钟函数，返回单调递增的秒数
+            stale_ttl: 过期后仍可在加载失败时返回的时长（秒），0 表示不返回过期值
+            shared: 跨 worker 共享的二级缓存，为空或未配置后端时只使用进程内缓存
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stale_ttl = stale_ttl
+        self.shared = shared
+
+        # key -> (过期时间, 值, 估算大小, 写入时间)
+        self._data: OrderedDict[Hashable, tuple[float, Any, int, float]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        # 加载任务 -> 正在等待它的调用方数
+        self._waiters: dict[asyncio.Task, int] = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.stale_served = 0
+        self.revalidations = 0
+        self.shared_hits = 0
+        self.abandoned = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取未过期的缓存值，未命中返回 None"""
+        value = self._lookup(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def _lookup(self, key: Hashable) -> Optional[Any]:
+        """读取未过期的缓存值（不计入统计）"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value, _, _ = entry
+        now = self.clock()
+        if expires_at <= now:
+            # 过期但仍在 stale 窗口内的条目保留下来，供加载失败时使用
+            if expires_at + self.stale_ttl <= now:
+                self._remove(key)
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """写入缓存
+
+        参数:
+            key: 缓存键
+            value: 缓存值（调用方不应再修改）
+            ttl: 存活时间（秒）
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._data:
+            self._remove(key)
+
+        now = self.clock()
+        self._data[key] = (now + ttl, value, size, now)
+        self._bytes += size
+
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def get_stale(self, key: Hashable, max_stale: Optional[float] = None) -> Optional[Any]:
+        """读取值，过期但仍在 stale 窗口内的也返回（不计入统计）
+
+        参数:
+            key: 缓存键
+            max_stale: 最多接受过期多久的值（秒），不能超过 stale_ttl，默认为 stale_ttl
+        """
+        window = self.stale_ttl if max_stale is None else min(max_stale, self.stale_ttl)
+        entry = self._data.get(key)
+        if entry is None or entry[0] + window <= self.clock():
+            return None
+        return entry[1]
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """返回条目写入后经过的秒数（含 stale 窗口内的过期条目），不存在时返回 None"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        return self.clock() - entry[3]
+
+    def remaining_ttl(self, key: Hashable) -> Optional[float]:
+        """返回条目剩余的存活秒数，不存在或已过期时返回 None（不计入统计，不影响 LRU 顺序）"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        remaining = entry[0] - self.clock()
+        return remaining if remaining > 0 else None
+
+    def items(self) -> list[tuple[Hashable, Any, float]]:
+        """返回未过期的条目 (key, 值, 剩余存活秒数)，按最近使用时间从旧到新排列"""
+        now = self.clock()
+        return [
+            (key, value, expires_at - now)
+            for key, (expires_at, value, _, _) in self._data.items()
+            if expires_at > now
+        ]
+
+    def delete(self, key: Hashable):
+        """删除缓存条目"""
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self):
+        """清空缓存（不重置计数器）"""
+        self._data.clear()
+        self._bytes = 0
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        should_cache: Callable[[Any], bool] = lambda value: True,
+        swr: float = 0.0,
+        stale_if_error: Optional[float] = None,
+    ) -> Any:
+        """读取缓存，未命中时调用 loader 加载并写入
+
+        同一个 key 同时只会有一个 loader 在执行，其余并发请求等待同一个结果，
+        这些请求计入 coalesced 而不是 misses。
+
+        参数:
+            key: 缓存键
+            loader: 无参协程函数，返回要缓存的值
+            ttl: 存活时间（秒）
+            should_cache: 判断加载结果是否可以缓存（例如只缓存成功响应）
+            swr: 过期不超过该时长（秒）的值立即返回，并在后台刷新（stale-while-revalidate）
+            stale_if_error: 加载失败时最多接受过期多久的值（秒），默认为 stale_ttl
+        """
+        value = self._lookup(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if swr > 0:
+            stale = self.get_stale(key, swr)
+            if stale is not None:
+                self.stale_served += 1
+                if key not in self._inflight:
+                    self.revalidations += 1
+                    self._start_load(key, loader, ttl, should_cache, stale_if_error)
+                return stale
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._start_load(key, loader, ttl, should_cache, stale_if_error)
+
+        return await self._wait(key, task)
+
+    async def refresh(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        should_cache: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """无论缓存是否命中都重新加载并写入（用于后台预热，不计入统计）
+
+        如果该 key 正在加载，直接等待正在进行的加载。共享后端中的条目剩余存活时间超过 ttl 的一半时
+        （其他 worker 刚刷新过）直接采用，不请求上游。
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start_load(key, loader, ttl, should_cache, min_shared_ttl=ttl / 2)
+        return await self._wait(key, task)
+
+    async def _wait(self, key: Hashable, task: asyncio.Task) -> Any:
+        """等待加载结果，最后一个等待的调用方被取消时取消加载
+
+        取消前先把加载任务从 _inflight 中移除：被取消的任务要到下一轮事件循环才真正结束，
+        在此之前到达的请求不能再合并到它上面，否则会收到 CancelledError。
+        """
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # shield: 单个调用方被取消时不影响其他等待同一结果的请求
+            return await asyncio.shield(task)
+        finally:
+            waiters = self._waiters.pop(task) - 1
+            if waiters > 0:
+                self._waiters[task] = waiters
+            elif not task.done():
+                self.abandoned += 1
+                self._forget(key, task)
+                task.cancel()
+
+    def _start_load(
+        self, key, loader, ttl, should_cache, stale_if_error=None, min_shared_ttl=0.0
+    ) -> asyncio.Task:
+        task = asyncio.ensure_future(
+            self._load(key, loader, ttl, should_cache, stale_if_error, min_shared_ttl)
+        )
+        # 后台刷新可能没有调用方等待结果，取走异常避免 "exception was never retrieved"
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task
+
+    async def _load_shared(self, key: Hashable, min_ttl: float) -> Optional[Any]:
+        found = await self.shared.get(key)
+        if found is None or found[1] <= min_ttl:
+            return None
+        value, remaining = found
+        self.shared_hits += 1
+        self.set(key, value, remaining)
+        return value
+
+    async def _load(self, key, loader, ttl, should_cache, stale_if_error=None, min_shared_ttl=0.0):
+        try:
+            if self.shared:
+                value = await self._load_shared(key, min_shared_ttl)
+                if value is not None:
+                    return value
+            value = await loader()
+        except Exception:
+            stale = self.get_stale(key, stale_if_error) if self.stale_ttl > 0 else None
+            if stale is None:
+                raise
+            self.stale_served += 1
+            return stale
+        else:
+            if should_cache(value):
+                self.set(key, value, ttl)
+                if self.shared:
+                    await self.shared.set(key, value, ttl)
+            return value
+        finally:
+            self._forget(key, asyncio.current_task())
+
+    def _forget(self, key: Hashable, task: Optional[asyncio.Task]):
+        """key 仍指向该加载任务时从 _inflight 中移除（之后可能已经有新的加载任务）"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "stale": self.stale_served,
+            "revalidations": self.revalidations,
+            "shared_hits": self.shared_hits,
+            "abandoned": self.abandoned,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _remove(self, key: Hashable):
+        _, _, size, _ = self._data.pop(key)
+        self._bytes -= size
@@ -0,0 +1,192 @@
+"""聊天请求准入控制测试（AdmissionController 和 /chat/stream 的名额释放）"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from skypulse.api.routes import agent as agent_routes
+from skypulse.main import app
+from skypulse.utils.admission import AdmissionController, AdmissionRejected
+
+
+async def _queued(controller: AdmissionController, client: str) -> asyncio.Task:
+    """启动一个排队的 acquire，返回其任务（已进入队列）"""
+    task = asyncio.create_task(controller.acquire(client))
+    await asyncio.sleep(0)
+    return task
+
+
+async def test_per_client_limit_returns_429():
+    controller = AdmissionController(max_concurrency=10, max_queue=10, per_client=2)
+    await controller.acquire("a")
+    await controller.acquire("a")
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire("a")
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.reason == "client"
+    # 其他客户端不受影响
+    await controller.acquire("b")
+
+
+async def test_per_client_limit_counts_queued_requests():
+    controller = AdmissionController(max_concurrency=1, max_queue=10, per_client=2)
+    release = await controller.acquire("a")
+    waiting = await _queued(controller, "a")
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire("a")
+    assert exc_info.value.status_code == 429
+
+    release()
+    (await waiting)()
+    assert controller.stats()["clients"] == 0
+
+
+async def test_full_queue_returns_503():
+    controller = AdmissionController(max_concurrency=1, max_queue=1)
+    await controller.acquire("a")
+    waiting = await _queued(controller, "b")
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire("c")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.reason == "queue_full"
+    waiting.cancel()
+
+
+async def test_queue_timeout_returns_503_and_leaves_queue():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.01)
+    await controller.acquire("a")
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire("b")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.reason == "timeout"
+    assert controller.queued == 0
+    assert controller.stats()["clients"] == 1
+
+
+async def test_freed_slot_goes_to_client_with_fewest_active_requests():
+    controller = AdmissionController(max_concurrency=2, max_queue=10)
+    release_a1 = await controller.acquire("a")
+    release_a2 = await controller.acquire("a")
+    a3 = await _queued(controller, "a")
+    b1 = await _queued(controller, "b")
+
+    # a 还有一个请求在执行，b 没有：后到的 b1 先获得名额
+    release_a1()
+    done, _ = await asyncio.wait((a3, b1), timeout=0.05)
+    assert done == {b1}
+
+    release_a2()
+    done, _ = await asyncio.wait((a3,), timeout=0.05)
+    assert done == {a3}
+
+
+async def test_equal_clients_are_woken_in_arrival_order():
+    controller = AdmissionController(max_concurrency=1, max_queue=10)
+    release = await controller.acquire("x")
+    first = await _queued(controller, "a")
+    second = await _queued(controller, "b")
+
+    release()
+    done, _ = await asyncio.wait((first, second), timeout=0.05)
+    assert done == {first}
+
+    first.result()()
+    done, _ = await asyncio.wait((second,), timeout=0.05)
+    assert done == {second}
+
+
+async def test_retry_after_scales_with_queue_and_hold_time():
+    controller = AdmissionController(max_concurrency=2, max_queue=2)
+    assert controller.retry_after() == pytest.approx(1.0)
+
+    await controller.acquire("a")
+    await controller.acquire("b")
+    waiting = [await _queued(controller, client) for client in "cd"]
+    controller._hold_time = 3.0
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire("e")
+    # 平均执行时间 × (排队数 / 并发上限 + 1)
+    assert exc_info.value.retry_after == pytest.approx(6.0)
+    for task in waiting:
+        task.cancel()
+
+
+async def test_cancelled_waiter_leaves_queue():
+    controller = AdmissionController(max_concurrency=1, max_queue=10)
+    release = await controller.acquire("a")
+    waiting = await _queued(controller, "b")
+
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert controller.queued == 0
+    assert controller.stats()["clients"] == 1
+
+    release()
+    assert controller.active == 0
+
+
+async def test_waiter_cancelled_after_grant_returns_slot():
+    controller = AdmissionController(max_concurrency=1, max_queue=10)
+    release = await controller.acquire("a")
+    waiting = await _queued(controller, "b")
+
+    # 名额已经分给 b，但 b 还没有恢复执行时被取消
+    release()
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert controller.active == 0
+    assert controller.stats()["clients"] == 0
+
+
+async def test_admit_releases_on_error():
+    controller = AdmissionController(max_concurrency=1)
+
+    with pytest.raises(RuntimeError):
+        async with controller.admit("a"):
+            assert controller.active == 1
+            raise RuntimeError("boom")
+    assert controller.active == 0
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    """/chat 和 /chat/stream 使用的准入控制替换为单名额、不排队的控制器"""
+    controller = AdmissionController(max_concurrency=1, max_queue=0)
+    monkeypatch.setattr(agent_routes, "chat_admission", controller)
+    monkeypatch.setattr(agent_routes, "get_agent", lambda: None)
+    return controller
+
+
+async def test_rejection_sets_retry_after_header(admission):
+    await admission.acquire("other")
+    admission._hold_time = 2.4
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/v1/chat/stream", json={"message": "北京天气"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert response.json()["reason"] == "queue_full"
+
+
+async def test_stream_releases_slot_when_setup_fails(admission, monkeypatch):
+    def fail(request, http_request):
+        raise RuntimeError("city resolution failed to start")
+
+    monkeypatch.setattr(agent_routes, "_start_city_resolution", fail)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/v1/chat/stream", json={"message": "北京天气"})
+
+    assert response.status_code == 500
+    assert admission.active == 0
+    assert admission.stats()["clients"] == 0
@@ -0,0 +1,18 @@
+"""agent.agent 辅助函数测试"""
+
+import pytest
+
+from skypulse.agent.agent import _is_json_like
+
+
+@pytest.mark.parametrize(
+    "content",
+    ['{"code": "200"}', '\n{"code": "200"}\n', '\t[{"fxDate": "2024-05-01"}]', ' {"a": 1} '],
+)
+def test_tool_result_chunks_are_filtered(content):
+    assert _is_json_like(content)
+
+
+@pytest.mark.parametrize("content", ["北京今天晴", "\n", "{", "气温 [14~25°C]", "[1] 晴 {"])
+def test_text_chunks_are_kept(content):
+    assert not _is_json_like(content)
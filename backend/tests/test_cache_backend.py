@@ -0,0 +1,70 @@
+"""共享缓存后端测试（SQLite）"""
+
+import asyncio
+
+import pytest
+
+from skypulse.services.prewarmer import WeatherPrewarmer
+from skypulse.utils.cache_backend import CacheBackend, SharedCache, SQLiteBackend
+
+
+async def test_sqlite_get_set(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"))
+    cache = SharedCache(backend, "weather")
+
+    await cache.set(("now", "101010100", None), {"code": "200"}, ttl=60)
+    value, remaining = await cache.get(("now", "101010100", None))
+
+    assert value == {"code": "200"}
+    assert 59 < remaining <= 60
+    assert await cache.get(("now", "101020100", None)) is None
+    await backend.close()
+
+
+async def test_sqlite_claim_is_exclusive_until_expiry(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = SQLiteBackend(path), SQLiteBackend(path)
+    lease_a, lease_b = SharedCache(first, "prewarm"), SharedCache(second, "prewarm")
+
+    assert await lease_a.claim("leader", "a", ttl=0.2)
+    assert not await lease_b.claim("leader", "b", ttl=0.2)
+    # 持有者可以续期
+    assert await lease_a.claim("leader", "a", ttl=0.2)
+
+    await asyncio.sleep(0.3)
+    assert await lease_b.claim("leader", "b", ttl=0.2)
+    assert not await lease_a.claim("leader", "a", ttl=0.2)
+    await first.close()
+    await second.close()
+
+
+def test_backend_without_claim_fails_on_construction():
+    class NoClaimBackend(CacheBackend):
+        async def get(self, key):
+            return None
+
+        async def set(self, key, value, ttl):
+            pass
+
+    with pytest.raises(TypeError, match="claim"):
+        NoClaimBackend()
+
+
+async def test_claim_without_backend_always_succeeds():
+    assert await SharedCache(None, "prewarm").claim("leader", "a", ttl=1)
+
+
+async def test_only_one_prewarmer_runs(tmp_path):
+    path = str(tmp_path / "cache.db")
+    backends = [SQLiteBackend(path), SQLiteBackend(path)]
+    prewarmers = [
+        WeatherPrewarmer(seeds=[], lease=SharedCache(backend, "prewarm")) for backend in backends
+    ]
+    for index, prewarmer in enumerate(prewarmers):
+        prewarmer.owner = f"worker-{index}"
+
+    leaders = [await prewarmer._claim_leader() for prewarmer in prewarmers]
+
+    assert leaders == [True, False]
+    for backend in backends:
+        await backend.close()
@@ -0,0 +1,145 @@
+"""聊天接口的截止时间和客户端断开测试
+
+使用 benchmarks/ 中的模拟 LLM 和模拟和风天气服务（后台线程中的 uvicorn），和风天气接口的延迟
+远大于截止时间，请求总是在工具调用进行中超时或断开。
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import mock_llm
+import mock_qweather
+import pytest
+import pytest_asyncio
+from mock_qweather import MockServer
+
+from skypulse.api.routes import agent as agent_routes
+from skypulse.core.config import settings
+from skypulse.main import app
+from skypulse.services.qweather_service import qweather_service
+
+# ChatOpenAI 缓存了默认的 HTTP 客户端（绑定在创建它的事件循环上），本模块的测试共用一个事件循环
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+QWEATHER_LATENCY = 3.0
+DEADLINE = 0.5
+
+
+@pytest.fixture(scope="module")
+def qweather_server():
+    server = MockServer(mock_qweather.create_app(latency=QWEATHER_LATENCY))
+    with server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def llm_server():
+    server = MockServer(mock_llm.create_app(latency=0.05, token_delay=0.0))
+    with server:
+        yield server
+
+
+@pytest_asyncio.fixture(loop_scope="module")
+async def agent(monkeypatch, qweather_server, llm_server):
+    """指向模拟服务的 WeatherAgent，关闭快速路径、回答缓存和预取，让每个请求都走工具调用"""
+    from skypulse.agent.agent import WeatherAgent
+
+    monkeypatch.setattr(settings, "fast_path_enabled", False)
+    monkeypatch.setattr(settings, "response_cache_enabled", False)
+    monkeypatch.setattr(settings, "prefetch_enabled", False)
+    monkeypatch.setattr(settings, "chat_deadline", DEADLINE)
+    monkeypatch.setattr(settings, "chat_stream_deadline", DEADLINE)
+    monkeypatch.setattr(qweather_service, "base_url", qweather_server.base_url)
+    qweather_service.cache.clear()
+
+    weather_agent = WeatherAgent(api_key="test", base_url=llm_server.base_url, model="mock")
+    monkeypatch.setattr(agent_routes.get_agent, "_instance", weather_agent, raising=False)
+    yield weather_agent
+    # 共享的 HTTP 客户端绑定在当前事件循环上，每个测试结束后关闭
+    await qweather_service.aclose()
+
+
+async def _wait_for_weather_request(server: MockServer):
+    """等待模拟和风天气服务收到实时天气请求（工具调用已经开始）"""
+    while server.app.state.calls["now"] == 0:
+        await asyncio.sleep(0.01)
+
+
+async def test_deadline_during_tool_call_returns_504(agent, qweather_server):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        response = await client.post("/api/v1/chat", json={"message": "北京天气怎么样"})
+        elapsed = time.perf_counter() - start
+
+    assert response.status_code == 504
+    assert response.json()["detail"] == "请求超时，请稍后再试"
+    assert qweather_service.cache._inflight == {}
+    assert elapsed < QWEATHER_LATENCY
+
+
+async def test_client_disconnect_cancels_agent_and_upstream_load(
+    agent, qweather_server, monkeypatch
+):
+    cancelled = agent_routes.CHAT_CANCELLED.value(endpoint="chat", reason="disconnect")
+    abandoned = qweather_service.cache.abandoned
+    qweather_server.app.state.calls["now"] = 0
+    disconnected = asyncio.Event()
+    sent = []
+
+    body = json.dumps({"message": "上海天气怎么样"}).encode()
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/v1/chat",
+        "raw_path": b"/api/v1/chat",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"test")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+
+    monkeypatch.setattr(settings, "chat_deadline", 0)  # 不限时，只测试断开
+    request = asyncio.create_task(app(scope, receive, send))
+    await asyncio.wait_for(_wait_for_weather_request(qweather_server), 5)
+    start = time.perf_counter()
+    disconnected.set()
+    await asyncio.wait_for(request, 2)
+
+    assert time.perf_counter() - start < 1.0
+    assert sent[0]["status"] == agent_routes.STATUS_CLIENT_CLOSED
+    assert agent_routes.CHAT_CANCELLED.value(endpoint="chat", reason="disconnect") == cancelled + 1
+    # 没有其他调用方等待，和风天气的加载被取消
+    assert qweather_service.cache.abandoned > abandoned
+    assert qweather_service.cache._inflight == {}
+
+
+async def test_stream_past_deadline_sends_timeout_and_closes(agent):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        response = await client.post("/api/v1/chat/stream", json={"message": "广州天气怎么样"})
+        elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    frames = [frame for frame in response.text.split("\n\n") if frame]
+    assert frames[0] == "event: status\ndata: 正在查询广州的天气…"
+    assert frames[-2:] == ["data: ⚠️ 查询超时，请稍后再试。", "data: [DONE]"]
+    assert elapsed < QWEATHER_LATENCY
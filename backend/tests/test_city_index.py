@@ -0,0 +1,24 @@
+"""utils.city_index 测试"""
+
+from skypulse.utils.city_index import CityIndex, candidate_keys, write_index
+
+
+def test_candidate_keys_strip_trailing_suffixes_only():
+    assert candidate_keys("北京市") == ["北京市", "北京"]
+    assert candidate_keys("杭州市区") == ["杭州市区", "杭州市", "杭州"]
+    # 名称中间的 市/区/县 保留
+    assert candidate_keys("市北区") == ["市北区", "市北"]
+    assert candidate_keys("县前区") == ["县前区", "县前"]
+    # 两个字的名称不再去后缀
+    assert candidate_keys("沙市") == ["沙市"]
+    assert candidate_keys(" ") == []
+
+
+def test_lookup_does_not_match_mangled_name(tmp_path):
+    path = tmp_path / "index.tsv.gz"
+    write_index({"市北": "101120203", "北": "999", "中": "998", "杭州": "101210101"}, path)
+    index = CityIndex(path)
+
+    assert index.lookup("市北区") == "101120203"
+    assert index.lookup("市中区") is None
+    assert index.lookup("杭州市区") == "101210101"
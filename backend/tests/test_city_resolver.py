@@ -0,0 +1,72 @@
+"""city_resolver.resolve_city 测试"""
+
+import pytest
+
+from skypulse.services import city_resolver
+from skypulse.services.city_resolver import NO_CITY_HINT, resolve_city
+
+
+@pytest.fixture
+def ip_lookups(monkeypatch):
+    """替换 IP 定位，记录调用次数，总是返回杭州"""
+    calls = []
+
+    async def get_city_by_ip(client_ip, china_only=False):
+        calls.append(client_ip)
+        return "杭州", "success"
+
+    monkeypatch.setattr(city_resolver, "get_city_by_ip", get_city_by_ip)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "北京明天天气",
+        "厦门天气怎么样",
+        "鼓浪屿明天下雨吗",
+        "请问厦门市的气温",
+        "哪个城市最热",
+        "查一下厦门天气",
+        "帮我看看鼓浪屿明天下雨吗",
+    ],
+)
+async def test_question_with_place_skips_ip(ip_lookups, question):
+    resolution = await resolve_city(question, "8.8.8.8")
+
+    assert resolution.city is None
+    assert resolution.source == "question"
+    assert ip_lookups == []
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "明天天气",
+        "今天会下雨吗",
+        "我这边明天冷不冷",
+        "出门要带伞吗",
+        "帮我查一下天气",
+        "查查天气",
+        "看看明天天气",
+        "给我说说今天天气",
+        "查一下明天的天气",
+        "请帮我看看天气",
+    ],
+)
+async def test_question_without_place_uses_ip(ip_lookups, question):
+    resolution = await resolve_city(question, "8.8.8.8")
+
+    assert resolution.city == "杭州"
+    assert resolution.source == "ip"
+    assert ip_lookups == ["8.8.8.8"]
+
+
+async def test_ip_lookup_failure_returns_hint(monkeypatch):
+    async def get_city_by_ip(client_ip, china_only=False):
+        return None, "fail"
+
+    monkeypatch.setattr(city_resolver, "get_city_by_ip", get_city_by_ip)
+    resolution = await resolve_city("明天天气", "8.8.8.8")
+
+    assert resolution == city_resolver.CityResolution(city=None, source="none", hint=NO_CITY_HINT)
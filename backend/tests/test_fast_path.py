@@ -0,0 +1,84 @@
+"""agent.fast_path 测试（默认城市、异常处理）"""
+
+import pytest
+
+from skypulse.agent import fast_path
+from skypulse.utils.deadline import DeadlineExceeded
+from skypulse.utils.resilience import UpstreamUnavailable
+
+WEATHER = {
+    "current": {
+        "code": "200",
+        "now": {
+            "obsTime": "2024-05-01T10:00+08:00",
+            "temp": "22",
+            "feelsLike": "21",
+            "text": "晴",
+            "windDir": "东风",
+            "windScale": "2",
+            "humidity": "40",
+        },
+    },
+    "forecast": {
+        "code": "200",
+        "daily": [
+            {
+                "fxDate": "2024-05-01",
+                "textDay": "晴",
+                "tempMax": "25",
+                "tempMin": "14",
+                "windDirDay": "东风",
+                "windScaleDay": "1-3",
+            }
+        ],
+    },
+}
+
+
+class WeatherStub:
+    """替换 get_city_weather，记录查询的城市；设置 error 后抛出该异常"""
+
+    def __init__(self):
+        self.calls: list[str] = []
+        self.error: Exception | None = None
+
+    async def __call__(self, city: str, days: int = 3) -> dict:
+        self.calls.append(city)
+        if self.error is not None:
+            raise self.error
+        return {"city": city, "location_id": "101010100", **WEATHER}
+
+
+@pytest.fixture
+def weather(monkeypatch):
+    stub = WeatherStub()
+    monkeypatch.setattr(fast_path, "get_city_weather", stub)
+    return stub
+
+
+async def test_english_default_city_is_rendered_in_chinese(weather):
+    answer = await fast_path.answer("现在天气怎么样", default_city="Beijing")
+
+    assert answer.startswith("北京现在晴，气温 22°C")
+    assert weather.calls == ["北京"]
+
+
+async def test_unknown_english_default_city_falls_back_to_agent(weather):
+    assert await fast_path.answer("今天天气", default_city="Atlantis") is None
+    assert weather.calls == []
+
+
+@pytest.mark.parametrize(
+    "error", [DeadlineExceeded("qweather"), UpstreamUnavailable("qweather", "circuit open")]
+)
+async def test_deadline_and_unavailable_are_not_swallowed(weather, error):
+    weather.error = error
+
+    with pytest.raises(type(error)):
+        await fast_path.answer("北京今天天气")
+
+
+async def test_other_errors_fall_back_to_agent(weather):
+    weather.error = ValueError("城市不存在")
+
+    assert await fast_path.answer("北京今天天气") is None
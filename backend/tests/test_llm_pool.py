@@ -0,0 +1,93 @@
+"""LLMRoutingMiddleware 对冲测试"""
+
+import asyncio
+from dataclasses import dataclass, field, replace
+
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from skypulse.agent.llm_pool import (
+    HEDGE_MIN_SAMPLES,
+    AgentContext,
+    LLMEndpoint,
+    LLMPool,
+    LLMRoutingMiddleware,
+)
+
+
+@dataclass
+class FakeRuntime:
+    context: AgentContext = field(default_factory=AgentContext)
+
+
+@dataclass
+class FakeRequest:
+    """只包含中间件用到的字段的 ModelRequest"""
+
+    messages: list = field(default_factory=lambda: [HumanMessage(content="北京天气")])
+    runtime: FakeRuntime = field(default_factory=FakeRuntime)
+    model: ChatOpenAI | None = None
+
+    def override(self, **overrides) -> "FakeRequest":
+        return replace(self, **overrides)
+
+
+def _endpoint(name: str) -> LLMEndpoint:
+    model = ChatOpenAI(model=name, api_key="test", base_url=f"http://{name}.invalid/v1")
+    endpoint = LLMEndpoint(name, "fast", model)
+    # 历史耗时 10ms，对冲延迟取下限
+    for _ in range(HEDGE_MIN_SAMPLES):
+        endpoint.latency["tool"].observe(0.01)
+    return endpoint
+
+
+def _handler(latencies: dict[str, float], calls: list[str]):
+    async def handler(request: FakeRequest) -> str:
+        name = request.model.model_name
+        calls.append(name)
+        await asyncio.sleep(latencies[name])
+        return name
+
+    return handler
+
+
+def _middleware(*endpoints: LLMEndpoint) -> LLMRoutingMiddleware:
+    pool = LLMPool(list(endpoints), hedge_enabled=True, hedge_min_delay=0.05, explore_ratio=0)
+    return LLMRoutingMiddleware(pool)
+
+
+async def test_slow_primary_is_hedged_to_another_endpoint():
+    calls: list[str] = []
+    middleware = _middleware(_endpoint("a"), _endpoint("b"))
+
+    result = await middleware.awrap_model_call(
+        FakeRequest(), _handler({"a": 1.0, "b": 0.01}, calls)
+    )
+
+    assert result == "b"
+    assert calls == ["a", "b"]
+
+
+async def test_single_endpoint_is_not_hedged_to_itself():
+    calls: list[str] = []
+    middleware = _middleware(_endpoint("a"))
+
+    result = await middleware.awrap_model_call(FakeRequest(), _handler({"a": 0.2}, calls))
+
+    assert result == "a"
+    assert calls == ["a"]
+
+
+async def test_open_backup_circuit_skips_hedge():
+    calls: list[str] = []
+    primary, backup = _endpoint("a"), _endpoint("b")
+    for _ in range(backup.breaker.failure_threshold):
+        backup.breaker.record_failure()
+    middleware = _middleware(primary, backup)
+
+    result = await middleware.awrap_model_call(
+        FakeRequest(), _handler({"a": 0.2, "b": 0.01}, calls)
+    )
+
+    assert result == "a"
+    assert calls == ["a"]
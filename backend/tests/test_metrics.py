@@ -0,0 +1,206 @@
+"""core.metrics 输出格式测试"""
+
+import json
+import os
+import threading
+
+from skypulse.core.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    SnapshotWriter,
+    clear_snapshots,
+    read_snapshots,
+)
+
+
+def test_counter_collect():
+    metric = Counter("test_requests_total", "请求数", ["route", "status"])
+    metric.inc(route="/chat", status="200")
+    metric.inc(2, route="/chat", status="200")
+    metric.inc(route="/chat", status="500")
+
+    assert metric.collect() == [
+        "# HELP test_requests_total 请求数",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{route="/chat",status="200"} 3',
+        'test_requests_total{route="/chat",status="500"} 1',
+    ]
+    assert metric.value(route="/chat", status="200") == 3
+    assert metric.value(route="/weather", status="200") == 0
+
+
+def test_counter_without_labels_and_escaping():
+    plain = Counter("test_plain_total", "无标签")
+    plain.inc(0.5)
+    assert plain.collect()[-1] == "test_plain_total 0.5"
+
+    escaped = Counter("test_escaped_total", "转义", ["path"])
+    escaped.inc(path='a"b\\c\nd')
+    assert escaped.collect()[-1] == 'test_escaped_total{path="a\\"b\\\\c\\nd"} 1'
+
+
+def test_gauge_collect():
+    metric = Gauge("test_in_flight", "进行中", ["stage"])
+    metric.inc(stage="llm")
+    metric.inc(stage="llm")
+    metric.dec(stage="llm")
+
+    assert metric.collect() == [
+        "# HELP test_in_flight 进行中",
+        "# TYPE test_in_flight gauge",
+        'test_in_flight{stage="llm"} 1',
+    ]
+
+
+def test_histogram_collect():
+    metric = Histogram("test_duration_seconds", "耗时", ["stage"], buckets=(0.1, 1.0))
+    metric.observe(0.05, stage="geo")
+    metric.observe(0.1, stage="geo")
+    metric.observe(0.5, stage="geo")
+    metric.observe(3, stage="geo")
+
+    assert metric.collect() == [
+        "# HELP test_duration_seconds 耗时",
+        "# TYPE test_duration_seconds histogram",
+        'test_duration_seconds_bucket{stage="geo",le="0.1"} 2',
+        'test_duration_seconds_bucket{stage="geo",le="1"} 3',
+        'test_duration_seconds_bucket{stage="geo",le="+Inf"} 4',
+        'test_duration_seconds_sum{stage="geo"} 3.65',
+        'test_duration_seconds_count{stage="geo"} 4',
+    ]
+
+
+def test_concurrent_writes_from_threads():
+    counter = Counter("test_threads_total", "多线程写入")
+    histogram = Histogram("test_threads_seconds", "多线程写入", buckets=(1.0,))
+
+    def work():
+        for _ in range(10_000):
+            counter.inc()
+            histogram.observe(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value() == 40_000
+    assert histogram.collect()[-1] == "test_threads_seconds_count 40000"
+
+
+def test_registry_exposition():
+    registry = Registry()
+    registry.register(Counter("test_total", "计数")).inc()
+    registry.register_cache("geo", lambda: {"hits": 3, "entries": 2, "hit_ratio": 0.75})
+
+    assert registry.exposition() == (
+        "# HELP test_total 计数\n"
+        "# TYPE test_total counter\n"
+        "test_total 1\n"
+        "# TYPE skypulse_cache_hits_total counter\n"
+        'skypulse_cache_hits_total{cache="geo"} 3\n'
+        "# TYPE skypulse_cache_entries gauge\n"
+        'skypulse_cache_entries{cache="geo"} 2\n'
+        "# TYPE skypulse_cache_hit_ratio gauge\n"
+        'skypulse_cache_hit_ratio{cache="geo"} 0.75\n'
+    )
+
+
+def _worker_registry(requests: int, in_flight: int, durations: list[float], hits: int) -> Registry:
+    """模拟一个 worker 进程的注册表"""
+    registry = Registry()
+    registry.register(Counter("test_requests_total", "请求数", ["route"])).inc(
+        requests, route="/chat"
+    )
+    registry.register(Gauge("test_in_flight", "进行中")).inc(in_flight)
+    histogram = registry.register(Histogram("test_seconds", "耗时", buckets=(1.0,)))
+    for duration in durations:
+        histogram.observe(duration)
+    registry.register_cache(
+        "geo", lambda: {"hits": hits, "misses": 1, "entries": 2, "hit_ratio": hits / (hits + 1)}
+    )
+    return registry
+
+
+def test_exposition_merges_two_workers():
+    first = _worker_registry(3, 1, [0.5, 2.0], hits=3)
+    second = _worker_registry(4, 2, [0.5], hits=1)
+
+    assert first.exposition([second.snapshot()]) == (
+        "# HELP test_requests_total 请求数\n"
+        "# TYPE test_requests_total counter\n"
+        'test_requests_total{route="/chat"} 7\n'
+        "# HELP test_in_flight 进行中\n"
+        "# TYPE test_in_flight gauge\n"
+        "test_in_flight 3\n"
+        "# HELP test_seconds 耗时\n"
+        "# TYPE test_seconds histogram\n"
+        'test_seconds_bucket{le="1"} 2\n'
+        'test_seconds_bucket{le="+Inf"} 3\n'
+        "test_seconds_sum 3\n"
+        "test_seconds_count 3\n"
+        "# TYPE skypulse_cache_hits_total counter\n"
+        'skypulse_cache_hits_total{cache="geo"} 4\n'
+        "# TYPE skypulse_cache_misses_total counter\n"
+        'skypulse_cache_misses_total{cache="geo"} 2\n'
+        "# TYPE skypulse_cache_entries gauge\n"
+        'skypulse_cache_entries{cache="geo"} 4\n'
+        "# TYPE skypulse_cache_hit_ratio gauge\n"
+        'skypulse_cache_hit_ratio{cache="geo"} 0.6667\n'
+    )
+
+
+def test_exited_worker_keeps_counters_but_not_gauges():
+    first = _worker_registry(3, 1, [], hits=3)
+    exited = _worker_registry(4, 2, [], hits=1).snapshot()
+    exited["live"] = False
+
+    lines = first.exposition([exited]).splitlines()
+
+    assert 'test_requests_total{route="/chat"} 7' in lines
+    assert "test_in_flight 1" in lines
+    assert 'skypulse_cache_entries{cache="geo"} 2' in lines
+
+
+def test_snapshot_files_round_trip(tmp_path):
+    registry = _worker_registry(3, 1, [0.5], hits=3)
+    SnapshotWriter(registry, str(tmp_path)).write()
+    # 另一个 worker 的快照，进程已不存在（写入时仍在运行）
+    other = _worker_registry(4, 2, [0.5], hits=1).snapshot()
+    other["pid"] = 2**22 + 1
+    (tmp_path / f"{other['pid']}.json").write_text(json.dumps(other), encoding="utf-8")
+    (tmp_path / "broken.json").write_text("{", encoding="utf-8")
+
+    snapshots = read_snapshots(str(tmp_path), exclude_pid=os.getpid())
+
+    assert [(s["pid"], s["live"]) for s in snapshots] == [(other["pid"], False)]
+    assert read_snapshots(str(tmp_path))[0]["live"] is True
+    clear_snapshots(str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_metrics_route_merges_worker_snapshots(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from skypulse.api.routes import metrics as metrics_route
+
+    registry = Registry()
+    registry.register(Counter("test_route_total", "计数")).inc(2)
+    other = Registry()
+    other.register(Counter("test_route_total", "计数")).inc(5)
+    snapshot = other.snapshot()
+    snapshot["pid"] = 2**22 + 1
+    (tmp_path / "other.json").write_text(json.dumps(snapshot), encoding="utf-8")
+    monkeypatch.setattr(metrics_route, "registry", registry)
+    monkeypatch.setattr(metrics_route.settings, "metrics_dir", str(tmp_path))
+    app = FastAPI()
+    app.include_router(metrics_route.router)
+
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert "test_route_total 7" in response.text.splitlines()
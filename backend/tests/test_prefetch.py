@@ -0,0 +1,149 @@
+"""agent.prefetch.WeatherPrefetch 测试（启动、取消、结算）"""
+
+import asyncio
+
+import pytest
+
+from skypulse.agent import prefetch
+from skypulse.agent.prefetch import PREFETCH, WeatherPrefetch
+
+
+class QWeatherStub:
+    """替换 qweather_service 的查询方法；gate 未打开时请求一直挂起，记录被取消的请求"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.error: Exception | None = None
+        self.fetched: list[tuple[str, str, int | None]] = []
+        self.cancelled = 0
+
+    async def _wait(self):
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+
+    async def get_location_id(self, city: str) -> str:
+        return {"北京": "101010100", "杭州": "101210101"}[city]
+
+    async def get_current_weather(self, location_id: str) -> dict:
+        await self._wait()
+        self.fetched.append(("now", location_id, None))
+        return {"code": "200"}
+
+    async def get_forecast(self, location_id: str, days: int) -> dict:
+        await self._wait()
+        self.fetched.append(("forecast", location_id, days))
+        return {"code": "200"}
+
+
+@pytest.fixture
+def qweather(monkeypatch):
+    stub = QWeatherStub()
+    for name in ("get_location_id", "get_current_weather", "get_forecast"):
+        monkeypatch.setattr(prefetch.qweather_service, name, getattr(stub, name))
+    return stub
+
+
+def _counts() -> dict[str, float]:
+    return {result: PREFETCH.value(result=result) for result in ("used", "wasted", "error")}
+
+
+def _delta(before: dict[str, float]) -> dict[str, float]:
+    return {result: value - before[result] for result, value in _counts().items()}
+
+
+async def _started():
+    """让预取任务和其中的 gather 子任务开始执行（挂起在 gate 上）"""
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def _tool_call(city: str) -> dict:
+    return {"name": "qweather_tool", "args": {"city": city}, "id": "call-1"}
+
+
+async def test_prefetch_consumed_by_agent_counts_as_used(qweather):
+    before = _counts()
+    speculation = WeatherPrefetch.start("北京明天天气怎么样")
+    task = speculation.speculations[0].task
+
+    qweather.gate.set()
+    await task
+    speculation.finish([_tool_call("北京")])
+
+    assert _delta(before) == {"used": 1, "wasted": 0, "error": 0}
+    assert qweather.fetched == [("now", "101010100", None), ("forecast", "101010100", 3)]
+    assert speculation.speculations == []
+
+
+async def test_in_flight_prefetch_for_tool_alias_is_used_and_kept(qweather):
+    before = _counts()
+    speculation = WeatherPrefetch.start("北京这周天气")
+    task = speculation.speculations[0].task
+
+    # 工具用英文名查询同一个城市：按 LocationID 认定为同一个城市，进行中的预取不取消
+    speculation.finish([_tool_call("Beijing")])
+    qweather.gate.set()
+    await task
+
+    assert _delta(before) == {"used": 1, "wasted": 0, "error": 0}
+    assert ("forecast", "101010100", 7) in qweather.fetched
+
+
+async def test_unused_prefetch_is_wasted_and_cancelled(qweather):
+    before = _counts()
+    speculation = WeatherPrefetch.start("北京天气")
+    task = speculation.speculations[0].task
+    await _started()
+
+    speculation.finish([_tool_call("上海")])
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert _delta(before) == {"used": 0, "wasted": 1, "error": 0}
+    assert task.cancelled()
+    assert qweather.cancelled == 2
+    assert qweather.fetched == []
+
+
+async def test_cancel_stops_tasks_without_counting(qweather):
+    before = _counts()
+    speculation = WeatherPrefetch.start("北京和杭州哪里热")
+    tasks = [s.task for s in speculation.speculations]
+    assert len(tasks) == 2
+    await _started()
+
+    speculation.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(task.cancelled() for task in tasks)
+    assert qweather.cancelled == 4
+    assert speculation.speculations == []
+    assert _delta(before) == {"used": 0, "wasted": 0, "error": 0}
+    # 取消后再结算不会重复计数
+    speculation.finish([_tool_call("北京")])
+    assert _delta(before) == {"used": 0, "wasted": 0, "error": 0}
+
+
+async def test_failed_prefetch_counts_as_error(qweather):
+    before = _counts()
+    qweather.error = RuntimeError("upstream down")
+    qweather.gate.set()
+    speculation = WeatherPrefetch.start("北京天气")
+    await asyncio.gather(speculation.speculations[0].task, return_exceptions=True)
+
+    speculation.finish([_tool_call("北京")])
+
+    assert _delta(before) == {"used": 0, "wasted": 0, "error": 1}
+
+
+async def test_default_city_is_prefetched_when_question_has_none(qweather):
+    speculation = WeatherPrefetch.start("明天会下雨吗", default_city="杭州")
+    speculations = speculation.speculations
+
+    assert [(s.city, s.location_id) for s in speculations] == [("杭州", "101210101")]
+    speculation.cancel()
+    await asyncio.gather(*(s.task for s in speculations), return_exceptions=True)
@@ -0,0 +1,313 @@
+"""utils.resilience 单元测试（令牌桶、熔断器、重试、对冲）"""
+
+import asyncio
+import random
+
+import httpx
+import pytest
+
+from skypulse.utils import deadline
+from skypulse.utils.resilience import (
+    CircuitBreaker,
+    TokenBucket,
+    Upstream,
+    UpstreamStatusError,
+    UpstreamUnavailable,
+)
+
+
+class FakeClock:
+    """手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class FlakyCall:
+    """前 failures 次调用抛出 UpstreamStatusError(503)，之后返回调用序号"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise UpstreamStatusError("test", 503)
+        return self.calls
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """退避不真正等待：random.uniform 记录上限并返回 0"""
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append(high)
+        return 0.0
+
+    monkeypatch.setattr(random, "uniform", uniform)
+    return bounds
+
+
+def test_token_bucket_burst_and_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    clock.advance(0.5)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    # 长时间空闲也不超过容量
+    clock.advance(60)
+    assert [bucket.try_acquire() for _ in range(3)] == [True, True, False]
+
+
+def test_token_bucket_reserve_and_cancel():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=4, capacity=1, clock=clock)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.25)
+    assert bucket.reserve() == pytest.approx(0.5)
+
+    bucket.cancel()
+    assert bucket.reserve() == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert bucket.reserve() == pytest.approx(0.25)
+
+
+def test_circuit_opens_after_consecutive_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_time=30, clock=clock)
+
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    # 成功一次后重新计数
+    breaker.before_call()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.advance(10)
+    with pytest.raises(UpstreamUnavailable) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.reason == "circuit open"
+    assert exc_info.value.retry_after == pytest.approx(20)
+
+
+def test_circuit_half_open_probe_closes_on_success():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_time=30, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+
+    clock.advance(30)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 探测请求进行中，其他请求直接失败
+    with pytest.raises(UpstreamUnavailable, match="half-open"):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_circuit_half_open_probe_failure_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=5, recovery_time=30, clock=clock)
+    for _ in range(5):
+        breaker.before_call()
+        breaker.record_failure()
+
+    clock.advance(30)
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after() == pytest.approx(30)
+
+
+def test_circuit_release_frees_probe_slot():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_time=30, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.advance(30)
+
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+async def test_call_retries_with_exponential_backoff(backoffs):
+    upstream = Upstream("test", retries=2, backoff_base=0.1, backoff_max=0.15)
+    fn = FlakyCall(failures=2)
+
+    assert await upstream.call(fn) == 3
+    assert fn.calls == 3
+    # 第 n 次重试前的退避上限为 min(backoff_max, base * 2^n)
+    assert backoffs == [0.1, 0.15]
+
+
+async def test_call_gives_up_after_retries(backoffs):
+    upstream = Upstream("test", retries=1, failure_threshold=0)
+    fn = FlakyCall(failures=5)
+
+    with pytest.raises(UpstreamStatusError):
+        await upstream.call(fn)
+    assert fn.calls == 2
+
+
+async def test_non_idempotent_call_is_not_retried(backoffs):
+    upstream = Upstream("test", retries=3)
+    fn = FlakyCall(failures=1)
+
+    with pytest.raises(UpstreamStatusError):
+        await upstream.call(fn, idempotent=False)
+    assert fn.calls == 1
+    assert backoffs == []
+
+
+async def test_retry_stops_when_backoff_would_pass_deadline(monkeypatch):
+    clock = FakeClock()
+    start = clock()
+    monkeypatch.setattr(deadline, "remaining", lambda: start + 0.15 - clock())
+    # 退避取上限，并推进时钟而不是真正等待
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds):
+        clock.advance(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    upstream = Upstream("test", retries=5, backoff_base=0.1, failure_threshold=0)
+    fn = FlakyCall(failures=5)
+
+    with pytest.raises(UpstreamStatusError):
+        await upstream.call(fn)
+    # 第一次退避 0.1 秒后还剩 0.05 秒，第二次退避 0.2 秒超过截止时间，不再重试
+    assert fn.calls == 2
+    assert clock() - start == pytest.approx(0.1)
+
+
+async def test_open_circuit_rejects_without_calling(backoffs):
+    upstream = Upstream("test", failure_threshold=2, recovery_time=30)
+    fn = FlakyCall(failures=10)
+
+    for _ in range(2):
+        with pytest.raises(UpstreamStatusError):
+            await upstream.call(fn)
+    with pytest.raises(UpstreamUnavailable, match="circuit open"):
+        await upstream.call(fn)
+    assert fn.calls == 2
+
+
+async def test_business_errors_do_not_trip_circuit():
+    upstream = Upstream("test", failure_threshold=1)
+
+    async def fn():
+        raise ValueError("bad request")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            await upstream.call(fn)
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_rate_limit_rejects_when_wait_exceeds_max_wait():
+    clock = FakeClock()
+    upstream = Upstream("test", rate=1, burst=1, max_wait=0.5)
+    upstream.bucket = TokenBucket(1, 1, clock=clock)
+    fn = FlakyCall()
+
+    assert await upstream.call(fn) == 1
+    with pytest.raises(UpstreamUnavailable) as exc_info:
+        await upstream.call(fn)
+    assert exc_info.value.reason == "rate limited"
+    assert exc_info.value.retry_after == pytest.approx(1.0)
+    assert fn.calls == 1
+
+    # 被拒绝的请求退还了令牌
+    clock.advance(1)
+    assert await upstream.call(fn) == 2
+
+
+async def test_hedge_returns_faster_attempt_and_cancels_slow_one():
+    upstream = Upstream("test", hedge_delay=0.01)
+    attempts: list[asyncio.Task] = []
+    never = asyncio.Event()
+
+    async def fn():
+        attempts.append(asyncio.current_task())
+        if len(attempts) == 1:
+            await never.wait()
+        return len(attempts)
+
+    assert await upstream.call(fn) == 2
+    await asyncio.sleep(0)
+    assert len(attempts) == 2
+    assert attempts[0].cancelled()
+
+
+async def test_no_hedge_when_first_attempt_is_fast():
+    upstream = Upstream("test", hedge_delay=0.05)
+    fn = FlakyCall()
+
+    assert await upstream.call(fn) == 1
+    await asyncio.sleep(0.06)
+    assert fn.calls == 1
+
+
+async def test_hedge_skipped_without_rate_tokens():
+    clock = FakeClock()
+    upstream = Upstream("test", rate=1, burst=1, hedge_delay=0.01)
+    upstream.bucket = TokenBucket(1, 1, clock=clock)
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.03)
+        return calls
+
+    # 唯一的令牌被第一次请求用掉，对冲请求不发出
+    assert await upstream.call(fn) == 1
+    assert calls == 1
+
+
+async def test_hedge_falls_back_to_other_attempt_on_error():
+    upstream = Upstream("test", hedge_delay=0.01, failure_threshold=0)
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(0.03)
+            raise httpx.ConnectError("reset")
+        await asyncio.sleep(0.05)
+        return "hedged"
+
+    assert await upstream.call(fn) == "hedged"
+    assert calls == 2
@@ -0,0 +1,37 @@
+"""ResponseCache.make_key 测试"""
+
+from collections import Counter
+
+from skypulse.agent.response_cache import ResponseCache, forecast_days
+from skypulse.services.qweather_service import qweather_service
+
+
+def test_forecast_days():
+    assert forecast_days("北京明天下雨吗") == 3
+    assert forecast_days("北京下周天气怎么样") == 7
+    assert forecast_days("北京未来几天冷不冷") == 7
+
+
+async def test_make_key_uses_needed_forecast_without_counting(monkeypatch):
+    requested = []
+
+    async def get_current_weather(location_id):
+        return {"code": "200", "now": {"obsTime": "2026-10-18T08:00+08:00"}}
+
+    async def get_forecast(location_id, days=3):
+        requested.append(days)
+        return {"code": "200", "updateTime": f"{days}d-2026-10-18T07:35+08:00"}
+
+    monkeypatch.setattr(qweather_service, "get_current_weather", get_current_weather)
+    monkeypatch.setattr(qweather_service, "get_forecast", get_forecast)
+    monkeypatch.setattr(qweather_service, "popularity", Counter())
+    cache = ResponseCache()
+
+    short = await cache.make_key("北京明天天气")
+    week = await cache.make_key("北京下周天气")
+
+    assert requested == [3, 7]
+    assert short[1] == week[1] == "101010100"
+    assert short[2].endswith("3d-2026-10-18T07:35+08:00")
+    assert week[2].endswith("7d-2026-10-18T07:35+08:00")
+    assert not qweather_service.popularity
@@ -0,0 +1,173 @@
+"""TTLCache 单元测试"""
+
+import asyncio
+
+import pytest
+
+from skypulse.utils.ttl_cache import TTLCache
+
+
+async def test_request_after_abandoned_load_starts_new_load():
+    """最后一个调用方被取消后，紧接着到达的请求发起新的加载，而不是合并到被取消的加载上"""
+    cache = TTLCache()
+    release = asyncio.Event()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return calls
+
+    first = asyncio.create_task(cache.get_or_load("k", loader, ttl=60))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert calls == 1
+
+    first.cancel()
+    # 让 first 处理取消（并取消加载任务），此时加载任务还没有真正结束
+    await asyncio.sleep(0)
+    assert first.cancelled()
+
+    release.set()
+    assert await cache.get_or_load("k", loader, ttl=60) == 2
+    assert calls == 2
+    assert cache.abandoned == 1
+    assert cache.get("k") == 2
+    assert not cache._inflight
+
+
+class FakeClock:
+    """手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class CountingLoader:
+    """记录调用次数的加载函数，返回 "v1"、"v2" ...；设置 error 后抛出异常"""
+
+    def __init__(self):
+        self.calls = 0
+        self.error: Exception | None = None
+        self.gate: asyncio.Event | None = None
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return f"v{self.calls}"
+
+
+async def test_fresh_hit_does_not_reload():
+    clock = FakeClock()
+    cache = TTLCache(clock=clock)
+    loader = CountingLoader()
+
+    assert await cache.get_or_load("k", loader, ttl=10) == "v1"
+    clock.advance(9.9)
+    assert await cache.get_or_load("k", loader, ttl=10) == "v1"
+
+    assert loader.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_expires_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(clock=clock)
+    loader = CountingLoader()
+
+    await cache.get_or_load("k", loader, ttl=10)
+    clock.advance(10)
+
+    assert cache.get("k") is None
+    assert len(cache) == 0
+    assert await cache.get_or_load("k", loader, ttl=10) == "v2"
+    assert loader.calls == 2
+
+
+async def test_stale_while_revalidate_serves_stale_and_refreshes_once():
+    clock = FakeClock()
+    cache = TTLCache(clock=clock, stale_ttl=60)
+    loader = CountingLoader()
+    await cache.get_or_load("k", loader, ttl=10)
+
+    clock.advance(12)
+    loader.gate = asyncio.Event()
+    results = [await cache.get_or_load("k", loader, ttl=10, swr=5) for _ in range(3)]
+
+    # 三次都立即拿到过期值，后台只发起一次刷新
+    assert results == ["v1", "v1", "v1"]
+    await asyncio.sleep(0)
+    assert loader.calls == 2
+    assert cache.stale_served == 3
+    assert cache.revalidations == 1
+
+    loader.gate.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cache.get("k") == "v2"
+    assert loader.calls == 2
+
+
+async def test_stale_while_revalidate_window_ends():
+    clock = FakeClock()
+    cache = TTLCache(clock=clock, stale_ttl=60)
+    loader = CountingLoader()
+    await cache.get_or_load("k", loader, ttl=10)
+
+    # 过期超过 swr：不再直接返回过期值，等待加载结果
+    clock.advance(16)
+    assert await cache.get_or_load("k", loader, ttl=10, swr=5) == "v2"
+    assert cache.stale_served == 0
+
+
+async def test_stale_if_error_inside_window():
+    clock = FakeClock()
+    cache = TTLCache(clock=clock, stale_ttl=60)
+    loader = CountingLoader()
+    await cache.get_or_load("k", loader, ttl=10)
+
+    clock.advance(25)
+    loader.error = RuntimeError("upstream down")
+
+    assert await cache.get_or_load("k", loader, ttl=10, stale_if_error=20) == "v1"
+    assert cache.stale_served == 1
+
+
+async def test_stale_if_error_outside_window():
+    clock = FakeClock()
+    cache = TTLCache(clock=clock, stale_ttl=60)
+    loader = CountingLoader()
+    await cache.get_or_load("k", loader, ttl=10)
+
+    # 过期 25 秒，超出 stale_if_error 的 20 秒（仍在 stale_ttl 内）
+    clock.advance(35)
+    loader.error = RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError, match="upstream down"):
+        await cache.get_or_load("k", loader, ttl=10, stale_if_error=20)
+    assert cache.stale_served == 0
+
+
+async def test_stale_if_error_defaults_to_stale_ttl():
+    clock = FakeClock()
+    cache = TTLCache(clock=clock, stale_ttl=60)
+    loader = CountingLoader()
+    await cache.get_or_load("k", loader, ttl=10)
+    loader.error = RuntimeError("upstream down")
+
+    clock.advance(69)
+    assert await cache.get_or_load("k", loader, ttl=10) == "v1"
+
+    clock.advance(1)
+    with pytest.raises(RuntimeError):
+        await cache.get_or_load("k", loader, ttl=10)
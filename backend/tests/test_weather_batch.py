@@ -0,0 +1,145 @@
+"""POST /api/v1/weather/batch 测试（上游请求替换为桩）"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from skypulse.core.config import settings
+from skypulse.main import app
+from skypulse.services import weather_batch
+
+NOW = {
+    "obsTime": "2024-05-01T10:00+08:00",
+    "temp": "22",
+    "feelsLike": "21",
+    "text": "晴",
+    "windDir": "东风",
+    "windScale": "2",
+    "humidity": "40",
+}
+DAILY = {
+    "fxDate": "2024-05-01",
+    "textDay": "晴",
+    "tempMax": "25",
+    "tempMin": "14",
+    "windDirDay": "东风",
+    "windScaleDay": "1-3",
+}
+
+# Geo API 桩：城市索引之外的地点
+GEO = {"鼓浪屿": "101230201", "福州": "101230101"}
+
+
+class QWeatherStub:
+    """替换 qweather_service 的 Geo 和天气查询，记录请求和最大并发数"""
+
+    def __init__(self):
+        self.fetches: list[tuple[str, int]] = []
+        self.geo_lookups: list[str] = []
+        self.active = 0
+        self.max_active = 0
+        self.delay = 0.0
+        # LocationID -> 抛出的异常或和风天气返回的错误 code
+        self.failures: dict[str, Exception | str] = {}
+
+    async def get_location_id(self, city: str) -> str:
+        self.geo_lookups.append(city)
+        if city not in GEO:
+            raise ValueError(f"找不到城市: {city}")
+        return GEO[city]
+
+    async def fetch_weather(self, location_id: str, days: int = 3) -> dict:
+        self.fetches.append((location_id, days))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        failure = self.failures.get(location_id)
+        if isinstance(failure, Exception):
+            raise failure
+        current = {"code": failure or "200", "updateTime": "2024-05-01T10:05+08:00", "now": NOW}
+        return {"current": current, "forecast": {"code": "200", "daily": [DAILY] * days}}
+
+
+@pytest.fixture
+def qweather(monkeypatch):
+    stub = QWeatherStub()
+    service = weather_batch.qweather_service
+    monkeypatch.setattr(service, "get_location_id", stub.get_location_id)
+    monkeypatch.setattr(service, "fetch_weather", stub.fetch_weather)
+    # 不读写本地城市缓存，未收录的城市都走 Geo 桩
+    monkeypatch.setattr(weather_batch, "get_location_id", lambda city: None)
+    return stub
+
+
+async def _post(payload: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/api/v1/weather/batch", json=payload)
+
+
+async def test_duplicate_locations_are_fetched_once(qweather):
+    locations = ["北京", "北京", " 北京 ", "101010100", "Beijing", "鼓浪屿"]
+
+    response = await _post({"locations": locations, "days": 7})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["query"] for item in results] == [q.strip() for q in locations]
+    assert {item["location_id"] for item in results} == {"101010100", "101230201"}
+    assert all(item["error"] is None for item in results)
+    assert len(results[0]["weather"]["forecast"]) == 7
+    assert sorted(qweather.fetches) == [("101010100", 7), ("101230201", 7)]
+    assert qweather.geo_lookups == ["鼓浪屿"]
+
+
+async def test_upstream_concurrency_is_limited(qweather, monkeypatch):
+    monkeypatch.setattr(settings, "weather_batch_concurrency", 2)
+    qweather.delay = 0.02
+    locations = ["101010100", "101020100", "101210101", "101280101", "101280601"]
+
+    response = await _post({"locations": locations})
+
+    assert response.status_code == 200
+    assert len(qweather.fetches) == 5
+    assert qweather.max_active == 2
+
+
+async def test_partial_failures_are_reported_per_location(qweather):
+    qweather.failures = {"101020100": httpx.ConnectError("reset"), "101210101": "404"}
+
+    response = await _post({"locations": ["北京", "上海", "杭州", "Atlantis"]})
+
+    assert response.status_code == 200
+    items = {item["query"]: item for item in response.json()["results"]}
+    assert items["北京"]["error"] is None and items["北京"]["weather"]["current"]["temp"] == "22"
+    assert items["上海"]["error"] == "reset"
+    assert items["上海"]["weather"] is None
+    assert items["杭州"]["error"] == "current: 和风天气返回 code 404"
+    assert items["Atlantis"]["error"] == "找不到城市: Atlantis"
+    assert items["Atlantis"]["location_id"] is None
+
+
+async def test_stream_returns_one_ndjson_line_per_location(qweather):
+    qweather.failures = {"101020100": "500"}
+
+    response = await _post({"locations": ["北京", "上海", "北京", "福州"], "stream": True})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(item["query"] for item in lines) == ["上海", "北京", "福州"]
+    assert {item["query"]: item["error"] for item in lines}["上海"].endswith("code 500")
+
+
+async def test_too_many_locations_is_rejected(qweather, monkeypatch):
+    monkeypatch.setattr(settings, "weather_batch_max_locations", 2)
+
+    response = await _post({"locations": ["北京", "上海", "杭州"]})
+
+    assert response.status_code == 422
+    assert qweather.fetches == []
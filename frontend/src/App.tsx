@@ -5,7 +5,8 @@ import { useChatStore } from './store/useChatStore';
 import { chatApi } from './services/api';
 
 const App: React.FC = () => {
-  const { addMessage, appendToLastAssistantMessage, setLoading } = useChatStore();
+  const { addMessage, appendToLastAssistantMessage, setLastAssistantStatus, setLoading } =
+    useChatStore();
 
   const handleSendMessage = async (message: string) => {
     addMessage('user', message);
@@ -16,10 +17,17 @@ const App: React.FC = () => {
       addMessage('assistant', '');
 
       // 使用流式发送
-      await chatApi.sendMessageStream(message, (chunk) => {
-        // 逐块追加到最后一条 assistant 消息
-        appendToLastAssistantMessage(chunk);
-      });
+      await chatApi.sendMessageStream(
+        message,
+        (chunk) => {
+          // 逐块追加到最后一条 assistant 消息
+          appendToLastAssistantMessage(chunk);
+        },
+        (status) => {
+          // 回复正文到达前显示进度提示
+          setLastAssistantStatus(status);
+        }
+      );
     } catch (error) {
       // 如果出错，追加错误消息
       appendToLastAssistantMessage('抱歉，遇到了一些问题。请稍后再试。');
@@ -43,9 +43,15 @@ export const MessageBubble: React.FC<MessageBubbleProps> = ({ message }) => {
               </span>
             </div>
             
-            <p className={`whitespace-pre-wrap leading-relaxed ${isUser ? 'text-white' : 'text-gray-800 dark:text-gray-100'}`}>
-              {message.content}
-            </p>
+            {!isUser && !message.content && message.status ? (
+              <p className="text-sm italic text-gray-500 dark:text-gray-400 animate-pulse">
+                {message.status}
+              </p>
+            ) : (
+              <p className={`whitespace-pre-wrap leading-relaxed ${isUser ? 'text-white' : 'text-gray-800 dark:text-gray-100'}`}>
+                {message.content}
+              </p>
+            )}
           </div>
         </div>
       </div>
@@ -26,7 +26,8 @@ export const chatApi = {
 
   sendMessageStream: async (
     message: string,
-    onChunk: (chunk: string) => void
+    onChunk: (chunk: string) => void,
+    onStatus?: (status: string) => void
   ): Promise<void> => {
     // 直接发送请求，不传递 IP
     // IP 由 Nginx 通过 X-Real-IP 传给后端
@@ -48,24 +49,42 @@ export const chatApi = {
 
     const reader = response.body.getReader();
     const decoder = new TextDecoder();
+    // 跨 read() 的不完整行
+    let pending = '';
+    // 当前事件的类型和数据行
+    let eventType = 'message';
+    let dataLines: string[] = [];
 
     while (true) {
       const { done, value } = await reader.read();
       if (done) break;
 
-      const text = decoder.decode(value, { stream: true });
-      const lines = text.split('\n');
+      pending += decoder.decode(value, { stream: true });
+      const lines = pending.split('\n');
+      pending = lines.pop() ?? '';
 
       for (const line of lines) {
-        if (line.startsWith('data: ')) {
-          const data = line.slice(6).trim();
-          if (data === '[DONE]') {
-            return;
-          }
-          if (data) {
-            onChunk(data);
+        if (line === '') {
+          // 空行：一个事件结束
+          const data = dataLines.join('\n');
+          if (eventType === 'message') {
+            if (data === '[DONE]') {
+              return;
+            }
+            if (data) {
+              onChunk(data);
+            }
+          } else if (eventType === 'status' && data) {
+            onStatus?.(data);
           }
+          eventType = 'message';
+          dataLines = [];
+        } else if (line.startsWith('data: ')) {
+          dataLines.push(line.slice(6));
+        } else if (line.startsWith('event: ')) {
+          eventType = line.slice(7).trim();
         }
+        // 以 ':' 开头的是心跳注释，忽略
       }
     }
   },
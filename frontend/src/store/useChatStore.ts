@@ -7,6 +7,7 @@ interface ChatState {
   weatherData: WeatherData | null;
   addMessage: (role: 'user' | 'assistant', content: string) => void;
   appendToLastAssistantMessage: (content: string) => void;
+  setLastAssistantStatus: (status: string) => void;
   setLoading: (loading: boolean) => void;
   setWeatherData: (data: WeatherData) => void;
   clearChat: () => void;
@@ -47,6 +48,17 @@ export const useChatStore = create<ChatState>((set) => ({
       return state;
     }),
 
+  setLastAssistantStatus: (status) =>
+    set((state) => {
+      const lastMessage = state.messages[state.messages.length - 1];
+      if (lastMessage && lastMessage.role === 'assistant') {
+        return {
+          messages: [...state.messages.slice(0, -1), { ...lastMessage, status }],
+        };
+      }
+      return state;
+    }),
+
   setLoading: (loading) => set({ isLoading: loading }),
 
   setWeatherData: (data) => set({ weatherData: data }),
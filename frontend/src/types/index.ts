@@ -3,6 +3,7 @@ export interface Message {
   role: 'user' | 'assistant';
   content: string;
   timestamp: number;
+  status?: string;  // 流式回复开始前的进度提示（如"正在查询北京的天气…"）
 }
 
 export interface WeatherData {